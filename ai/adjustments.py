@@ -0,0 +1,215 @@
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from training.models import AthleteProgress, AthleteReadiness
+from training.readiness import decayed_loads, refresh_readiness
+from .llm import get_client
+from .models import ExerciseAdjustment
+
+SYSTEM_PROMPT = """
+Eres un coach de powerlifting experto.
+Tu tarea es analizar el feedback diario del atleta y ajustar los ejercicios principales (Squat, Bench y Deadlift).
+Debes devolver únicamente un JSON con los ajustes propuestos.
+
+En cada ajuste incluye:
+- sets, reps, y weight con valores numéricos adecuados.
+- un campo "reason" con una explicación detallada (mínimo 2 oraciones) del por qué se realizó el ajuste,
+  considerando el estado del atleta (fatiga, estrés, sueño, dolores, rendimiento reciente, etc.).
+  Usa un lenguaje natural, empático y técnico como un coach humano.
+
+Ejemplo:
+{
+  "Squat": {"sets": 4, "reps": 6, "weight": 80,
+  "reason": "El atleta mostró buena recuperación y bajo nivel de fatiga, por lo que se mantiene la intensidad habitual para sostener la progresión."}
+}
+"""
+
+MODEL = "gpt-3.5-turbo"
+# Cambiar si cambia el prompt, para no reutilizar respuestas de la versión anterior
+CACHE_VERSION = 1
+
+# Nombre en la respuesta del modelo -> nombre del ejercicio en la sesión
+NAME_MAP = {
+    "Squat": "Sentadilla",
+    "Bench": "Bench Press",
+    "Deadlift": "Peso muerto",
+}
+
+
+def prompt_inputs(athlete):
+    """
+    Tendencias guardadas (las mantiene refresh_readiness_on_commit al escribir
+    cargas o feedback) con las cargas llevadas a hoy, y últimos progresos.
+    Solo se recalculan si el atleta aún no tiene fila.
+    """
+    readiness = AthleteReadiness.objects.filter(athlete=athlete).first()
+    if readiness is None:
+        refresh_readiness([athlete.id])
+        readiness = AthleteReadiness.objects.get(athlete=athlete)
+    acute, chronic, _ = decayed_loads(readiness, timezone.localdate())
+    readiness.acute_load, readiness.chronic_load = round(acute, 1), round(chronic, 1)
+    progress = list(AthleteProgress.objects.filter(athlete=athlete).order_by("-date")[:3])
+    return readiness, progress
+
+
+def build_context(athlete, feedback, readiness, progress):
+    """Texto que recibe el modelo: feedback del día, tendencias y últimos progresos."""
+    return f"""
+Atleta: {athlete.first_name} {athlete.last_name}
+Peso corporal: {athlete.bodyweight_kg} kg
+Feedback diario:
+- Sueño: {feedback.sleep_quality}/10
+- Fatiga: {feedback.fatigue}/10
+- Estrés: {feedback.stress}/10
+- Dolores: {feedback.soreness or 'Ninguno'}
+
+Tendencia ({readiness.feedback_count} feedbacks, promedio móvil):
+- Sueño: {readiness.sleep}/10, Fatiga: {readiness.fatigue}/10, Estrés: {readiness.stress}/10
+- Disposición: {readiness.score}/100
+- Carga aguda: {readiness.acute_load}, crónica: {readiness.chronic_load} (ACWR: {round(readiness.acute_load / readiness.chronic_load, 2) if readiness.chronic_load else 'sin datos'})
+
+Últimos progresos:
+{", ".join([f"{p.exercise}: {p.best_weight}kg (1RM est: {p.estimated_1rm})" for p in progress])}
+
+Devuelve un JSON con este formato para los ejercicios de powerlifting:
+{{
+    "Squat": {{"sets": int, "reps": int, "weight": float, "reason": "motivo del ajuste"}},
+    "Bench": {{"sets": int, "reps": int, "weight": float, "reason": "motivo del ajuste"}},
+    "Deadlift": {{"sets": int, "reps": int, "weight": float, "reason": "motivo del ajuste"}}
+}}
+"""
+
+
+def cache_key(athlete, feedback, session, readiness, progress):
+    """
+    Clave de los datos que determinan el ajuste, normalizados: puntajes del
+    feedback, peso corporal, últimos progresos, plan de la sesión y la
+    disposición redondeada. Nombres, ids y fechas no forman parte de ella.
+    """
+    acwr = readiness.acute_load / readiness.chronic_load if readiness.chronic_load else None
+    snapshot = {
+        "model": MODEL,
+        "feedback": [
+            feedback.sleep_quality, feedback.fatigue, feedback.stress,
+            " ".join((feedback.soreness or "").lower().split()),
+        ],
+        "bodyweight": round(athlete.bodyweight_kg, 1) if athlete.bodyweight_kg else None,
+        "progress": [[p.exercise, p.best_weight, p.estimated_1rm] for p in progress],
+        "plan": sorted(session.exercises.values_list("name", "sets", "reps", "weight", "rpe")),
+        "readiness": [
+            round(readiness.score / 5) * 5 if readiness.score is not None else None,
+            round(acwr, 1) if acwr is not None else None,
+        ],
+    }
+    digest = hashlib.sha256(json.dumps(snapshot, sort_keys=True, default=str).encode()).hexdigest()
+    return f"ai-adjustments:v{CACHE_VERSION}:{digest}"
+
+
+def parse_adjustments(ai_reply):
+    # El modelo a veces agrega texto alrededor del JSON
+    ai_reply = (ai_reply or "").strip()
+    start_idx = ai_reply.find("{")
+    end_idx = ai_reply.rfind("}") + 1
+    if start_idx != -1 and end_idx != -1:
+        ai_reply = ai_reply[start_idx:end_idx]
+    try:
+        return json.loads(ai_reply)
+    except json.JSONDecodeError:
+        return {}
+
+
+def prompt_messages(context):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": context},
+    ]
+
+
+def prompt_for(athlete, feedback, session):
+    """(clave de caché, contexto para el modelo) según el estado actual del atleta."""
+    readiness, progress = prompt_inputs(athlete)
+    return (
+        cache_key(athlete, feedback, session, readiness, progress),
+        build_context(athlete, feedback, readiness, progress),
+    )
+
+
+def request_adjustments(context, deadline=None):
+    """
+    Pide los ajustes al modelo antes de `deadline` (time.monotonic), con
+    reintentos incluidos. Puede lanzar openai.OpenAIError.
+    """
+    reply = get_client().chat(
+        prompt_messages(context),
+        model=MODEL,
+        max_tokens=600,
+        temperature=0.7,
+        deadline=deadline,
+    )
+    return parse_adjustments(reply)
+
+
+def is_complete(adjustments):
+    # Al menos un ejercicio conocido, y cada ajuste presente trae sets, reps y weight numéricos
+    return isinstance(adjustments, dict) and any(name in adjustments for name in NAME_MAP) and all(
+        isinstance(adjustments[name], dict)
+        and all(isinstance(adjustments[name].get(field), (int, float)) for field in ("sets", "reps", "weight"))
+        for name in NAME_MAP
+        if name in adjustments
+    )
+
+
+def get_adjustments(athlete, feedback, session, deadline=None):
+    """
+    Ajustes para el contexto actual del atleta. Devuelve (ajustes, desde_cache);
+    solo se llama al modelo si ese contexto no se respondió antes (TTL/LRU de
+    la caché "ai_adjustments"). Puede lanzar openai.OpenAIError.
+    """
+    key, context = prompt_for(athlete, feedback, session)
+    cache = caches["ai_adjustments"]
+    adjustments = cache.get(key)
+    if adjustments is not None:
+        return adjustments, True
+
+    adjustments = request_adjustments(context, deadline=deadline)
+    # Una respuesta ilegible no se memoriza: el siguiente intento vuelve a preguntar
+    if is_complete(adjustments):
+        cache.set(key, adjustments)
+    return adjustments, False
+
+
+@transaction.atomic
+def apply_adjustments(session, adjustments, job=None):
+    """
+    Aplica los ajustes a los ejercicios principales de la sesión y deja un
+    ExerciseAdjustment por cada uno. Devuelve [{"name", "reason"}, ...].
+    """
+    modified = []
+    for ai_name, db_name in NAME_MAP.items():
+        if ai_name not in adjustments:
+            continue
+        ex = session.exercises.filter(name=db_name).first()
+        if not ex:
+            continue
+        ex.sets = adjustments[ai_name]["sets"]
+        ex.reps = adjustments[ai_name]["reps"]
+        ex.weight = adjustments[ai_name]["weight"]
+        ex.save()
+
+        ExerciseAdjustment.objects.create(
+            exercise=ex,
+            job=job,
+            sets=ex.sets,
+            reps=ex.reps,
+            weight=ex.weight,
+            reason=adjustments[ai_name].get("reason", ""),
+        )
+        modified.append({
+            "name": db_name,
+            "reason": adjustments[ai_name].get("reason", ""),
+        })
+    return modified
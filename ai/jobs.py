@@ -0,0 +1,169 @@
+import logging
+import time
+from datetime import timedelta
+
+import openai
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .adjustments import apply_adjustments, get_adjustments
+from .llm import CircuitOpenError
+from .models import AdjustmentJob
+from .rules import session_rule_adjustments
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# Espera antes de reintentar: 30s, 60s, ...
+RETRY_DELAY = timedelta(seconds=30)
+# Un job "running" más antiguo que esto se considera de un worker caído
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue(feedback, session, engine=AdjustmentJob.Engine.AI):
+    return AdjustmentJob.objects.create(feedback=feedback, session=session, engine=engine)
+
+
+def run_inline(feedback, session):
+    """Crea y resuelve en el momento un job con el motor de reglas, sin pasar por la cola."""
+    job = AdjustmentJob.objects.create(
+        feedback=feedback, session=session, engine=AdjustmentJob.Engine.RULES,
+        status=AdjustmentJob.Status.RUNNING, attempts=1, started_at=timezone.now(),
+    )
+    return run_job(job)
+
+
+def deadline(job):
+    # Hasta cuándo se espera a la IA; después se ajusta con las reglas locales
+    return job.created_at + timedelta(seconds=settings.AI_LATENCY_BUDGET)
+
+
+def claim_next():
+    """
+    Toma el siguiente job disponible y lo marca "running". Con SKIP LOCKED
+    varios workers pueden consultar la cola a la vez sin tomar el mismo job.
+    """
+    now = timezone.now()
+    # Un job que ya agotó sus intentos y quedó colgado no se vuelve a tomar
+    AdjustmentJob.objects.filter(
+        status=AdjustmentJob.Status.RUNNING, started_at__lt=now - STALE_AFTER, attempts__gte=MAX_ATTEMPTS,
+    ).update(status=AdjustmentJob.Status.FAILED, error="El worker se detuvo en el último intento.", finished_at=now)
+    with transaction.atomic():
+        job = (
+            AdjustmentJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=AdjustmentJob.Status.PENDING, run_after__lte=now)
+                | Q(status=AdjustmentJob.Status.RUNNING, started_at__lt=now - STALE_AFTER,
+                    attempts__lt=MAX_ATTEMPTS)
+            )
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = AdjustmentJob.Status.RUNNING
+        job.attempts += 1
+        job.started_at = now
+        job.save(update_fields=["status", "attempts", "started_at"])
+    return job
+
+
+def finish_job(job, status, result=None, error=""):
+    """Cierra el job con su resultado; también lo usa el streaming (ai.streaming)."""
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+
+
+def _retry_at(job):
+    return timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+
+
+def _retry_or_fail(job, error):
+    if job.attempts < MAX_ATTEMPTS:
+        job.status = AdjustmentJob.Status.PENDING
+        job.error = error
+        job.run_after = _retry_at(job)
+        job.save(update_fields=["status", "error", "run_after"])
+    else:
+        finish_job(job, AdjustmentJob.Status.FAILED, error=error)
+
+
+def fall_back(job, error):
+    """Pasa el job al motor de reglas guardando el error de la IA."""
+    logger.warning("Job %s se ajusta con reglas: %s", job.pk, error)
+    job.engine = AdjustmentJob.Engine.RULES
+    job.error = error
+    job.save(update_fields=["engine", "error"])
+
+
+def run_job(job):
+    """
+    Pide los ajustes al modelo y los aplica a la sesión del job. Si el
+    circuito está abierto, la IA no alcanza a responder dentro de
+    AI_LATENCY_BUDGET o su respuesta no ajusta ningún ejercicio, los calcula
+    el motor de reglas (ai.rules).
+    """
+    feedback = job.feedback
+    session = job.session
+    if session.status == "completed":
+        finish_job(job, AdjustmentJob.Status.FAILED, error="No se pueden modificar sesiones ya completadas.")
+        return job
+
+    cached = False
+    if job.engine == AdjustmentJob.Engine.AI:
+        remaining = (deadline(job) - timezone.now()).total_seconds()
+        if remaining <= 0:
+            fall_back(job, "La IA no respondió dentro del plazo.")
+        else:
+            try:
+                adjustments, cached = get_adjustments(
+                    feedback.athlete, feedback, session, deadline=time.monotonic() + remaining,
+                )
+            except CircuitOpenError as e:
+                fall_back(job, str(e))
+            except openai.OpenAIError as e:
+                # Solo se reintenta si el reintento cabe en el plazo
+                if job.attempts < MAX_ATTEMPTS and _retry_at(job) < deadline(job):
+                    _retry_or_fail(job, str(e))
+                    return job
+                fall_back(job, str(e))
+    if job.engine == AdjustmentJob.Engine.RULES:
+        adjustments = session_rule_adjustments(session, feedback)
+
+    # La sesión pudo finalizarse mientras se esperaba al modelo
+    session.refresh_from_db(fields=["status"])
+    if session.status == "completed":
+        finish_job(job, AdjustmentJob.Status.FAILED, error="No se pueden modificar sesiones ya completadas.")
+        return job
+
+    try:
+        modified = apply_adjustments(session, adjustments, job=job)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning("Respuesta de IA inválida en job %s: %r", job.pk, e)
+        _retry_or_fail(job, f"Respuesta de IA inválida: {e!r}")
+        return job
+    if not modified and job.engine == AdjustmentJob.Engine.AI:
+        # Respuesta vacía o ilegible: como en ai.streaming, se ajusta con las reglas
+        fall_back(job, "Respuesta de IA inválida.")
+        adjustments, cached = session_rule_adjustments(session, feedback), False
+        modified = apply_adjustments(session, adjustments, job=job)
+    finish_job(job, AdjustmentJob.Status.DONE, result={
+        "adjustments": adjustments, "modified_exercises": modified, "cached": cached, "engine": job.engine,
+    }, error=job.error if job.engine == AdjustmentJob.Engine.RULES else "")
+    return job
+
+
+def process(job):
+    """run_job para el worker: un error inesperado cuenta como intento fallido en vez de detenerlo."""
+    try:
+        return run_job(job)
+    except Exception as e:
+        logger.exception("Error inesperado en job %s", job.pk)
+        _retry_or_fail(job, repr(e))
+        return job
@@ -0,0 +1,268 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import openai
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+
+# Errores transitorios: red, timeouts, 429 y 5xx. El resto (4xx) no se reintenta
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+
+class CircuitOpenError(openai.OpenAIError):
+    """El proveedor falló repetidamente; no se le llama hasta que pase el enfriamiento."""
+
+
+class DeadlineExceededError(openai.OpenAIError):
+    """Se acabó el plazo de la llamada antes de obtener respuesta."""
+
+
+class CircuitBreaker:
+    """
+    Cerrado: deja pasar todo. Tras `threshold` fallos seguidos se abre y
+    rechaza llamadas durante `cooldown` segundos; luego deja pasar una sola
+    llamada de prueba (semiabierto) que lo cierra o lo vuelve a abrir.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold, cooldown, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenError("Servicio de IA no disponible temporalmente.")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def release(self):
+        """La llamada de prueba se abandonó sin resultado: la siguiente vuelve a probar."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+def backoff_delay(attempt):
+    # Backoff exponencial con jitter completo para no sincronizar reintentos
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMClient:
+    """
+    Cliente de chat sobre un único httpx.Client con pool de conexiones
+    keep-alive, timeouts explícitos, reintentos acotados y circuit breaker.
+    El SDK no reintenta por su cuenta (max_retries=0).
+    """
+
+    def __init__(self, api_key, base_url, connect_timeout, read_timeout, max_retries,
+                 max_connections, breaker, sleep=time.sleep, clock=time.monotonic):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+        )
+        self.openai = OpenAI(
+            api_key=api_key, base_url=base_url, http_client=self.http, timeout=timeout, max_retries=0,
+        )
+        self.max_retries = max_retries
+        self.breaker = breaker
+        self.sleep = sleep
+        self.clock = clock
+
+    def chat(self, messages, deadline=None, **kwargs):
+        """
+        Devuelve el texto de la respuesta. Lanza openai.OpenAIError si no se
+        obtiene. `deadline` (según self.clock) acota la llamada completa:
+        cada intento espera a lo más el tiempo que queda y no se reintenta
+        si el reintento no alcanza.
+        """
+        for attempt in range(self.max_retries + 1):
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    raise DeadlineExceededError("Se agotó el plazo para la respuesta de IA.")
+                kwargs["timeout"] = httpx.Timeout(
+                    min(self.read_timeout, remaining), connect=min(self.connect_timeout, remaining),
+                )
+            self.breaker.before_call()
+            try:
+                completion = self.openai.chat.completions.create(messages=messages, **kwargs)
+                content = completion.choices[0].message.content
+            except RETRYABLE_ERRORS:
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt)
+                if attempt == self.max_retries or (deadline is not None and self.clock() + delay >= deadline):
+                    raise
+                self.sleep(delay)
+                continue
+            except Exception:
+                # 4xx o respuesta ilegible: el proveedor respondió, no está caído
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return content
+
+    def close(self):
+        self.http.close()
+
+
+class AsyncLLMClient:
+    """
+    Versión async de LLMClient para respuestas en streaming, sobre un
+    httpx.AsyncClient con pool. No reintenta: lo ya emitido no se deshace.
+    """
+
+    def __init__(self, api_key, base_url, connect_timeout, read_timeout, max_connections, breaker):
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+        )
+        self.openai = AsyncOpenAI(
+            api_key=api_key, base_url=base_url, http_client=self.http, timeout=timeout, max_retries=0,
+        )
+        self.breaker = breaker
+
+    async def stream_chat(self, messages, **kwargs):
+        """Genera el texto de la respuesta a medida que llega. Lanza openai.OpenAIError."""
+        self.breaker.before_call()
+        try:
+            stream = await self.openai.chat.completions.create(messages=messages, stream=True, **kwargs)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except RETRYABLE_ERRORS:
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # 4xx o respuesta ilegible: el proveedor respondió, no está caído
+            self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cliente desconectado o tarea cancelada a mitad de la respuesta
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+_client = None
+# Un cliente async por event loop (sus conexiones no sirven en otro loop)
+_async_clients = weakref.WeakKeyDictionary()
+_breaker = None
+_client_lock = threading.Lock()
+
+
+def _get_breaker():
+    # Un solo circuito por proceso: los fallos del cliente sync y del async se suman
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_COOLDOWN)
+    return _breaker
+
+
+def get_client():
+    """Cliente compartido por todo el proceso, creado en el primer uso."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+                read_timeout=settings.LLM_READ_TIMEOUT,
+                max_retries=settings.LLM_MAX_RETRIES,
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                breaker=_get_breaker(),
+            )
+        return _client
+
+
+async def _close_with_loop(loop, client):
+    # Queda suspendido en el yield: loop.shutdown_asyncgens() (asyncio.run,
+    # uvicorn, async_to_sync) lo cierra antes de cerrar el loop, y el cliente
+    # se cierra en su propio loop
+    try:
+        yield
+    finally:
+        _async_clients.pop(loop, None)
+        await client.aclose()
+
+
+def get_async_client():
+    """
+    Cliente async del event loop actual. Con ASGI hay un loop por proceso;
+    las conexiones de httpx.AsyncClient no se pueden usar desde otro loop,
+    así que cada loop tiene el suyo y se cierra cuando el loop termina.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        entry = _async_clients.get(loop)
+        if entry is None:
+            client = AsyncLLMClient(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+                read_timeout=settings.LLM_READ_TIMEOUT,
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                breaker=_get_breaker(),
+            )
+            closer = _close_with_loop(loop, client)
+            # Primer paso sin await: el loop empieza a seguir el generador
+            try:
+                closer.asend(None).send(None)
+            except StopIteration:
+                pass
+            entry = _async_clients[loop] = (client, closer)
+        return entry[0]
+
+
+def reset_client():
+    global _client, _breaker
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _async_clients.clear()
+        _breaker = None
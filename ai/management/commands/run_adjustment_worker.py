@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ai.jobs import claim_next, process
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de ajustes de IA (AdjustmentJob)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Procesa los jobs pendientes y termina")
+        parser.add_argument("--poll", type=float, default=2, help="Segundos de espera con la cola vacía")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = claim_next()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+            process(job)
+            self.stdout.write(f"Job {job.pk}: {job.status} (intento {job.attempts})")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0005_exerciseadjustment'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exerciseadjustment',
+            name='date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
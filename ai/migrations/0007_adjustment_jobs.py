@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0015_athlete_readiness'),
+        ('ai', '0006_alter_exerciseadjustment_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdjustmentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Listo'), ('failed', 'Fallido')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('feedback', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='job', to='ai.athletefeedback')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adjustment_jobs', to='training.trainingsession')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exerciseadjustment',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='adjustments', to='ai.adjustmentjob'),
+        ),
+        migrations.AddIndex(
+            model_name='adjustmentjob',
+            index=models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ),
+    ]
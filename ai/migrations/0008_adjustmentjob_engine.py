@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0007_adjustment_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adjustmentjob',
+            name='engine',
+            field=models.CharField(choices=[('ai', 'IA'), ('rules', 'Reglas')], default='ai', max_length=10),
+        ),
+    ]
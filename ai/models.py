@@ -1,6 +1,7 @@
 from django.db import models
 
 from django.db import models
+from django.utils import timezone
 from authentication.models import CustomUser
 from training.models import TrainingSession, Exercise
 from django.core.exceptions import ValidationError
@@ -17,13 +18,49 @@ class AthleteFeedback(models.Model):
     def __str__(self):
         return f"Feedback {self.athlete.email} {self.created_at.date()}"
 
+class AdjustmentJob(models.Model):
+    """Ajuste de la sesión (IA o reglas), procesado por run_adjustment_worker."""
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pendiente"
+        RUNNING = "running", "En proceso"
+        DONE = "done", "Listo"
+        FAILED = "failed", "Fallido"
+
+    class Engine(models.TextChoices):
+        AI = "ai", "IA"
+        RULES = "rules", "Reglas"
+
+    feedback = models.OneToOneField(AthleteFeedback, on_delete=models.CASCADE, related_name="job")
+    session = models.ForeignKey(TrainingSession, on_delete=models.CASCADE, related_name="adjustment_jobs")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    # Motor pedido; pasa a "rules" si la IA no responde dentro de AI_LATENCY_BUDGET
+    engine = models.CharField(max_length=10, choices=Engine.choices, default=Engine.AI)
+    attempts = models.PositiveIntegerField(default=0)
+    # No se toma antes de esta hora (reintentos con espera)
+    run_after = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="job_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job {self.pk} ({self.status}) - sesión {self.session_id}"
+
+
 class ExerciseAdjustment(models.Model):
     exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name="adjustments")
+    job = models.ForeignKey(AdjustmentJob, on_delete=models.SET_NULL, null=True, blank=True, related_name="adjustments")
     sets = models.IntegerField()
     reps = models.IntegerField()
     weight = models.FloatField()
     reason = models.TextField(blank=True, null=True)
-    date = models.DateTimeField(auto_now_add=True)
+    date = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
         return f"{self.exercise.name} - {self.date.date()} - {self.reason or 'Sin motivo'}"
@@ -0,0 +1,94 @@
+import unicodedata
+
+from django.utils import timezone
+
+from training.generator import round_weight
+from training.models import AthleteReadiness
+from training.readiness import decayed_loads, readiness_score
+from training.rpe import RPE_COLUMNS, percentage
+from .adjustments import NAME_MAP
+
+# Disposición del día (0-100) -> RPE que se resta al planificado
+READINESS_STEPS = ((70, 0), (55, 0.5), (40, 1), (float("-inf"), 1.5))
+# Bajo esta disposición también se quita una serie
+LOW_READINESS = 40
+# ACWR sobre este valor es un pico de carga: medio punto de RPE menos
+ACWR_SPIKE = 1.5
+DEFAULT_RPE = 8
+# Bajo la última columna de la tabla (RPE 7): fracción de peso por punto de RPE
+BELOW_TABLE_STEP = 0.03
+# Molestias (sin tildes) que afectan a cada ejercicio principal
+SORENESS_KEYWORDS = {
+    "Squat": ("rodilla", "cadera", "cuadricep", "aductor", "gluteo", "lumbar"),
+    "Bench": ("hombro", "codo", "pecho", "pectoral", "muneca", "tricep"),
+    "Deadlift": ("espalda", "lumbar", "isquio", "cadera", "gluteo"),
+}
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _relative_load(reps, planned_rpe, target_rpe):
+    # Peso objetivo / peso planificado según la tabla RPE, con las mismas repeticiones
+    floor = RPE_COLUMNS[-1]
+    ratio = percentage(reps, max(target_rpe, floor)) / percentage(reps, max(planned_rpe, floor))
+    return ratio * (1 - BELOW_TABLE_STEP * max(floor - target_rpe, 0))
+
+
+def rule_adjustments(exercises, feedback, acwr=None):
+    """
+    Ajustes deterministas, con el mismo formato que la respuesta de la IA.
+    `exercises` es nombre -> Exercise de la sesión. Nunca sube el plan: baja
+    el RPE objetivo según la disposición del día, los picos de carga (ACWR)
+    y las molestias, y recalcula el peso con la tabla RPE.
+    """
+    score = readiness_score(feedback.sleep_quality, feedback.fatigue, feedback.stress)
+    base_drop = next(drop for threshold, drop in READINESS_STEPS if score >= threshold)
+    soreness = _normalize(feedback.soreness)
+
+    adjustments = {}
+    for ai_name, db_name in NAME_MAP.items():
+        ex = exercises.get(db_name)
+        if ex is None or not ex.weight:
+            continue
+        planned_rpe = ex.rpe or DEFAULT_RPE
+        drop, sets = base_drop, ex.sets
+        reasons = [
+            f"Disposición del día {score}/100 (sueño {feedback.sleep_quality}, "
+            f"fatiga {feedback.fatigue}, estrés {feedback.stress})."
+        ]
+        if score < LOW_READINESS:
+            sets = max(sets - 1, 1)
+            reasons.append("Disposición baja: una serie menos.")
+        if acwr is not None and acwr > ACWR_SPIKE:
+            drop += 0.5
+            reasons.append(f"Pico de carga (ACWR {acwr:.2f}): medio punto menos de RPE.")
+        sore = [word for word in SORENESS_KEYWORDS[ai_name] if word in soreness]
+        if sore:
+            drop += 1
+            sets = max(sets - 1, 1)
+            reasons.append(f"Molestias ({', '.join(sore)}): un punto menos de RPE y una serie menos.")
+
+        target_rpe = planned_rpe - drop
+        weight = min(round_weight(ex.weight * _relative_load(ex.reps, planned_rpe, target_rpe)), ex.weight)
+        if drop:
+            reasons.append(f"RPE objetivo {planned_rpe:g} → {target_rpe:g}: {ex.weight:g} kg → {weight:g} kg.")
+        else:
+            reasons.append("Se mantiene el plan.")
+        adjustments[ai_name] = {
+            "sets": sets, "reps": ex.reps, "weight": weight,
+            "reason": "Ajuste automático por reglas. " + " ".join(reasons),
+        }
+    return adjustments
+
+
+def session_rule_adjustments(session, feedback):
+    """rule_adjustments con los ejercicios de la sesión y el ACWR guardado (dos consultas)."""
+    exercises = {}
+    for ex in session.exercises.filter(name__in=NAME_MAP.values()).order_by("id"):
+        exercises.setdefault(ex.name, ex)
+    readiness = AthleteReadiness.objects.filter(athlete_id=feedback.athlete_id).first()
+    acwr = decayed_loads(readiness, timezone.localdate())[2] if readiness else None
+    return rule_adjustments(exercises, feedback, acwr)
@@ -1,8 +1,27 @@
 from rest_framework import serializers
-from .models import AthleteFeedback
+from .models import AthleteFeedback, ExerciseAdjustment, AdjustmentJob
 
 class AthleteFeedbackSerializer(serializers.ModelSerializer):
+    sleep_quality = serializers.IntegerField(min_value=1, max_value=10)
+    fatigue = serializers.IntegerField(min_value=1, max_value=10)
+    stress = serializers.IntegerField(min_value=1, max_value=10)
+
     class Meta:
         model = AthleteFeedback
         fields = "__all__"
         read_only_fields = ["athlete"]
+
+
+class ExerciseAdjustmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExerciseAdjustment
+        fields = "__all__"
+
+
+class AdjustmentJobSerializer(serializers.ModelSerializer):
+    adjustments = ExerciseAdjustmentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = AdjustmentJob
+        fields = ["id", "status", "engine", "attempts", "feedback", "session", "result", "error", "adjustments",
+                  "created_at", "started_at", "finished_at"]
@@ -0,0 +1,194 @@
+import asyncio
+import json
+from contextlib import aclosing
+
+import openai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .adjustments import MODEL, NAME_MAP, apply_adjustments, is_complete, prompt_for, prompt_messages
+from .jobs import deadline, fall_back, finish_job
+from .llm import get_async_client
+from .models import AdjustmentJob
+from .rules import session_rule_adjustments
+
+
+class AdjustmentStreamParser:
+    """
+    Parser incremental de la respuesta del modelo: recibe el texto a trozos y
+    devuelve cada par (ejercicio, ajuste) apenas se cierra su objeto, sin
+    esperar el resto. Ignora el texto que el modelo agregue fuera del JSON.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key = None
+        self.key_chars = []
+        self.value = []
+
+    def feed(self, text):
+        completed = []
+        for char in text:
+            if self.depth >= 2:
+                self.value.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.key = json.loads('"' + "".join(self.key_chars) + '"')
+                    continue
+                if self.depth == 1:
+                    self.key_chars.append(char)
+            elif char == '"':
+                self.in_string = True
+                self.key_chars = []
+            elif char == "{":
+                self.depth += 1
+                if self.depth == 2:
+                    self.value = [char]
+            elif char == "}" and self.depth:
+                self.depth -= 1
+                if self.depth == 1:
+                    try:
+                        completed.append((self.key, json.loads("".join(self.value))))
+                    except json.JSONDecodeError:
+                        pass
+        return completed
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def start_job(feedback, session):
+    """Job "running" para que run_adjustment_worker no lo tome mientras se transmite."""
+    return AdjustmentJob.objects.create(
+        feedback=feedback, session=session,
+        status=AdjustmentJob.Status.RUNNING, attempts=1, started_at=timezone.now(),
+    )
+
+
+def apply_lift(job, name, adjustment):
+    """Aplica el ajuste de un ejercicio apenas llega. Devuelve el evento o None si no sirve."""
+    if name not in NAME_MAP or not is_complete({name: adjustment}):
+        return None
+    job.session.refresh_from_db(fields=["status"])
+    if job.session.status == "completed":
+        return None
+    modified = apply_adjustments(job.session, {name: adjustment}, job=job)
+    if not modified:
+        return None
+    return {
+        "exercise": modified[0]["name"],
+        "sets": adjustment["sets"],
+        "reps": adjustment["reps"],
+        "weight": adjustment["weight"],
+        "reason": modified[0]["reason"],
+    }
+
+
+async def replay_job(job):
+    """Reintento de un envío ya recibido: informa el job existente sin volver a ajustar."""
+    yield sse("job", {"job_id": job.id, "session_id": job.session_id, "engine": job.engine})
+    yield sse("done", {"job_id": job.id, "status": job.status, "result": job.result})
+
+
+async def stream_adjustments(job):
+    """
+    Eventos SSE del ajuste: "job" al inicio, un "adjustment" por ejercicio
+    guardado apenas el modelo cierra su objeto y "done" al final. Si la IA
+    falla, los ejercicios que falten se ajustan con las reglas locales. Si
+    el cliente se desconecta, el job se cierra con lo ya aplicado.
+    """
+    feedback = job.feedback
+    adjustments, modified = {}, []
+    cached = None
+    finished = False
+
+    async def emit(name, adjustment):
+        event = await sync_to_async(apply_lift)(job, name, adjustment)
+        if event:
+            adjustments[name] = adjustment
+            modified.append({"name": event["exercise"], "reason": event["reason"]})
+            return sse("adjustment", event)
+        return None
+
+    def result():
+        return {
+            "adjustments": adjustments, "modified_exercises": modified,
+            "cached": cached is not None, "engine": job.engine,
+        }
+
+    try:
+        yield sse("job", {"job_id": job.id, "session_id": job.session_id, "engine": job.engine})
+
+        key, context = await sync_to_async(prompt_for)(feedback.athlete, feedback, job.session)
+        cache = caches["ai_adjustments"]
+        cached = await sync_to_async(cache.get)(key)
+
+        error = None
+        try:
+            if cached is not None:
+                for name, adjustment in cached.items():
+                    event = await emit(name, adjustment)
+                    if event:
+                        yield event
+            else:
+                parser = AdjustmentStreamParser()
+                chunks = get_async_client().stream_chat(
+                    prompt_messages(context), model=MODEL, max_tokens=600, temperature=0.7,
+                    timeout=settings.AI_LATENCY_BUDGET,
+                )
+                # aclosing: si el cliente se va, también se cierra la respuesta del modelo
+                async with aclosing(chunks):
+                    while True:
+                        # El timeout del cliente es por lectura: un modelo que sigue
+                        # enviando tokens lentos no lo agota, así que se mide el plazo total
+                        remaining = (deadline(job) - timezone.now()).total_seconds()
+                        try:
+                            text = await asyncio.wait_for(anext(chunks), max(remaining, 0))
+                        except StopAsyncIteration:
+                            break
+                        for name, adjustment in parser.feed(text):
+                            event = await emit(name, adjustment)
+                            if event:
+                                yield event
+        except openai.OpenAIError as e:
+            error = str(e)
+        except asyncio.TimeoutError:
+            error = "La IA no respondió dentro del plazo."
+        if error is None and not modified:
+            error = "Respuesta de IA inválida."
+
+        if error:
+            await sync_to_async(fall_back)(job, error)
+            yield sse("error", {"detail": error, "fallback": job.engine})
+            rules = await sync_to_async(session_rule_adjustments)(job.session, feedback)
+            for name, adjustment in rules.items():
+                if name not in adjustments:
+                    event = await emit(name, adjustment)
+                    if event:
+                        yield event
+
+        if cached is None and job.engine == AdjustmentJob.Engine.AI and is_complete(adjustments):
+            await sync_to_async(cache.set)(key, adjustments)
+        await sync_to_async(finish_job)(job, AdjustmentJob.Status.DONE, result(), job.error)
+        finished = True
+        yield sse("done", {"job_id": job.id, "status": job.status, "result": result()})
+    finally:
+        # Desconexión o error a mitad: nunca queda "running" para que el worker lo repita
+        if not finished:
+            await sync_to_async(finish_job)(
+                job,
+                AdjustmentJob.Status.DONE if modified else AdjustmentJob.Status.FAILED,
+                result(),
+                "Transmisión interrumpida antes de terminar.",
+            )
@@ -1,3 +1,587 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+import httpx
+import openai
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import CustomUser
+from training.models import AthleteReadiness, CoachAthlete, TrainingBlock, TrainingSession, Exercise
+from training.readiness import decayed_loads, refresh_readiness
+from .adjustments import is_complete, prompt_for
+from .jobs import MAX_ATTEMPTS, claim_next, run_job
+from .llm import (
+    AsyncLLMClient, CircuitBreaker, CircuitOpenError, DeadlineExceededError, LLMClient, get_async_client, reset_client,
+)
+from .models import AdjustmentJob, AthleteFeedback, ExerciseAdjustment
+from .rules import rule_adjustments
+from .streaming import AdjustmentStreamParser, start_job, stream_adjustments
+
+AI_ADJUSTMENTS = {
+    "Squat": {"sets": 3, "reps": 5, "weight": 140, "reason": "Fatiga alta, se baja el volumen."},
+    "Bench": {"sets": 4, "reps": 6, "weight": 90, "reason": "Buena recuperación."},
+}
+
+# Respuesta del modelo partida en trozos que cortan claves, números y textos
+AI_REPLY_CHUNKS = [
+    'Aquí están los ajustes:\n{"Squ', 'at": {"sets": 3, "reps": 5, "wei', 'ght": 140, "reason": "Fatiga alta, ',
+    'se baja el {volumen}."}', ', "Bench": {"sets": 4, "reps": 6, "weight": 9', '0, "reason": "Buena \\"recuperación\\"."}}',
+]
+
+
+class FakeStreamClient:
+    def __init__(self, chunks, error=None, delay=0):
+        self.chunks = chunks
+        self.error = error
+        self.delay = delay
+        self.saved_while_streaming = []
+
+    async def stream_chat(self, messages, **kwargs):
+        for chunk in self.chunks:
+            self.saved_while_streaming.append(await sync_to_async(ExerciseAdjustment.objects.count)())
+            await asyncio.sleep(self.delay)
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+class AdjustmentJobTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        CoachAthlete.objects.create(coach=self.coach, athlete=self.athlete)
+        block = TrainingBlock.objects.create(
+            athlete=self.athlete, coach=self.coach, name="Bloque",
+            start_date=date(2025, 1, 6), end_date=date(2025, 2, 2),
+        )
+        self.session = TrainingSession.objects.create(block=block, date=date(2025, 1, 6), status="in_progress")
+        for name in ("Sentadilla", "Bench Press", "Peso muerto"):
+            Exercise.objects.create(session=self.session, name=name, sets=5, reps=5, weight=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.athlete)
+        caches["ai_adjustments"].clear()
+
+    def post_feedback(self, **scores):
+        data = {"sleep_quality": 5, "fatigue": 8, "stress": 6, **scores}
+        return self.client.post("/feedback/", data, format="json")
+
+    def test_feedback_is_queued_and_applied_by_the_worker(self):
+        with patch("ai.adjustments.get_client") as client:
+            response = self.post_feedback()
+            client.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["job_id"]
+        self.assertEqual(self.client.get(f"/feedback/jobs/{job_id}/").data["status"], "pending")
+
+        with patch("ai.adjustments.request_adjustments", return_value=AI_ADJUSTMENTS):
+            call_command("run_adjustment_worker", "--once", stdout=StringIO())
+
+        response = self.client.get(f"/feedback/jobs/{job_id}/")
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(len(response.data["adjustments"]), 2)
+        self.assertEqual(Exercise.objects.get(name="Sentadilla").weight, 140)
+        self.assertEqual(ExerciseAdjustment.objects.filter(job_id=job_id).count(), 2)
+
+        # El coach del atleta también puede consultarlo; otro usuario no
+        self.client.force_authenticate(self.coach)
+        self.assertEqual(self.client.get(f"/feedback/jobs/{job_id}/").status_code, 200)
+        other = CustomUser.objects.create_user("otro@plift.cl", "pass1234", role="coach")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f"/feedback/jobs/{job_id}/").status_code, 404)
+
+    @override_settings(AI_LATENCY_BUDGET=3600)
+    def test_api_errors_are_retried_then_fall_back_to_rules(self):
+        job_id = self.post_feedback().data["job_id"]
+        with patch("ai.adjustments.request_adjustments", side_effect=openai.OpenAIError("timeout")), \
+                self.assertLogs("ai.jobs", level="WARNING"):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                AdjustmentJob.objects.filter(pk=job_id).update(run_after=timezone.now())
+                job = run_job(claim_next())
+                self.assertEqual(job.attempts, attempt)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.engine, "rules")
+        self.assertEqual(job.error, "timeout")
+        self.assertEqual(ExerciseAdjustment.objects.filter(job=job).count(), 3)
+        self.assertIsNone(claim_next())
+
+    def test_open_circuit_and_late_jobs_use_the_rules(self):
+        self.post_feedback()
+        with patch("ai.adjustments.request_adjustments", side_effect=CircuitOpenError("abierto")) as request, \
+                self.assertLogs("ai.jobs", level="WARNING"):
+            job = run_job(claim_next())
+            self.assertEqual((job.status, job.engine, job.result["engine"]), ("done", "rules", "rules"))
+
+            # Un job que esperó en la cola más que el plazo no llama a la IA
+            self.post_feedback(fatigue=3)
+            AdjustmentJob.objects.filter(status="pending").update(created_at=timezone.now() - timedelta(minutes=5))
+            job = run_job(claim_next())
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual((job.status, job.engine), ("done", "rules"))
+
+    def test_rules_engine_adjusts_in_the_request(self):
+        with patch("ai.adjustments.request_adjustments") as request:
+            response = self.post_feedback(engine="rules", soreness="Dolor de rodilla")
+        request.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["status"], response.data["engine"]), ("done", "rules"))
+        adjustments = {a.exercise.name: a for a in ExerciseAdjustment.objects.filter(job_id=response.data["job_id"])}
+        self.assertEqual(len(adjustments), 3)
+        self.assertTrue(adjustments["Sentadilla"].reason.startswith("Ajuste automático por reglas."))
+        # La rodilla solo afecta a la sentadilla
+        self.assertLess(adjustments["Sentadilla"].weight, adjustments["Bench Press"].weight)
+        self.assertEqual(Exercise.objects.get(name="Sentadilla").sets, 3)
+        self.assertIsNone(claim_next())
+
+        self.assertEqual(self.post_feedback(engine="gpt").status_code, 400)
+
+    def test_rules_only_lower_the_plan(self):
+        plan = {
+            "Sentadilla": Exercise(name="Sentadilla", sets=5, reps=5, weight=100, rpe=8),
+            "Bench Press": Exercise(name="Bench Press", sets=5, reps=5, weight=80),
+            "Peso muerto": Exercise(name="Peso muerto", sets=3, reps=3, weight=150, rpe=7),
+        }
+        rested = rule_adjustments(plan, AthleteFeedback(sleep_quality=9, fatigue=2, stress=2))
+        self.assertEqual([(a["sets"], a["weight"]) for a in rested.values()], [(5, 100), (5, 80), (3, 150)])
+
+        tired = rule_adjustments(plan, AthleteFeedback(sleep_quality=3, fatigue=9, stress=8), acwr=1.8)
+        # Disposición 18.5/100 y pico de carga: RPE 8 -> 6 y una serie menos
+        self.assertEqual((tired["Squat"]["sets"], tired["Squat"]["weight"]), (4, 95))
+        self.assertEqual(tired["Bench"]["weight"], 75)
+        # Planificado ya en RPE 7: se baja fuera de la tabla
+        self.assertEqual((tired["Deadlift"]["sets"], tired["Deadlift"]["weight"]), (2, 140))
+        self.assertIn("ACWR 1.80", tired["Squat"]["reason"])
+
+    def test_scores_outside_the_scale_are_rejected(self):
+        for scores in ({"fatigue": 11}, {"sleep_quality": 0}, {"stress": -3}):
+            response = self.post_feedback(engine="rules", **scores)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(scores)), response.data)
+        self.assertFalse(AdjustmentJob.objects.exists())
+
+        # Fuera de la API, la disposición negativa cae en el último tramo
+        plan = {"Sentadilla": Exercise(name="Sentadilla", sets=5, reps=5, weight=100, rpe=8)}
+        adjustments = rule_adjustments(plan, AthleteFeedback(sleep_quality=0, fatigue=11, stress=11))
+        self.assertEqual(adjustments["Squat"]["sets"], 4)
+        self.assertLess(adjustments["Squat"]["weight"], 100)
+
+    def test_unexpected_errors_do_not_stop_the_worker(self):
+        job_id = self.post_feedback().data["job_id"]
+        with patch("ai.jobs.get_adjustments", side_effect=RuntimeError("db caída")), \
+                self.assertLogs("ai.jobs", level="ERROR"):
+            call_command("run_adjustment_worker", "--once", stdout=StringIO())
+        job = AdjustmentJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertIn("db caída", job.error)
+
+        # Un job colgado en el último intento se marca fallido y no se reclama
+        AdjustmentJob.objects.filter(pk=job_id).update(
+            status="running", attempts=MAX_ATTEMPTS, started_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertIsNone(claim_next())
+        self.assertEqual(AdjustmentJob.objects.get(pk=job_id).status, "failed")
+
+    def test_client_retries_reuse_the_job(self):
+        first = self.post_feedback(soreness="Rodilla")
+        retry = self.post_feedback(soreness="Rodilla")
+        other = self.post_feedback(fatigue=3)
+        self.assertEqual(first.data["job_id"], retry.data["job_id"])
+        self.assertNotEqual(first.data["job_id"], other.data["job_id"])
+        self.assertEqual(AdjustmentJob.objects.count(), 2)
+
+    def test_identical_contexts_reuse_the_cached_adjustments(self):
+        # Otro atleta con el mismo plan y el mismo feedback (ignorando mayúsculas y espacios)
+        twin = CustomUser.objects.create_user("gemelo@plift.cl", "pass1234", role="athlete")
+        block = TrainingBlock.objects.create(
+            athlete=twin, name="Bloque", start_date=date(2025, 1, 6), end_date=date(2025, 2, 2),
+        )
+        session = TrainingSession.objects.create(block=block, date=date(2025, 1, 6), status="in_progress")
+        for name in ("Peso muerto", "Sentadilla", "Bench Press"):
+            Exercise.objects.create(session=session, name=name, sets=5, reps=5, weight=100)
+
+        self.post_feedback(soreness="Rodilla  izquierda")
+        self.client.force_authenticate(twin)
+        self.post_feedback(soreness="rodilla izquierda ")
+        with patch("ai.adjustments.request_adjustments", return_value=AI_ADJUSTMENTS) as request:
+            first, repeated = run_job(claim_next()), run_job(claim_next())
+            self.post_feedback(fatigue=3)
+            different = run_job(claim_next())
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual([job.result["cached"] for job in (first, repeated, different)], [False, True, False])
+        self.assertEqual(repeated.result["adjustments"], AI_ADJUSTMENTS)
+        self.assertEqual(session.exercises.get(name="Sentadilla").weight, 140)
+
+    def test_replies_without_known_lifts_are_not_cached(self):
+        for reply in ({}, {"foo": {"sets": 3, "reps": 5, "weight": 100}}):
+            self.assertFalse(is_complete(reply))
+        self.assertTrue(is_complete({"Squat": AI_ADJUSTMENTS["Squat"]}))
+
+    def test_prompt_reads_the_stored_readiness(self):
+        feedback = AthleteFeedback.objects.create(athlete=self.athlete, sleep_quality=5, fatigue=8, stress=6)
+        with patch("ai.adjustments.refresh_readiness", wraps=refresh_readiness) as refresh:
+            prompt_for(self.athlete, feedback, self.session)
+            self.assertEqual(refresh.call_count, 1)
+            AthleteReadiness.objects.filter(athlete=self.athlete).update(
+                as_of=timezone.localdate() - timedelta(days=7), acute_load=100, chronic_load=50,
+            )
+            _, context = prompt_for(self.athlete, feedback, self.session)
+        # Con fila guardada no se recalcula: solo se aplica el decaimiento hasta hoy
+        self.assertEqual(refresh.call_count, 1)
+        acute, chronic, _ = decayed_loads(AthleteReadiness.objects.get(athlete=self.athlete), timezone.localdate())
+        self.assertIn(f"Carga aguda: {round(acute, 1)}, crónica: {round(chronic, 1)}", context)
+
+    def test_incomplete_replies_are_not_cached(self):
+        job_id = self.post_feedback().data["job_id"]
+        with patch("ai.adjustments.request_adjustments", return_value={"Squat": {"sets": 3}}) as request, \
+                self.assertLogs("ai.jobs", level="WARNING"):
+            run_job(claim_next())
+            AdjustmentJob.objects.filter(pk=job_id).update(run_after=timezone.now())
+            run_job(claim_next())
+        self.assertEqual(request.call_count, 2)
+
+    def test_empty_replies_fall_back_to_rules(self):
+        self.post_feedback()
+        with patch("ai.adjustments.request_adjustments", return_value={}), \
+                self.assertLogs("ai.jobs", level="WARNING"):
+            job = run_job(claim_next())
+        self.assertEqual((job.status, job.engine, job.error), ("done", "rules", "Respuesta de IA inválida."))
+        self.assertEqual(len(job.result["modified_exercises"]), 3)
+        self.assertEqual(ExerciseAdjustment.objects.filter(job=job).count(), 3)
+
+    def test_completed_sessions_are_not_adjusted(self):
+        self.post_feedback()
+        TrainingSession.objects.filter(pk=self.session.pk).update(status="completed")
+        with patch("ai.adjustments.request_adjustments", return_value=AI_ADJUSTMENTS) as request:
+            job = run_job(claim_next())
+        request.assert_not_called()
+        self.assertEqual(job.status, "failed")
+        self.assertFalse(ExerciseAdjustment.objects.exists())
+
+    def test_stream_parser_emits_each_lift_when_complete(self):
+        parser = AdjustmentStreamParser()
+        emitted = [parser.feed(chunk) for chunk in AI_REPLY_CHUNKS]
+        self.assertEqual(emitted[:3], [[], [], []])
+        self.assertEqual(emitted[3], [("Squat", {**AI_ADJUSTMENTS["Squat"], "reason": "Fatiga alta, se baja el {volumen}."})])
+        self.assertEqual(emitted[4], [])
+        self.assertEqual(emitted[5], [("Bench", {**AI_ADJUSTMENTS["Bench"], "reason": 'Buena "recuperación".'})])
+
+    async def stream_feedback(self, client, **scores):
+        token = await sync_to_async(AccessToken.for_user)(self.athlete)
+        with patch("ai.streaming.get_async_client", return_value=client):
+            response = await self.async_client.post(
+                "/feedback/stream/", {"sleep_quality": 5, "fatigue": 8, "stress": 6, **scores},
+                content_type="application/json", headers={"Authorization": f"Bearer {token}"},
+            )
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        return response, parse_events(body.decode())
+
+    async def test_stream_saves_each_adjustment_as_it_arrives(self):
+        client = FakeStreamClient(AI_REPLY_CHUNKS)
+        response, events = await self.stream_feedback(client)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual([event for event, _ in events], ["job", "adjustment", "adjustment", "done"])
+        self.assertEqual(events[1][1]["exercise"], "Sentadilla")
+        # La sentadilla ya estaba guardada antes de recibir el press banca
+        self.assertEqual(client.saved_while_streaming, [0, 0, 0, 0, 1, 1])
+
+        job = await AdjustmentJob.objects.aget(pk=events[0][1]["job_id"])
+        self.assertEqual((job.status, job.engine), ("done", "ai"))
+        self.assertEqual(job.result["adjustments"].keys(), AI_ADJUSTMENTS.keys())
+        self.assertEqual((await Exercise.objects.aget(name="Bench Press")).weight, 90)
+        self.assertIsNone(await sync_to_async(claim_next)())
+
+    async def test_stream_falls_back_to_rules_for_missing_lifts(self):
+        client = FakeStreamClient(AI_REPLY_CHUNKS[:4], error=openai.APIConnectionError(request=None))
+        with self.assertLogs("ai.jobs", level="WARNING"):
+            _, events = await self.stream_feedback(client)
+        self.assertEqual(
+            [(event, data.get("exercise")) for event, data in events],
+            [("job", None), ("adjustment", "Sentadilla"), ("error", None),
+             ("adjustment", "Bench Press"), ("adjustment", "Peso muerto"), ("done", None)],
+        )
+        self.assertTrue(events[3][1]["reason"].startswith("Ajuste automático por reglas."))
+        job = await AdjustmentJob.objects.aget(pk=events[0][1]["job_id"])
+        self.assertEqual((job.status, job.engine), ("done", "rules"))
+
+    @override_settings(AI_LATENCY_BUDGET=1)
+    async def test_slow_stream_falls_back_when_the_budget_runs_out(self):
+        # Cada trozo llega a tiempo para el timeout de lectura, pero el total se pasa del plazo
+        client = FakeStreamClient(AI_REPLY_CHUNKS, delay=0.2)
+        with self.assertLogs("ai.jobs", level="WARNING"):
+            _, events = await self.stream_feedback(client)
+        self.assertEqual(
+            [(event, data.get("exercise")) for event, data in events],
+            [("job", None), ("adjustment", "Sentadilla"), ("error", None),
+             ("adjustment", "Bench Press"), ("adjustment", "Peso muerto"), ("done", None)],
+        )
+        self.assertEqual(events[2][1]["detail"], "La IA no respondió dentro del plazo.")
+
+    async def test_stream_retries_reuse_the_job(self):
+        _, first = await self.stream_feedback(FakeStreamClient(AI_REPLY_CHUNKS))
+        client = FakeStreamClient(AI_REPLY_CHUNKS)
+        _, retry = await self.stream_feedback(client)
+        self.assertEqual([event for event, _ in retry], ["job", "done"])
+        self.assertEqual(retry[0][1]["job_id"], first[0][1]["job_id"])
+        self.assertEqual(retry[1][1]["result"]["adjustments"].keys(), AI_ADJUSTMENTS.keys())
+        self.assertEqual(client.saved_while_streaming, [])
+        self.assertEqual(await AdjustmentJob.objects.acount(), 1)
+        self.assertEqual(await AthleteFeedback.objects.acount(), 1)
+        self.assertEqual(await ExerciseAdjustment.objects.acount(), 2)
+
+    async def test_disconnected_stream_closes_the_job(self):
+        feedback = await AthleteFeedback.objects.acreate(
+            athlete=self.athlete, session=self.session, sleep_quality=5, fatigue=8, stress=6,
+        )
+        job = await sync_to_async(start_job)(feedback, self.session)
+        events = stream_adjustments(job)
+        with patch("ai.streaming.get_async_client", return_value=FakeStreamClient(AI_REPLY_CHUNKS)):
+            self.assertTrue((await anext(events)).startswith("event: job"))
+            self.assertTrue((await anext(events)).startswith("event: adjustment"))
+            await events.aclose()  # el cliente se va tras el primer ajuste
+
+        job = await AdjustmentJob.objects.aget(pk=job.pk)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(list(job.result["adjustments"]), ["Squat"])
+        self.assertEqual(await ExerciseAdjustment.objects.acount(), 1)
+        # El worker no lo retoma aunque pase STALE_AFTER
+        await AdjustmentJob.objects.filter(pk=job.pk).aupdate(started_at=timezone.now() - timedelta(hours=1))
+        self.assertIsNone(await sync_to_async(claim_next)())
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.post("/feedback/stream/", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+
+@skipUnless(connection.vendor == "postgresql", "SELECT ... FOR UPDATE solo bloquea en PostgreSQL")
+class ConcurrentFeedbackTests(TransactionTestCase):
+    def test_simultaneous_retries_create_one_job(self):
+        athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        block = TrainingBlock.objects.create(
+            athlete=athlete, name="Bloque", start_date=date(2025, 1, 6), end_date=date(2025, 2, 2),
+        )
+        TrainingSession.objects.create(block=block, date=date(2025, 1, 6), status="in_progress")
+        barrier = threading.Barrier(4)
+        job_ids = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(athlete)
+            barrier.wait()
+            try:
+                data = {"sleep_quality": 5, "fatigue": 8, "stress": 6}
+                job_ids.append(client.post("/feedback/", data, format="json").data["job_id"])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(job_ids)), 1)
+        self.assertEqual(AdjustmentJob.objects.count(), 1)
+        self.assertEqual(AthleteFeedback.objects.count(), 1)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que el cliente pueda reutilizar la conexión
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        server.requests += 1
+        server.connections.add(self.client_address)
+        behaviour = server.script.pop(0) if server.script else "ok"
+        if behaviour == "slow":
+            time.sleep(0.5)
+        if behaviour == "fail":
+            body, code = b'{"error": {"message": "boom"}}', 500
+        elif behaviour == "bad":
+            body, code = b'{"error": {"message": "bad request"}}', 400
+        else:
+            body, code = json.dumps({
+                "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": '{"Squat": {}}'}}],
+            }).encode(), 200
+        try:
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # el cliente ya abandonó la petición lenta
+
+    def log_message(self, *args):
+        pass
+
+
+class LLMClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+        self.server.daemon_threads = True
+        self.server.script, self.server.requests, self.server.connections = [], 0, set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.now = 0.0
+        self.breaker = CircuitBreaker(threshold=3, cooldown=30, clock=lambda: self.now)
+        self.sleeps = []
+        self.client = LLMClient(
+            api_key="test", base_url=f"http://127.0.0.1:{self.server.server_port}/v1",
+            connect_timeout=1, read_timeout=0.2, max_retries=2, max_connections=4,
+            breaker=self.breaker, sleep=self.sleeps.append,
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def chat(self):
+        return self.client.chat([{"role": "user", "content": "hola"}], model="stub")
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.assertEqual(self.chat(), '{"Squat": {}}')
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_failures_are_retried_with_jittered_backoff(self):
+        self.server.script = ["fail", "slow"]
+        self.assertEqual(self.chat(), '{"Squat": {}}')
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[0] <= 0.5 and 0 <= self.sleeps[1] <= 1.0)
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_retries_are_bounded(self):
+        self.server.script = ["slow", "slow", "slow", "ok"]
+        with self.assertRaises(openai.APITimeoutError):
+            self.chat()
+        self.assertEqual(self.server.requests, 3)
+
+    def test_deadline_bounds_the_whole_call(self):
+        # Con timeout de lectura holgado, el plazo corta el primer intento y no se reintenta
+        self.client.read_timeout = 5
+        self.server.script = ["slow", "slow", "slow"]
+        start = time.monotonic()
+        with self.assertRaises(openai.APITimeoutError):
+            self.client.chat([{"role": "user", "content": "hola"}], model="stub", deadline=start + 0.3)
+        self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.sleeps, [])
+
+        with self.assertRaises(DeadlineExceededError):
+            self.client.chat([{"role": "user", "content": "hola"}], model="stub", deadline=time.monotonic())
+        self.assertEqual(self.server.requests, 1)
+
+    def test_circuit_opens_and_recovers(self):
+        self.server.script = ["fail"] * 3
+        with self.assertRaises(openai.InternalServerError):
+            self.chat()  # el tercer fallo seguido abre el circuito
+        self.assertEqual(self.server.requests, 3)
+        with self.assertRaises(CircuitOpenError):
+            self.chat()
+        self.assertEqual(self.server.requests, 3)
+
+        # Pasado el enfriamiento, una llamada de prueba exitosa lo cierra
+        self.now = 31
+        self.assertEqual(self.chat(), '{"Squat": {}}')
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_rejected_trial_call_does_not_leave_the_circuit_half_open(self):
+        self.server.script = ["fail"] * 3
+        with self.assertRaises(openai.InternalServerError):
+            self.chat()
+        self.assertEqual(self.breaker.state, "open")
+
+        # La llamada de prueba recibe un 400: el proveedor responde, el circuito se cierra
+        self.now = 31
+        self.server.script = ["bad"]
+        with self.assertRaises(openai.BadRequestError):
+            self.chat()
+        self.assertEqual(self.breaker.state, "closed")
+        self.now = 10000
+        self.assertEqual(self.chat(), '{"Squat": {}}')
+
+    def test_abandoned_trial_call_allows_another(self):
+        self.breaker.state, self.breaker.opened_at = "open", 0
+        self.now = 31
+        with patch.object(self.client.openai.chat.completions, "create", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.chat()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(self.chat(), '{"Squat": {}}')
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class AsyncLLMClientTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=1, cooldown=30, clock=lambda: 31)
+        self.breaker.state, self.breaker.opened_at = "open", 0
+
+    def client_for(self, status, body):
+        client = AsyncLLMClient("test", "http://llm.test/v1", 1, 1, 2, self.breaker)
+        transport = httpx.MockTransport(lambda request: httpx.Response(status, headers={
+            "content-type": "text/event-stream" if status == 200 else "application/json",
+        }, content=body))
+        client.openai = openai.AsyncOpenAI(
+            api_key="test", base_url="http://llm.test/v1", max_retries=0,
+            http_client=httpx.AsyncClient(transport=transport),
+        )
+        return client
+
+    def test_each_event_loop_closes_its_client(self):
+        self.addCleanup(reset_client)
+
+        async def clients():
+            return get_async_client(), get_async_client()
+
+        first, again = asyncio.run(clients())
+        self.assertIs(first, again)
+        self.assertTrue(first.http.is_closed)
+        second, _ = asyncio.run(clients())
+        self.assertIsNot(second, first)
+        self.assertTrue(second.http.is_closed)
+
+    async def test_disconnect_during_the_trial_call_allows_another(self):
+        chunk = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                 "choices": [{"index": 0, "delta": {"content": '{"Sq'}, "finish_reason": None}]}
+        client = self.client_for(200, f"data: {json.dumps(chunk)}\n\n" * 2 + "data: [DONE]\n\n")
+        stream = client.stream_chat([{"role": "user", "content": "hola"}], model="stub")
+        self.assertEqual(await anext(stream), '{"Sq')
+        self.assertEqual(self.breaker.state, "half_open")
+        await stream.aclose()
+        self.assertEqual(self.breaker.state, "open")
+
+        chunks = [text async for text in client.stream_chat([{"role": "user", "content": "hola"}], model="stub")]
+        self.assertEqual(chunks, ['{"Sq', '{"Sq'])
+        self.assertEqual(self.breaker.state, "closed")
+
+    async def test_rejected_trial_call_closes_the_circuit(self):
+        client = self.client_for(400, b'{"error": {"message": "bad request"}}')
+        with self.assertRaises(openai.BadRequestError):
+            [text async for text in client.stream_chat([{"role": "user", "content": "hola"}], model="stub")]
+        self.assertEqual(self.breaker.state, "closed")
@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import athlete_feedback
+from .views import athlete_feedback, athlete_feedback_stream, feedback_job_status
 
 urlpatterns = [
     path("feedback/", athlete_feedback, name="athlete_feedback"),
+    path("feedback/stream/", athlete_feedback_stream, name="athlete_feedback_stream"),
+    path("feedback/jobs/<int:job_id>/", feedback_job_status, name="feedback_job_status"),
 ]
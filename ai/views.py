@@ -1,152 +1,197 @@
-import os
 import json
-import openai
-from openai import OpenAI
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from training.models import AthleteProgress, TrainingSession, Exercise
-from .models import ExerciseAdjustment
-from .serializer import AthleteFeedbackSerializer
-from django.conf import settings
+from training.models import CoachAthlete, TrainingSession
+from training.readiness import refresh_readiness_on_commit
+from .jobs import enqueue, run_inline
+from .models import AdjustmentJob
+from .serializer import AthleteFeedbackSerializer, AdjustmentJobSerializer
+from .streaming import replay_job, start_job, stream_adjustments
+
+# Lapso en que un feedback idéntico se trata como reintento del cliente
+RETRY_WINDOW = timedelta(minutes=10)
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def athlete_feedback(request):
     """
-    El atleta responde feedback diario y se ajusta la última sesión activa automáticamente,
-    sin modificar sesiones que ya estén finalizadas.
+    El atleta responde feedback diario y se encola el ajuste de la última sesión
+    activa, sin modificar sesiones que ya estén finalizadas. Responde 202 con el
+    id del job; el ajuste lo aplica run_adjustment_worker.
+    Con engine="rules" el ajuste se calcula al momento con las reglas locales
+    y se responde 200 con el resultado.
     """
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    engine = request.data.get("engine", AdjustmentJob.Engine.AI)
+    if engine not in AdjustmentJob.Engine.values:
+        return Response(
+            {"engine": [f"Motor no válido. Opciones: {', '.join(AdjustmentJob.Engine.values)}."]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     serializer = AthleteFeedbackSerializer(data=request.data)
     if serializer.is_valid():
 
-        # Buscar sesión en progreso
-        session = TrainingSession.objects.filter(
-            block__athlete=request.user, 
-            status="in_progress"
-        ).first()
+        data = serializer.validated_data
+        with transaction.atomic():
+            # Buscar sesión en progreso. Se bloquea su fila para que dos reintentos
+            # simultáneos no pasen ambos la verificación de duplicado
+            session = TrainingSession.objects.select_for_update().filter(
+                athlete=request.user,
+                status="in_progress"
+            ).first()
 
-        if not session:
-            return Response(
-                {"error": "No hay una sesión activa para ajustar."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Guardar feedback
-        feedback = serializer.save(athlete=request.user, session=session)
-        progress = AthleteProgress.objects.filter(athlete=request.user).order_by("-date")[:3]
-        
-        # Contexto para el modelo
-        context = f"""
-Atleta: {request.user.first_name} {request.user.last_name}
-Peso corporal: {request.user.bodyweight_kg} kg
-Feedback diario:
-- Sueño: {feedback.sleep_quality}/10
-- Fatiga: {feedback.fatigue}/10
-- Estrés: {feedback.stress}/10
-- Dolores: {feedback.soreness or 'Ninguno'}
-
-Últimos progresos:
-{", ".join([f"{p.exercise}: {p.best_weight}kg (1RM est: {p.estimated_1rm})" for p in progress])}
-
-Devuelve un JSON con este formato para los ejercicios de powerlifting:
-{{
-    "Squat": {{"sets": int, "reps": int, "weight": float, "reason": "motivo del ajuste"}},
-    "Bench": {{"sets": int, "reps": int, "weight": float, "reason": "motivo del ajuste"}},
-    "Deadlift": {{"sets": int, "reps": int, "weight": float, "reason": "motivo del ajuste"}}
-}}
-"""
-
-        try:
-            completion = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """
-Eres un coach de powerlifting experto. 
-Tu tarea es analizar el feedback diario del atleta y ajustar los ejercicios principales (Squat, Bench y Deadlift).
-Debes devolver únicamente un JSON con los ajustes propuestos. 
-
-En cada ajuste incluye:
-- sets, reps, y weight con valores numéricos adecuados.
-- un campo "reason" con una explicación detallada (mínimo 2 oraciones) del por qué se realizó el ajuste, 
-  considerando el estado del atleta (fatiga, estrés, sueño, dolores, rendimiento reciente, etc.).
-  Usa un lenguaje natural, empático y técnico como un coach humano.
-
-Ejemplo:
-{
-  "Squat": {"sets": 4, "reps": 6, "weight": 80, 
-  "reason": "El atleta mostró buena recuperación y bajo nivel de fatiga, por lo que se mantiene la intensidad habitual para sostener la progresión."}
-}
-"""
-                    },
-                    {"role": "user", "content": context}
-                ],
-                max_tokens=600,
-                temperature=0.7
-            )
-
-            ai_reply = completion.choices[0].message.content.strip()
-
-            start_idx = ai_reply.find("{")
-            end_idx = ai_reply.rfind("}") + 1
-            if start_idx != -1 and end_idx != -1:
-                ai_reply = ai_reply[start_idx:end_idx]
-
-            try:
-                adjustments = json.loads(ai_reply)
-            except json.JSONDecodeError:
-                adjustments = {}
-
-            modified = []
-
-            # Verificación adicional para no modificar sesiones terminadas
-            if session.status != "completed":
-                name_map = {
-                    "Squat": "Sentadilla",
-                    "Bench": "Bench Press",
-                    "Deadlift": "Peso muerto"
-                }
-
-                for ai_name, db_name in name_map.items():
-                    if ai_name in adjustments:
-                        ex = session.exercises.filter(name=db_name).first()
-                        if ex:
-                            ex.sets = adjustments[ai_name]["sets"]
-                            ex.reps = adjustments[ai_name]["reps"]
-                            ex.weight = adjustments[ai_name]["weight"]
-                            ex.save()
-
-                            ExerciseAdjustment.objects.create(
-                                exercise=ex,
-                                sets=ex.sets,
-                                reps=ex.reps,
-                                weight=ex.weight,
-                                reason=adjustments[ai_name].get("reason", "")
-                            )
-
-                            modified.append({
-                                "name": db_name,
-                                "reason": adjustments[ai_name].get("reason", "")
-                            })
-            else:
+            if not session:
                 return Response(
-                    {"error": "No se pueden modificar sesiones ya completadas."},
+                    {"error": "No hay una sesión activa para ajustar."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            return Response({
-                "feedback": serializer.data,
-                "adjustments": adjustments,
-                "modified_exercises": modified,
-                "session_id": session.id if session else None
-            }, status=status.HTTP_201_CREATED)
+            # Un reintento del cliente (mismo feedback, misma sesión) recibe el job ya creado
+            duplicate = _retried_job(request.user, session, engine, data)
+            if duplicate:
+                return _job_response(duplicate, AthleteFeedbackSerializer(duplicate.feedback).data)
 
-        except openai.OpenAIError as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            # Guardar feedback y encolar (o resolver con reglas) el ajuste juntos
+            feedback = serializer.save(athlete=request.user, session=session)
+            refresh_readiness_on_commit([request.user.id])
+            if engine == AdjustmentJob.Engine.RULES:
+                job = run_inline(feedback, session)
+            else:
+                job = enqueue(feedback, session)
+
+        return _job_response(job, serializer.data)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _job_response(job, feedback_data):
+    data = {
+        "feedback": feedback_data,
+        "job_id": job.id,
+        "engine": job.engine,
+        "status": job.status,
+        "session_id": job.session_id,
+    }
+    if job.status in (AdjustmentJob.Status.PENDING, AdjustmentJob.Status.RUNNING):
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+    data["result"] = job.result
+    data["error"] = job.error
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def feedback_job_status(request, job_id):
+    """Estado del ajuste encolado; con status "done" incluye los ExerciseAdjustment creados."""
+    user = request.user
+    job = AdjustmentJob.objects.select_related("feedback").filter(pk=job_id).first()
+    if job is None:
+        return Response({"detail": "Job no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+    athlete_id = job.feedback.athlete_id
+    allowed = (
+        user.role == "admin"
+        or user.id == athlete_id
+        or (user.role == "coach" and CoachAthlete.objects.filter(coach=user, athlete_id=athlete_id).exists())
+    )
+    if not allowed:
+        return Response({"detail": "Job no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(AdjustmentJobSerializer(job).data)
+
+
+def _retried_job(user, session, engine, data):
+    """Job de un envío igual reciente (reintento del cliente). Llamar con la sesión bloqueada."""
+    return (
+        AdjustmentJob.objects
+        .filter(
+            session=session,
+            engine=engine,
+            feedback__athlete=user,
+            feedback__sleep_quality=data["sleep_quality"],
+            feedback__fatigue=data["fatigue"],
+            feedback__stress=data["stress"],
+            feedback__soreness=data.get("soreness"),
+            created_at__gte=timezone.now() - RETRY_WINDOW,
+        )
+        .exclude(status=AdjustmentJob.Status.FAILED)
+        .select_related("feedback")
+        .order_by("-id")
+        .first()
+    )
+
+
+def _authenticate(request):
+    result = JWTAuthentication().authenticate(request)
+    return result[0] if result else None
+
+
+def _start_stream(user, data):
+    """
+    Valida y guarda el feedback y crea el job del streaming. Devuelve
+    (job, es_nuevo, errores); un reintento recibe el job ya creado.
+    """
+    serializer = AthleteFeedbackSerializer(data=data)
+    if not serializer.is_valid():
+        return None, False, serializer.errors
+    with transaction.atomic():
+        # Igual que /feedback/: la fila bloqueada serializa los reintentos simultáneos
+        session = TrainingSession.objects.select_for_update().filter(athlete=user, status="in_progress").first()
+        if not session:
+            return None, False, {"error": "No hay una sesión activa para ajustar."}
+        duplicate = _retried_job(user, session, AdjustmentJob.Engine.AI, serializer.validated_data)
+        if duplicate:
+            return duplicate, False, None
+        feedback = serializer.save(athlete=user, session=session)
+        refresh_readiness_on_commit([user.id])
+        job = start_job(feedback, session)
+    return job, True, None
+
+
+async def athlete_feedback_stream(request):
+    """
+    Variante async de /feedback/ que responde con Server-Sent Events: cada
+    ajuste se guarda y se envía apenas el modelo termina ese ejercicio. Solo
+    transmite de a poco servida con ASGI (back_plift.asgi); con WSGI Django
+    junta todos los eventos antes de responder.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Las credenciales de autenticación no se proveyeron."},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"detail": "JSON inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+    job, created, errors = await sync_to_async(_start_stream)(user, data)
+    if errors:
+        return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    events = stream_adjustments(job) if created else replay_job(job)
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Que nginx no acumule la respuesta
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# Autenticación por JWT, sin cookies. En Django 4.2 @csrf_exempt no conserva las vistas async
+athlete_feedback_stream.csrf_exempt = True
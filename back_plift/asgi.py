@@ -3,6 +3,15 @@ ASGI config for back_plift project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las vistas async (p. ej. /feedback/stream/, con Server-Sent Events) solo
+transmiten de a poco con un servidor ASGI:
+
+    uvicorn back_plift.asgi:application --workers 4
+
+La exportación del historial también transmite con ASGI: la vista detecta
+la petición ASGI y entrega un iterador async, porque Django 4.2 cargaría
+entero en memoria uno síncrono antes de enviarlo.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
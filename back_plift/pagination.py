@@ -0,0 +1,31 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset): cada página filtra por la posición del
+    cursor en vez de usar OFFSET, así las páginas profundas cuestan lo mismo
+    que la primera. El tamaño de página lo limita el servidor.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-id",)
+
+
+class BlockCursorPagination(DefaultCursorPagination):
+    # Índices block_athlete_start_idx / block_coach_start_idx
+    ordering = ("-start_date", "id")
+
+
+class SessionCursorPagination(DefaultCursorPagination):
+    ordering = ("date", "id")
+
+
+class ExerciseCursorPagination(DefaultCursorPagination):
+    ordering = ("id",)
+
+
+class ProgressCursorPagination(DefaultCursorPagination):
+    # Índice progress_athlete_date_idx
+    ordering = ("-date", "id")
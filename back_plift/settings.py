@@ -89,8 +89,9 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     "DEFAULT_FILTER_BACKENDS": (
-        "django_filters.rest_framework.DjangoFilterBackend"
+        "django_filters.rest_framework.DjangoFilterBackend",
     ),
+    "DEFAULT_PAGINATION_CLASS": "back_plift.pagination.DefaultCursorPagination",
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
@@ -123,3 +124,29 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 OPENAI_API_KEY = config('OPENAI_API_KEY')
+OPENAI_BASE_URL = config('OPENAI_BASE_URL', default='https://api.openai.com/v1')
+
+# Cliente LLM compartido por proceso (ai.llm)
+LLM_CONNECT_TIMEOUT = config('LLM_CONNECT_TIMEOUT', default=5, cast=float)
+LLM_READ_TIMEOUT = config('LLM_READ_TIMEOUT', default=30, cast=float)
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', default=2, cast=int)
+LLM_MAX_CONNECTIONS = config('LLM_MAX_CONNECTIONS', default=20, cast=int)
+LLM_BREAKER_THRESHOLD = config('LLM_BREAKER_THRESHOLD', default=5, cast=int)
+LLM_BREAKER_COOLDOWN = config('LLM_BREAKER_COOLDOWN', default=30, cast=float)
+# Segundos desde el feedback hasta el ajuste; pasado este plazo se usan las reglas locales
+AI_LATENCY_BUDGET = config('AI_LATENCY_BUDGET', default=20, cast=float)
+
+# Respuestas de IA memorizadas por contexto normalizado (ai.adjustments).
+# LocMemCache es por proceso y descarta primero lo menos usado; con varios
+# workers puede apuntarse a un backend compartido.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ai_adjustments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ai-adjustments',
+        'TIMEOUT': config('AI_CACHE_TTL', default=6 * 3600, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': config('AI_CACHE_MAX_ENTRIES', default=1000, cast=int)},
+    },
+}
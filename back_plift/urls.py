@@ -7,6 +7,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from training.urls import router as training_router
+from training.urls import urlpatterns as training_urls
 from ai.urls import urlpatterns as ai_urls
 
 
@@ -37,4 +38,4 @@ urlpatterns = [
 
     
     path("", include(router.urls)),
-] + auth_urls
+] + auth_urls + training_urls
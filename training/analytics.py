@@ -0,0 +1,170 @@
+import numpy as np
+from django.db.models.functions import Coalesce
+
+from .generator import MAIN_LIFTS
+from .models import Exercise
+from .rpe import RPE_COLUMNS, RPE_TABLE
+
+# Tabla RPE como matriz: fila = repeticiones (1..10), columna = RPE (10..7)
+PERCENTAGE_MATRIX = np.array([RPE_TABLE[reps] for reps in range(1, 11)])
+
+
+def load_history(athlete, start=None, end=None):
+    """
+    Historial de ejercicios completados del atleta como columnas NumPy,
+    en una sola consulta. Usa el peso/RPE real y, si falta, el planificado.
+    """
+    queryset = Exercise.objects.filter(athlete=athlete, completed=True)
+    if start:
+        queryset = queryset.filter(session__date__gte=start)
+    if end:
+        queryset = queryset.filter(session__date__lte=end)
+    rows = list(
+        queryset
+        .annotate(load=Coalesce("weight_actual", "weight"), effort=Coalesce("rpe_actual", "rpe"))
+        .filter(load__isnull=False)
+        .order_by("session__date", "id")
+        .values_list("session__date", "name", "sets", "reps", "load", "effort")
+    )
+    return columns_from_rows(rows)
+
+
+def columns_from_rows(rows):
+    dates, names, sets, reps, weights, rpes = zip(*rows) if rows else ((),) * 6
+    return {
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "name": np.array(names, dtype=object),
+        "sets": np.array(sets, dtype=np.float64),
+        "reps": np.array(reps, dtype=np.float64),
+        "weight": np.array(weights, dtype=np.float64),
+        "rpe": np.array([np.nan if r is None else r for r in rpes], dtype=np.float64),
+    }
+
+
+def estimated_1rm(weight, reps, rpe):
+    """Versión vectorizada de training.rpe.estimated_1rm."""
+    reps_index = np.clip(reps, 1, 10).astype(int) - 1
+    has_rpe = ~np.isnan(rpe)
+    # Columna más cercana; en empates (RPE 8.25, 7.25...) la de RPE más alto, como training.rpe.percentage
+    column = np.clip(np.ceil((RPE_COLUMNS[0] - np.nan_to_num(rpe, nan=10)) / 0.5 - 0.5), 0, len(RPE_COLUMNS) - 1)
+    from_table = weight / PERCENTAGE_MATRIX[reps_index, column.astype(int)]
+
+    # Fuera de la tabla: Epley sobre repeticiones + repeticiones en reserva
+    reserve = np.where(has_rpe, np.maximum(10 - np.nan_to_num(rpe, nan=10), 0), 0)
+    effective = reps + reserve
+    epley = np.where(effective <= 1, weight, weight * (1 + effective / 30))
+
+    in_table = has_rpe & (reps >= 1) & (reps <= 10) & (np.nan_to_num(rpe, nan=0) >= RPE_COLUMNS[-1])
+    return np.where(in_table, from_table, epley)
+
+
+def _week_start(dates):
+    # Lunes de cada semana (el 1970-01-01 fue jueves)
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    return (days - (days + 3) % 7).astype("datetime64[D]")
+
+
+def compute_load(history, one_rms=None):
+    """
+    Tonelaje, intensidad relativa, INOL y tendencia de e1RM por ejercicio.
+    `one_rms` (nombre -> 1RM) fija la referencia de intensidad; si falta se
+    usa el mejor e1RM del período. Sin referencia positiva (ejercicios sin
+    carga) la intensidad y el INOL se devuelven como null.
+    """
+    one_rms = one_rms or {}
+    result = {}
+    if not len(history["name"]):
+        return result
+
+    e1rm = estimated_1rm(history["weight"], history["reps"], history["rpe"])
+    tonnage = history["sets"] * history["reps"] * history["weight"]
+    weeks = _week_start(history["date"])
+
+    lifts, lift_index = np.unique(history["name"].astype(str), return_inverse=True)
+    for i, lift in enumerate(lifts):
+        mask = lift_index == i
+        reference = one_rms.get(lift) or float(e1rm[mask].max())
+        has_reference = reference > 0
+        intensity = history["weight"][mask] / reference if has_reference else np.zeros(mask.sum())
+        lift_reps = history["sets"][mask] * history["reps"][mask]
+        # INOL = repeticiones / (100 - %1RM), acotado para cargas >= 1RM
+        inol = lift_reps / np.maximum(100 - intensity * 100, 1)
+
+        lift_weeks, week_index = np.unique(weeks[mask], return_inverse=True)
+        weekly_tonnage = np.bincount(week_index, weights=tonnage[mask])
+        weekly_inol = np.bincount(week_index, weights=inol)
+        weekly_reps = np.bincount(week_index, weights=lift_reps)
+        weekly_intensity = np.bincount(week_index, weights=intensity * lift_reps) / np.maximum(weekly_reps, 1)
+        weekly_e1rm = np.full(len(lift_weeks), -np.inf)
+        np.maximum.at(weekly_e1rm, week_index, e1rm[mask])
+
+        days, day_index = np.unique(history["date"][mask], return_inverse=True)
+        daily_e1rm = np.full(len(days), -np.inf)
+        np.maximum.at(daily_e1rm, day_index, e1rm[mask])
+        slope = 0.0
+        if len(days) > 1:
+            elapsed_weeks = (days - days[0]).astype(np.float64) / 7
+            slope = float(np.polyfit(elapsed_weeks, daily_e1rm, 1)[0])
+
+        def relative(value, digits):
+            return round(float(value), digits) if has_reference else None
+
+        result[lift] = {
+            "reference_1rm": relative(reference, 1),
+            "tonnage": round(float(tonnage[mask].sum()), 1),
+            "reps": int(lift_reps.sum()),
+            "relative_intensity": relative((intensity * lift_reps).sum() / max(lift_reps.sum(), 1), 3),
+            "inol": relative(inol.sum(), 2),
+            "weekly": [
+                {
+                    "week": str(week),
+                    "tonnage": round(float(t), 1),
+                    "relative_intensity": relative(ri, 3),
+                    "inol": relative(n, 2),
+                    "best_e1rm": round(float(b), 1),
+                }
+                for week, t, ri, n, b in zip(lift_weeks, weekly_tonnage, weekly_intensity, weekly_inol, weekly_e1rm)
+            ],
+            "e1rm_trend": {
+                "slope_per_week": round(slope, 2),
+                "points": [
+                    {"date": str(day), "e1rm": round(float(value), 1)}
+                    for day, value in zip(days, daily_e1rm)
+                ],
+            },
+        }
+    return result
+
+
+def athlete_load(athlete, start=None, end=None):
+    one_rms = {lift: getattr(athlete, field) for lift, field in MAIN_LIFTS.items()}
+    return compute_load(load_history(athlete, start, end), one_rms)
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: índices de `threshold` puntos que
+    conservan la forma de la serie (picos incluidos). Siempre mantiene el
+    primero y el último.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Promedio del cubo siguiente: tercer vértice del triángulo
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(areas.argmax())
+        selected.append(a)
+    selected.append(n - 1)
+    return np.array(selected)
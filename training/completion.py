@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import TrainingBlock, TrainingSession
+
+
+def sessions_changed(block_id, total=0, completed=0):
+    """
+    Ajusta los contadores de sesiones del bloque con un único UPDATE atómico.
+    `completed` del bloque se recalcula en la misma sentencia: queda en True
+    cuando (tras el ajuste) todas sus sesiones están finalizadas.
+    """
+    if not total and not completed:
+        return
+    TrainingBlock.objects.filter(pk=block_id).update(
+        sessions_total=F("sessions_total") + total,
+        sessions_completed=F("sessions_completed") + completed,
+        updated_at=timezone.now(),
+        # Las expresiones del SET ven los valores previos a la actualización
+        completed=Case(
+            When(
+                sessions_total__gt=-total,
+                sessions_completed=F("sessions_total") + (total - completed),
+                then=Value(True),
+            ),
+            default=Value(False),
+        ),
+    )
+
+
+def exercises_changed(session_id, total=0, completed=0):
+    """
+    Ajusta los contadores de ejercicios de la sesión. Tras cualquier cambio
+    (ejercicios completados, agregados o quitados) la sesión pasa a
+    "completed" cuando todos lo están (o vuelve a "in_progress") y el cambio
+    se propaga al bloque.
+    """
+    if not total and not completed:
+        return
+    with transaction.atomic():
+        # Bloquea la fila para que coach y atleta no pisen sus cambios
+        session = TrainingSession.objects.select_for_update().get(pk=session_id)
+        session.exercises_total += total
+        session.exercises_completed += completed
+        fields = ["exercises_total", "exercises_completed"]
+
+        done = session.exercises_completed >= session.exercises_total > 0
+        if done and session.status != "completed":
+            session.status = "completed"
+            fields.append("status")
+            sessions_changed(session.block_id, completed=1)
+        elif not done and session.status == "completed":
+            session.status = "in_progress"
+            fields.append("status")
+            sessions_changed(session.block_id, completed=-1)
+
+        session.save(update_fields=fields)
+
+
+def session_status_changed(session, previous_status):
+    # Mantiene el contador del bloque cuando una sesión entra o sale de "completed"
+    was_completed = previous_status == "completed"
+    is_completed = session.status == "completed"
+    if was_completed != is_completed:
+        sessions_changed(session.block_id, completed=1 if is_completed else -1)
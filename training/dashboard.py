@@ -0,0 +1,80 @@
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from ai.models import AthleteFeedback
+from authentication.models import CustomUser
+from .models import TrainingBlock, TrainingSession, AthleteProgress
+from .progress import first_per_lift
+
+BLOCK_FIELDS = ("id", "athlete_id", "name", "periodization", "start_date", "end_date",
+                "sessions_total", "sessions_completed")
+SESSION_FIELDS = ("id", "athlete_id", "block_id", "date", "exercises_total", "exercises_completed")
+FEEDBACK_FIELDS = ("id", "athlete_id", "session_id", "sleep_quality", "fatigue", "stress", "soreness", "created_at")
+PROGRESS_FIELDS = ("athlete_id", "exercise", "best_weight", "estimated_1rm", "date")
+
+
+def first_per(queryset, partition, order_by):
+    # Primera fila de cada partición con ROW_NUMBER() en la misma consulta
+    return queryset.annotate(
+        row=Window(RowNumber(), partition_by=[F(field) for field in partition], order_by=order_by)
+    ).filter(row=1)
+
+
+def _by_athlete(rows):
+    return {row.pop("athlete_id"): row for row in rows}
+
+
+def coach_dashboard(coach, today=None):
+    """
+    Resumen de todos los atletas del coach en 6 consultas, sin importar
+    cuántos atletas tenga: bloque actual, sesión en progreso, último
+    feedback, último progreso por ejercicio y adherencia del bloque actual.
+    """
+    today = today or timezone.localdate()
+    athletes = list(
+        CustomUser.objects
+        .filter(coaches__coach=coach)
+        .order_by("first_name", "last_name", "id")
+        .values("id", "email", "first_name", "last_name")
+    )
+    ids = [athlete["id"] for athlete in athletes]
+
+    # Bloque en curso o, si no hay, el próximo en empezar
+    blocks = _by_athlete(first_per(
+        TrainingBlock.objects.filter(coach=coach, athlete__in=ids, end_date__gte=today),
+        ["athlete"], [F("start_date").asc(), F("id").asc()],
+    ).values(*BLOCK_FIELDS))
+    sessions = _by_athlete(first_per(
+        TrainingSession.objects.filter(coach=coach, athlete__in=ids, status="in_progress"),
+        ["athlete"], [F("date").desc(), F("id").desc()],
+    ).values(*SESSION_FIELDS))
+    feedback = _by_athlete(first_per(
+        AthleteFeedback.objects.filter(athlete__in=ids),
+        ["athlete"], [F("created_at").desc(), F("id").desc()],
+    ).values(*FEEDBACK_FIELDS))
+
+    progress = {}
+    for row in first_per_lift(AthleteProgress.objects.filter(athlete__in=ids), "-date", "-id").values(*PROGRESS_FIELDS):
+        progress.setdefault(row.pop("athlete_id"), {})[row.pop("exercise")] = row
+
+    # Adherencia: sesiones ya vencidas del bloque actual que están finalizadas
+    adherence = {
+        row["athlete_id"]: round(100 * row["done"] / row["due"], 1)
+        for row in TrainingSession.objects
+        .filter(block__in=[block["id"] for block in blocks.values()], date__lte=today)
+        .values("athlete_id")
+        .annotate(due=Count("id"), done=Count("id", filter=Q(status="completed")))
+    }
+
+    return [
+        {
+            "athlete": athlete,
+            "current_block": blocks.get(athlete["id"]),
+            "in_progress_session": sessions.get(athlete["id"]),
+            "last_feedback": feedback.get(athlete["id"]),
+            "latest_progress": progress.get(athlete["id"], {}),
+            "adherence": adherence.get(athlete["id"]),
+        }
+        for athlete in athletes
+    ]
@@ -0,0 +1,123 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ai.models import AthleteFeedback, ExerciseAdjustment
+from .models import TrainingBlock, TrainingSession, Exercise
+
+CHUNK_SIZE = 2000
+
+# Tipo de registro -> (queryset del atleta, columnas)
+RECORDS = {
+    "block": (
+        lambda athlete: TrainingBlock.objects.filter(athlete=athlete),
+        ("id", "name", "periodization", "start_date", "end_date", "goal_competition_date", "completed"),
+    ),
+    "session": (
+        lambda athlete: TrainingSession.objects.filter(athlete=athlete),
+        ("id", "block_id", "date", "status", "notes"),
+    ),
+    "exercise": (
+        lambda athlete: Exercise.objects.filter(athlete=athlete),
+        ("id", "session_id", "name", "sets", "reps", "weight", "rpe", "weight_actual", "rpe_actual", "completed"),
+    ),
+    "adjustment": (
+        lambda athlete: ExerciseAdjustment.objects.filter(exercise__athlete=athlete),
+        ("id", "exercise_id", "sets", "reps", "weight", "reason", "date"),
+    ),
+    "feedback": (
+        lambda athlete: AthleteFeedback.objects.filter(athlete=athlete),
+        ("id", "session_id", "sleep_quality", "fatigue", "stress", "soreness", "created_at"),
+    ),
+}
+
+# Columnas del CSV: tipo de registro + unión de las columnas de todos los tipos
+CSV_COLUMNS = ["type"] + list(dict.fromkeys(field for _, fields in RECORDS.values() for field in fields))
+
+
+def _history_querysets(athlete):
+    for kind, (queryset, fields) in RECORDS.items():
+        yield kind, queryset(athlete).order_by("id").values(*fields)
+
+
+def history_rows(athlete):
+    """
+    Recorre todo el historial del atleta tipo por tipo, con cursores del lado
+    del servidor (.iterator), sin cargarlo entero en memoria.
+    """
+    for kind, queryset in _history_querysets(athlete):
+        for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+            row["type"] = kind
+            yield row
+
+
+async def ahistory_rows(athlete):
+    """history_rows para ASGI: mismas consultas, recorridas con .aiterator."""
+    for kind, queryset in _history_querysets(athlete):
+        async for row in queryset.aiterator(chunk_size=CHUNK_SIZE):
+            row["type"] = kind
+            yield row
+
+
+def _batched(lines, size=CHUNK_SIZE):
+    # Agrupa líneas para no enviar un trozo HTTP por fila
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+async def _abatched(lines, size=CHUNK_SIZE):
+    batch = []
+    async for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def _stream(header, encode, athlete, asynchronous):
+    # El encabezado sale solo, antes de la primera consulta; luego filas por lotes.
+    # Con ASGI el iterador debe ser async: Django 4.2 consume entero uno síncrono
+    if asynchronous:
+        async def lines():
+            if header:
+                yield header
+            async for batch in _abatched(encode(row) async for row in ahistory_rows(athlete)):
+                yield batch
+        return lines()
+
+    def lines():
+        if header:
+            yield header
+        yield from _batched(encode(row) for row in history_rows(athlete))
+    return lines()
+
+
+class _Echo:
+    # Buffer mínimo para csv.writer: devuelve la línea en vez de guardarla
+    def write(self, value):
+        return value
+
+
+def stream_csv(athlete, asynchronous=False):
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_COLUMNS)
+    header = writer.writerow(dict(zip(CSV_COLUMNS, CSV_COLUMNS)))
+    return _stream(header, writer.writerow, athlete, asynchronous)
+
+
+def stream_ndjson(athlete, asynchronous=False):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    return _stream(None, lambda row: encoder.encode(row) + "\n", athlete, asynchronous)
+
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "ndjson": (stream_ndjson, "application/x-ndjson; charset=utf-8"),
+}
@@ -0,0 +1,149 @@
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import TrainingBlock, TrainingSession, Exercise
+from .rpe import estimate_rpe
+
+# Nombre del ejercicio -> campo de 1RM del atleta
+MAIN_LIFTS = {
+    "Sentadilla": "squat_1rm",
+    "Bench Press": "bench_1rm",
+    "Peso muerto": "deadlift_1rm",
+}
+
+# Ejercicios de cada día de la semana (se rota si hay más días)
+DAY_ROTATION = (
+    ("Sentadilla", "Bench Press"),
+    ("Peso muerto", "Bench Press"),
+    ("Sentadilla", "Peso muerto", "Bench Press"),
+)
+
+# Perfiles del DUP: (series, repeticiones, % del 1RM)
+DUP_PROFILES = (
+    (4, 8, 0.70),
+    (5, 5, 0.78),
+    (5, 3, 0.85),
+)
+
+
+def round_weight(weight, step=2.5):
+    return round(weight / step) * step
+
+
+def _progress(week, weeks):
+    return week / (weeks - 1) if weeks > 1 else 1.0
+
+
+def lineal_scheme(week, weeks, day):
+    # Intensidad sube y volumen baja de forma constante semana a semana
+    t = _progress(week, weeks)
+    reps = round(8 - 5 * t)
+    sets = 4 if reps >= 5 else 3
+    return sets, reps, 0.70 + 0.20 * t
+
+
+def dup_scheme(week, weeks, day):
+    # Ondulación diaria; la intensidad de cada perfil sube hasta un 10% en el bloque
+    sets, reps, intensity = DUP_PROFILES[day % len(DUP_PROFILES)]
+    return sets, reps, intensity + 0.10 * _progress(week, weeks)
+
+
+# Semanas mínimas para que cada fase de BLOQUES tenga al menos una
+BLOQUES_MIN_WEEKS = 3
+
+
+def bloques_phases(weeks):
+    """Semanas de acumulación, transmutación y realización (~40/40/20%)."""
+    accumulation = transmutation = max(1, round(weeks * 0.4))
+    if weeks >= BLOQUES_MIN_WEEKS and accumulation + transmutation >= weeks:
+        # Bloques cortos: la realización también necesita su semana
+        accumulation = weeks - 1 - transmutation
+    return accumulation, transmutation, max(weeks - accumulation - transmutation, 0)
+
+
+def bloques_scheme(week, weeks, day):
+    # Acumulación -> transmutación -> realización. Con menos de
+    # BLOQUES_MIN_WEEKS no hay semana de realización (la API lo rechaza)
+    accumulation, transmutation, realization = bloques_phases(weeks)
+    if week < accumulation:
+        return 4, 8, 0.65 + 0.07 * _progress(week, accumulation)
+    week -= accumulation
+    if week < transmutation:
+        return 4, 5, 0.75 + 0.07 * _progress(week, transmutation)
+    week -= transmutation
+    return 3, 2, 0.85 + 0.07 * _progress(week, realization)
+
+
+SCHEMES = {
+    TrainingBlock.Periodization.LINEAL: lineal_scheme,
+    TrainingBlock.Periodization.DUP: dup_scheme,
+    TrainingBlock.Periodization.BLOQUES: bloques_scheme,
+}
+
+
+def day_offsets(days_per_week):
+    # Reparte los días de entrenamiento a lo largo de la semana
+    return [round(day * 7 / days_per_week) for day in range(days_per_week)]
+
+
+def build_plan(periodization, start_date, weeks, days_per_week, one_rms):
+    """
+    Devuelve [(fecha, [ejercicio, ...]), ...] con cada ejercicio como dict
+    de campos de `Exercise`. `one_rms` mapea nombre del ejercicio -> 1RM (o None).
+    """
+    scheme = SCHEMES[periodization]
+    offsets = day_offsets(days_per_week)
+    plan = []
+    for week in range(weeks):
+        for day, offset in enumerate(offsets):
+            sets, reps, intensity = scheme(week, weeks, day)
+            exercises = []
+            for name in DAY_ROTATION[day % len(DAY_ROTATION)]:
+                one_rm = one_rms.get(name)
+                exercises.append({
+                    "name": name,
+                    "sets": sets,
+                    "reps": reps,
+                    "weight": round_weight(one_rm * intensity) if one_rm else None,
+                    "rpe": estimate_rpe(reps, intensity),
+                })
+            plan.append((start_date + timedelta(weeks=week, days=offset), exercises))
+    return plan
+
+
+@transaction.atomic
+def generate_block(coach, athlete, name, periodization, start_date, weeks, days_per_week,
+                   one_rms=None, goal_competition_date=None):
+    """
+    Crea el bloque completo (sesiones y ejercicios) con bulk_create en una
+    sola transacción. Los 1RM no indicados se toman del perfil del atleta.
+    """
+    one_rms = {
+        lift: (one_rms or {}).get(lift) or getattr(athlete, field)
+        for lift, field in MAIN_LIFTS.items()
+    }
+    plan = build_plan(periodization, start_date, weeks, days_per_week, one_rms)
+
+    block = TrainingBlock.objects.create(
+        athlete=athlete,
+        coach=coach,
+        name=name,
+        periodization=periodization,
+        start_date=start_date,
+        end_date=start_date + timedelta(weeks=weeks, days=-1),
+        goal_competition_date=goal_competition_date,
+        sessions_total=len(plan),
+    )
+    sessions = TrainingSession.objects.bulk_create([
+        TrainingSession(
+            block=block, athlete=athlete, coach=coach, date=day, exercises_total=len(exercises),
+        )
+        for day, exercises in plan
+    ])
+    Exercise.objects.bulk_create([
+        Exercise(session=session, athlete=athlete, coach=coach, **exercise)
+        for session, (_, exercises) in zip(sessions, plan)
+        for exercise in exercises
+    ])
+    return block
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import TrainingBlock, TrainingSession, Exercise
+from .serializers import HistoryImportRowSerializer
+
+VALIDATION_BATCH_SIZE = 1000
+INSERT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+DEFAULT_BLOCK_NAME = "Historial importado"
+
+
+def read_rows(file, input_format):
+    """Filas (dicts) de un archivo CSV con encabezado o de una lista JSON."""
+    if input_format == "csv":
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            # Las celdas vacías cuentan como campos no enviados
+            return [{k: v for k, v in row.items() if v not in ("", None)} for row in csv.DictReader(text)]
+        except UnicodeDecodeError:
+            raise ValidationError({"file": "El CSV debe estar codificado en UTF-8."})
+        except csv.Error:
+            raise ValidationError({"file": "CSV inválido."})
+    if input_format == "json":
+        try:
+            rows = json.load(file)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError({"file": "JSON inválido."})
+        return rows_from_payload(rows)
+    raise ValidationError({"input": "Formato no soportado, use csv o json."})
+
+
+def rows_from_payload(rows):
+    if isinstance(rows, dict):
+        rows = rows.get("rows")
+    if not isinstance(rows, list):
+        raise ValidationError({"rows": "Se requiere una lista de filas."})
+    return rows
+
+
+def validate_rows(rows):
+    """
+    Valida por lotes. Devuelve (filas válidas, errores) con los errores como
+    [{"row": n, "errors": {...}}], n contando desde 1.
+    """
+    valid, errors = [], []
+    iterator = iter(rows)
+    offset = 0
+    while batch := list(islice(iterator, VALIDATION_BATCH_SIZE)):
+        serializer = HistoryImportRowSerializer(data=batch, many=True)
+        if serializer.is_valid():
+            valid.extend(serializer.validated_data)
+        else:
+            errors.extend(
+                {"row": offset + index + 1, "errors": row_errors}
+                for index, row_errors in enumerate(serializer.errors)
+                if row_errors
+            )
+        offset += len(batch)
+    return valid, errors
+
+
+@transaction.atomic
+def write_history(athlete, coach, rows):
+    """
+    Crea bloques, sesiones y ejercicios con bulk_create en una transacción.
+    Las filas se agrupan en bloques por `block` y en sesiones por fecha;
+    los contadores y estados quedan calculados. El progreso se deriva en la
+    siguiente pasada de `derive_progress` (los ejercicios quedan con updated_at).
+    """
+    days_by_block = defaultdict(lambda: defaultdict(list))
+    for row in rows:
+        if row.get("completed") is None:
+            row["completed"] = row.get("weight_actual") is not None
+        days_by_block[row.pop("block", "") or DEFAULT_BLOCK_NAME][row.pop("date")].append(row)
+
+    blocks, sessions = [], []
+    for name, days in days_by_block.items():
+        block_sessions = []
+        for day, exercises in sorted(days.items()):
+            done = sum(exercise["completed"] for exercise in exercises)
+            session = TrainingSession(
+                athlete=athlete, coach=coach, date=day,
+                status="completed" if done == len(exercises) else "pending",
+                exercises_total=len(exercises), exercises_completed=done,
+            )
+            block_sessions.append((session, exercises))
+        completed = sum(session.status == "completed" for session, _ in block_sessions)
+        block = TrainingBlock(
+            athlete=athlete, coach=coach, name=name,
+            start_date=min(days), end_date=max(days),
+            sessions_total=len(block_sessions), sessions_completed=completed,
+            completed=completed == len(block_sessions),
+        )
+        blocks.append(block)
+        for session, _ in block_sessions:
+            session.block = block
+        sessions.extend(block_sessions)
+
+    TrainingBlock.objects.bulk_create(blocks)
+    TrainingSession.objects.bulk_create([session for session, _ in sessions], batch_size=INSERT_BATCH_SIZE)
+    created = Exercise.objects.bulk_create(
+        (
+            Exercise(session=session, athlete=athlete, coach=coach, **exercise)
+            for session, exercises in sessions
+            for exercise in exercises
+        ),
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    return {"blocks": len(blocks), "sessions": len(sessions), "exercises": len(created)}
+
+
+def import_history(athlete, coach, rows):
+    """
+    Valida todas las filas y, solo si ninguna tiene errores, las importa.
+    Devuelve (creados, errores); con errores no se escribe nada y se
+    devuelven las primeras MAX_REPORTED_ERRORS.
+    """
+    valid, errors = validate_rows(rows)
+    if errors:
+        return None, {"error_count": len(errors), "errors": errors[:MAX_REPORTED_ERRORS]}
+    if not valid:
+        raise ValidationError({"rows": "El archivo no tiene filas."})
+    return write_history(athlete, coach, valid), None
@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import CustomUser
+from training.analytics import compute_load, load_history
+from training.importer import write_history
+
+LIFTS = ("Sentadilla", "Bench Press", "Peso muerto", "Remo con barra")
+
+
+def synthetic_history(years, sessions_per_week=4, exercises_per_session=4, seed=0):
+    # Historial completado sintético, en el formato de filas de training.importer
+    rng = np.random.default_rng(seed)
+    sessions = int(years * 52 * sessions_per_week)
+    days = np.sort(rng.integers(0, int(years * 365), sessions))
+    start = np.datetime64("2020-01-06")
+    rows = []
+    for day in days:
+        date = (start + day).item()
+        for _ in range(exercises_per_session):
+            weight = float(rng.uniform(60, 220))
+            rows.append({
+                "block": f"Bloque {date.year}",
+                "date": date,
+                "name": LIFTS[rng.integers(len(LIFTS))],
+                "sets": int(rng.integers(3, 6)),
+                "reps": int(rng.integers(1, 9)),
+                "weight": weight,
+                "weight_actual": weight,
+                "rpe_actual": float(rng.choice([7, 7.5, 8, 8.5, 9, 9.5])) if rng.random() > 0.1 else None,
+                "completed": True,
+            })
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide load_history (una consulta) y compute_load sobre historiales sintéticos "
+        "de varios años guardados en la base (sin dejar nada guardado)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 5, 10])
+        parser.add_argument("--exercises-per-session", type=int, default=6)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'años':>5} {'filas':>8} {'consulta ms':>12} {'métricas ms':>12} {'total ms':>10}")
+        for years in options["years"]:
+            with transaction.atomic():
+                athlete = CustomUser.objects.create(email=f"benchmark-analytics-{years}@plift.cl", role="athlete")
+                rows = synthetic_history(years, exercises_per_session=options["exercises_per_session"])
+                write_history(athlete, None, rows)
+
+                queries, metrics = [], []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    history = load_history(athlete)
+                    loaded = time.perf_counter()
+                    compute_load(history)
+                    finished = time.perf_counter()
+                    queries.append(loaded - started)
+                    metrics.append(finished - loaded)
+                transaction.set_rollback(True)
+
+            best_query, best_metrics = min(queries) * 1000, min(metrics) * 1000
+            self.stdout.write(
+                f"{years:>5} {len(history['name']):>8} {best_query:>12.1f} {best_metrics:>12.1f} "
+                f"{best_query + best_metrics:>10.1f}"
+            )
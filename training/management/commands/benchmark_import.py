@@ -0,0 +1,60 @@
+import csv
+import io
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import CustomUser
+from training.importer import read_rows, validate_rows, write_history
+
+LIFTS = ("Sentadilla", "Bench Press", "Peso muerto", "Remo con barra", "Overhead Press")
+COLUMNS = ("block", "date", "name", "sets", "reps", "weight", "rpe", "weight_actual", "rpe_actual")
+
+
+def synthetic_csv(rows, exercises_per_session=5, seed=0):
+    rng = random.Random(seed)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    start = date(2015, 1, 5)
+    for i in range(rows):
+        day = start + timedelta(days=i // exercises_per_session)
+        weight = rng.randrange(60, 220, 5)
+        writer.writerow((
+            f"Bloque {day.year}-{(day.month - 1) // 3 + 1}", day.isoformat(), rng.choice(LIFTS),
+            rng.randint(3, 5), rng.randint(1, 8), weight, 8, weight + rng.choice((-5, 0, 5)), rng.choice((7, 8, 9, "")),
+        ))
+    return buffer.getvalue().encode()
+
+
+class Command(BaseCommand):
+    help = "Mide el rendimiento de la importación de historial con un CSV sintético (sin guardar nada)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        data = synthetic_csv(options["rows"])
+        with transaction.atomic():
+            athlete = CustomUser.objects.create(email="benchmark-import@plift.cl", role="athlete")
+            started = time.perf_counter()
+            rows = read_rows(io.BytesIO(data), "csv")
+            parsed = time.perf_counter()
+            valid, errors = validate_rows(rows)
+            validated = time.perf_counter()
+            created = write_history(athlete, None, valid)
+            written = time.perf_counter()
+            transaction.set_rollback(True)
+
+        total = written - started
+        self.stdout.write(f"filas: {len(rows)} ({len(errors)} con errores)")
+        self.stdout.write(f"lectura CSV: {parsed - started:.2f}s")
+        self.stdout.write(f"validación: {validated - parsed:.2f}s")
+        self.stdout.write(
+            f"bulk_create: {written - validated:.2f}s "
+            f"({created['blocks']} bloques, {created['sessions']} sesiones, {created['exercises']} ejercicios)"
+        )
+        self.stdout.write(f"total: {total:.2f}s ({len(rows) / total:.0f} filas/s)")
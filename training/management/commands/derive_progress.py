@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from training.progress import catch_up
+
+
+class Command(BaseCommand):
+    help = "Calcula AthleteProgress a partir de los ejercicios completados desde la última pasada"
+
+    def handle(self, *args, **options):
+        written = catch_up()
+        self.stdout.write(self.style.SUCCESS(f"Progreso actualizado: {written} registros"))
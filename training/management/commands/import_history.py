@@ -0,0 +1,47 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from authentication.models import CustomUser
+from training.importer import import_history, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa el historial de entrenamiento de un atleta desde un archivo CSV o JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--athlete", type=int, required=True)
+        parser.add_argument("--coach", type=int)
+        parser.add_argument("--input", choices=["csv", "json"], help="Por defecto, según la extensión")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        input_format = options["input"] or path.suffix.lstrip(".").lower()
+        try:
+            athlete = CustomUser.objects.get(pk=options["athlete"], role=CustomUser.Role.ATHLETE)
+            coach = None
+            if options["coach"]:
+                coach = CustomUser.objects.get(pk=options["coach"], role=CustomUser.Role.COACH)
+        except CustomUser.DoesNotExist:
+            raise CommandError("Atleta o coach no encontrado")
+
+        started = time.perf_counter()
+        try:
+            with path.open("rb") as file:
+                rows = read_rows(file, input_format)
+            created, errors = import_history(athlete, coach, rows)
+        except ValidationError as e:
+            raise CommandError(f"Importación cancelada: {e.detail}")
+        elapsed = time.perf_counter() - started
+        if errors:
+            for error in errors["errors"]:
+                self.stderr.write(f"Fila {error['row']}: {error['errors']}")
+            raise CommandError(f"Importación cancelada: {errors['error_count']} filas con errores")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importados {created['blocks']} bloques, {created['sessions']} sesiones y "
+            f"{created['exercises']} ejercicios en {elapsed:.1f}s ({len(rows) / elapsed:.0f} filas/s)"
+        ))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from training.stats import STATS_DEBOUNCE, refresh_stale
+
+
+class Command(BaseCommand):
+    help = "Recalcula los resúmenes (BlockStats) de los bloques modificados desde el último cálculo"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--debounce", type=int, default=int(STATS_DEBOUNCE.total_seconds()),
+            help="Segundos sin cambios que debe llevar un bloque antes de recalcularlo",
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_stale(timedelta(seconds=options["debounce"]))
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes recalculados: {refreshed} bloques"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from training.readiness import catch_up
+
+
+class Command(BaseCommand):
+    help = "Recalcula la disposición (ACWR y feedback) de los atletas con sesiones o feedback nuevos"
+
+    def handle(self, *args, **options):
+        refreshed = catch_up()
+        self.stdout.write(self.style.SUCCESS(f"Disposición actualizada: {refreshed} atletas"))
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:20
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact, GreaterThan
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(queryset.order_by().values(field).annotate(total=Count("pk")).values("total")),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    TrainingBlock = apps.get_model("training", "TrainingBlock")
+    TrainingSession = apps.get_model("training", "TrainingSession")
+    Exercise = apps.get_model("training", "Exercise")
+
+    # Estado y completed con el mismo criterio que training.completion, a partir
+    # de los conteos nuevos (el SET solo ve los valores anteriores de la fila)
+    exercises = Exercise.objects.filter(session=OuterRef("pk"))
+    total = _count(exercises, "session")
+    completed = _count(exercises.filter(completed=True), "session")
+    TrainingSession.objects.update(
+        exercises_total=total,
+        exercises_completed=completed,
+        status=Case(
+            When(Q(GreaterThan(total, 0)) & Q(Exact(completed, total)), then=Value("completed")),
+            When(status="completed", then=Value("in_progress")),
+            default=F("status"),
+        ),
+    )
+
+    # Después de las sesiones, para contar su estado ya corregido
+    sessions = TrainingSession.objects.filter(block=OuterRef("pk"))
+    total = _count(sessions, "block")
+    completed = _count(sessions.filter(status="completed"), "block")
+    TrainingBlock.objects.update(
+        sessions_total=total,
+        sessions_completed=completed,
+        completed=Case(
+            When(Q(GreaterThan(total, 0)) & Q(Exact(completed, total)), then=Value(True)),
+            default=Value(False),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0006_remove_trainingsession_completed_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingblock',
+            name='sessions_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trainingblock',
+            name='sessions_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trainingsession',
+            name='exercises_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trainingsession',
+            name='exercises_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
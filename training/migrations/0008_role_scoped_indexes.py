@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0007_completion_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='athleteprogress',
+            index=models.Index(fields=['athlete', 'exercise', '-date'], name='progress_athlete_ex_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['session', 'name'], name='exercise_session_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingblock',
+            index=models.Index(fields=['coach', 'athlete'], name='block_coach_athlete_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingsession',
+            index=models.Index(fields=['block', 'status'], name='session_block_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingsession',
+            index=models.Index(fields=['block', 'date'], name='session_block_date_idx'),
+        ),
+    ]
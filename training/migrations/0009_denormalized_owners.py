@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_owners(apps, schema_editor):
+    TrainingBlock = apps.get_model("training", "TrainingBlock")
+    TrainingSession = apps.get_model("training", "TrainingSession")
+    Exercise = apps.get_model("training", "Exercise")
+
+    blocks = TrainingBlock.objects.filter(pk=OuterRef("block_id"))
+    TrainingSession.objects.update(
+        athlete_id=Subquery(blocks.values("athlete_id")[:1]),
+        coach_id=Subquery(blocks.values("coach_id")[:1]),
+    )
+
+    sessions = TrainingSession.objects.filter(pk=OuterRef("session_id"))
+    Exercise.objects.update(
+        athlete_id=Subquery(sessions.values("athlete_id")[:1]),
+        coach_id=Subquery(sessions.values("coach_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('training', '0008_role_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='athlete',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='coach',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='trainingsession',
+            name='athlete',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='trainingsession',
+            name='coach',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_owners, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trainingsession',
+            index=models.Index(fields=['athlete', 'status'], name='session_athlete_status_idx'),
+        ),
+    ]
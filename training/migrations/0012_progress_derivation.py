@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0011_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='athleteprogress',
+            name='source',
+            field=models.CharField(choices=[('manual', 'Manual'), ('auto', 'Calculado')], default='manual', editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='athleteprogress',
+            name='date',
+            field=models.DateField(blank=True, default=django.utils.timezone.localdate, editable=False),
+        ),
+    ]
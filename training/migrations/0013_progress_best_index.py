@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0012_progress_derivation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='athleteprogress',
+            index=models.Index(fields=['athlete', 'exercise', '-best_weight'], name='progress_athlete_ex_best_idx'),
+        ),
+    ]
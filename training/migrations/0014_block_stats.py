@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0013_progress_best_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockStats',
+            fields=[
+                ('block', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='training.trainingblock')),
+                ('planned_tonnage', models.FloatField(default=0)),
+                ('actual_tonnage', models.FloatField(default=0)),
+                ('mean_rpe_deviation', models.FloatField(blank=True, null=True)),
+                ('exercises_total', models.PositiveIntegerField(default=0)),
+                ('exercises_completed', models.PositiveIntegerField(default=0)),
+                ('completion_ratio', models.FloatField(default=0)),
+                ('top_sets', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('training', '0014_block_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AthleteReadiness',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('acute_load', models.FloatField(default=0)),
+                ('chronic_load', models.FloatField(default=0)),
+                ('sleep', models.FloatField(blank=True, null=True)),
+                ('fatigue', models.FloatField(blank=True, null=True)),
+                ('stress', models.FloatField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('athlete', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='readiness', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
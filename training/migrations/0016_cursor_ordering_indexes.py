@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('training', '0015_athlete_readiness'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='athleteprogress',
+            index=models.Index(fields=['athlete', '-date', 'id'], name='progress_athlete_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingblock',
+            index=models.Index(fields=['athlete', '-start_date', 'id'], name='block_athlete_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingblock',
+            index=models.Index(fields=['coach', '-start_date', 'id'], name='block_coach_start_idx'),
+        ),
+    ]
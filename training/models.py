@@ -1,8 +1,22 @@
 from django.db import models
 
 from django.db import models
+from django.utils import timezone
 from authentication.models import  CustomUser
 
+
+def _touch_update_fields(kwargs):
+    # save(update_fields=...) también debe refrescar updated_at
+    if kwargs.get("update_fields") is not None:
+        kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
+
+
+def touch_tree(session_id):
+    # Propaga un cambio en los ejercicios a su sesión y su bloque
+    now = timezone.now()
+    TrainingSession.objects.filter(pk=session_id).update(updated_at=now)
+    TrainingBlock.objects.filter(sessions=session_id).update(updated_at=now)
+
 # Usar tabla intermedia para la relación muchos a muchos entre coaches y atletas
 class CoachAthlete(models.Model):
     coach = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="athletes")
@@ -29,10 +43,39 @@ class TrainingBlock(models.Model):
     goal_competition_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
+    # Contadores mantenidos por training.completion
+    sessions_total = models.PositiveIntegerField(default=0)
+    sessions_completed = models.PositiveIntegerField(default=0)
+    # Cambia con el bloque, sus sesiones o sus ejercicios
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["coach", "athlete"], name="block_coach_athlete_idx"),
+            # Orden de BlockCursorPagination dentro del alcance de cada rol
+            models.Index(fields=["athlete", "-start_date", "id"], name="block_athlete_start_idx"),
+            models.Index(fields=["coach", "-start_date", "id"], name="block_coach_start_idx"),
+        ]
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def save(self, *args, **kwargs):
+        _touch_update_fields(kwargs)
+        super().save(*args, **kwargs)
+
+    def propagate_owners(self, previous_owners):
+        # Copia atleta y coach del bloque a sus sesiones y ejercicios; el dueño
+        # anterior recibe su registro de salida para la sincronización
+        now = timezone.now()
+        owners = (self.athlete_id, self.coach_id)
+        exercises = Exercise.objects.filter(session__block=self)
+        record_scope_exit(TrainingBlock, [self.pk], previous_owners, owners)
+        record_scope_exit(TrainingSession, self.sessions.values_list("pk", flat=True), previous_owners, owners)
+        record_scope_exit(Exercise, exercises.values_list("pk", flat=True), previous_owners, owners)
+        self.sessions.update(athlete_id=self.athlete_id, coach_id=self.coach_id, updated_at=now)
+        exercises.update(athlete_id=self.athlete_id, coach_id=self.coach_id, updated_at=now)
+
 
 
 class TrainingSession(models.Model):
@@ -45,6 +88,40 @@ class TrainingSession(models.Model):
     date = models.DateField()
     notes = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    # Copias de block.athlete / block.coach para filtrar sin joins
+    athlete = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, editable=False, related_name="+")
+    coach = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, editable=False, related_name="+")
+    # Contadores mantenidos por training.completion
+    exercises_total = models.PositiveIntegerField(default=0)
+    exercises_completed = models.PositiveIntegerField(default=0)
+    # Cambia con la sesión o sus ejercicios
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["block", "status"], name="session_block_status_idx"),
+            models.Index(fields=["block", "date"], name="session_block_date_idx"),
+            models.Index(fields=["athlete", "status"], name="session_athlete_status_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.set_owners()
+        _touch_update_fields(kwargs)
+        super().save(*args, **kwargs)
+        self.touch_block()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.touch_block()
+        return result
+
+    def touch_block(self):
+        TrainingBlock.objects.filter(pk=self.block_id).update(updated_at=timezone.now())
+
+    def set_owners(self):
+        self.athlete_id = self.block.athlete_id
+        self.coach_id = self.block.coach_id
 
 
 class Exercise(models.Model):
@@ -57,16 +134,120 @@ class Exercise(models.Model):
     weight_actual = models.FloatField(null=True, blank=True)
     rpe_actual = models.FloatField(null=True, blank=True)
     completed = models.BooleanField(default=False)
+    # Copias de session.athlete / session.coach para filtrar sin joins
+    athlete = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, editable=False, related_name="+")
+    coach = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, editable=False, related_name="+")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "name"], name="exercise_session_name_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.set_owners()
+        _touch_update_fields(kwargs)
+        super().save(*args, **kwargs)
+        touch_tree(self.session_id)
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        touch_tree(self.session_id)
+        return result
+
+    def set_owners(self):
+        self.athlete_id = self.session.athlete_id
+        self.coach_id = self.session.coach_id
 
 
 class AthleteProgress(models.Model):
+    class Source(models.TextChoices):
+        MANUAL = "manual", "Manual"
+        AUTO = "auto", "Calculado"
+
     athlete = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="progress")
     exercise = models.CharField(max_length=100) 
     best_weight = models.FloatField()  
     estimated_1rm = models.FloatField(null=True, blank=True) 
-    date = models.DateField(auto_now_add=True)
+    # Por defecto el día de registro; los calculados usan la fecha de la sesión
+    date = models.DateField(default=timezone.localdate, editable=False, blank=True)
+    source = models.CharField(max_length=10, choices=Source.choices, default=Source.MANUAL, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["athlete", "exercise", "-date"], name="progress_athlete_ex_date_idx"),
+            models.Index(fields=["athlete", "exercise", "-best_weight"], name="progress_athlete_ex_best_idx"),
+            # Orden de ProgressCursorPagination
+            models.Index(fields=["athlete", "-date", "id"], name="progress_athlete_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.athlete.email} - {self.exercise}: {self.best_weight}kg"
 
+
+class BlockStats(models.Model):
+    """Resumen planificado vs real del bloque, recalculado por training.stats."""
+    block = models.OneToOneField(TrainingBlock, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    planned_tonnage = models.FloatField(default=0)
+    actual_tonnage = models.FloatField(default=0)
+    # Promedio de rpe_actual - rpe en los ejercicios completados
+    mean_rpe_deviation = models.FloatField(null=True, blank=True)
+    exercises_total = models.PositiveIntegerField(default=0)
+    exercises_completed = models.PositiveIntegerField(default=0)
+    completion_ratio = models.FloatField(default=0)
+    # Ejercicio -> serie más pesada completada {"weight", "reps", "rpe", "date"}
+    top_sets = models.JSONField(default=dict)
+    # Si no es posterior a block.updated_at, el resumen está pendiente de recalcular
+    computed_at = models.DateTimeField()
+
+
+class AthleteReadiness(models.Model):
+    """
+    Carga aguda/crónica (EWMA del volumen completado) y promedios móviles del
+    feedback de un atleta, mantenidos por training.readiness.
+    """
+    athlete = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name="readiness")
+    # Cargas al cierre del día as_of; en días sin entrenamiento solo decaen
+    as_of = models.DateField()
+    acute_load = models.FloatField(default=0)
+    chronic_load = models.FloatField(default=0)
+    sleep = models.FloatField(null=True, blank=True)
+    fatigue = models.FloatField(null=True, blank=True)
+    stress = models.FloatField(null=True, blank=True)
+    # 0-100 a partir de los promedios de sueño, fatiga y estrés
+    score = models.FloatField(null=True, blank=True)
+    feedback_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Tombstone(models.Model):
+    """Registro de objetos eliminados, para que la sincronización pueda borrarlos en el cliente."""
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    # Ids sin FK: el dueño puede borrarse en la misma cascada que genera el registro
+    athlete_id = models.BigIntegerField(null=True, db_index=True)
+    coach_id = models.BigIntegerField(null=True, db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+def record_scope_exit(model, object_ids, previous_owners, owners):
+    """
+    Registros de borrado para filas que pasaron a otro atleta o coach: para
+    la sincronización del dueño anterior es como si se hubieran eliminado.
+    `previous_owners` y `owners` son pares (athlete_id, coach_id).
+    """
+    lost_athlete, lost_coach = (old if old != new else None for old, new in zip(previous_owners, owners))
+    if lost_athlete is None and lost_coach is None:
+        return
+    Tombstone.objects.bulk_create([
+        Tombstone(model=model._meta.model_name, object_id=pk, athlete_id=lost_athlete, coach_id=lost_coach)
+        for pk in object_ids
+    ])
+
+
+class PipelineWatermark(models.Model):
+    """Último instante procesado por un proceso incremental (ej. "progress")."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
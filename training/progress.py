@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import AthleteProgress, Exercise, PipelineWatermark
+from .rpe import estimated_1rm
+
+WATERMARK = "progress"
+# Campos del ejercicio que afectan al progreso calculado
+PROGRESS_FIELDS = {"completed", "weight_actual", "reps", "rpe_actual", "session"}
+# Margen para incluir escrituras que confirmaron después de la última pasada
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def first_per_lift(queryset, *order_by):
+    """
+    Primera fila por (atleta, ejercicio) según `order_by`. En PostgreSQL usa
+    DISTINCT ON, que recorre el índice (athlete, exercise, ...) correspondiente;
+    en otras bases, ROW_NUMBER() sobre la misma partición.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        return queryset.order_by("athlete_id", "exercise", *order_by).distinct("athlete_id", "exercise")
+    ordering = [F(field[1:]).desc() if field.startswith("-") else F(field).asc() for field in order_by]
+    return queryset.annotate(
+        row=Window(RowNumber(), partition_by=[F("athlete"), F("exercise")], order_by=ordering)
+    ).filter(row=1)
+
+
+def changed_keys(exercises):
+    """Claves (atleta, ejercicio, fecha) afectadas por un queryset de ejercicios."""
+    return set(
+        exercises.exclude(athlete=None).values_list("athlete_id", "name", "session__date").distinct()
+    )
+
+
+def best_by_key(keys):
+    """
+    Mejor peso y mejor 1RM estimado (ajustado por RPE) de cada clave, a
+    partir de los ejercicios completados de ese atleta, ejercicio y día.
+    """
+    if not keys:
+        return {}
+    athletes = {athlete for athlete, _, _ in keys}
+    names = {name for _, name, _ in keys}
+    dates = {day for _, _, day in keys}
+    rows = (
+        Exercise.objects
+        .filter(completed=True, weight_actual__isnull=False,
+                athlete__in=athletes, name__in=names, session__date__in=dates)
+        .values_list("athlete_id", "name", "session__date", "weight_actual", "reps", "rpe_actual")
+    )
+
+    best = {}
+    for athlete, name, day, weight, reps, rpe in rows.iterator():
+        key = (athlete, name, day)
+        if key not in keys:
+            continue
+        e1rm = estimated_1rm(weight, reps, rpe)
+        best_weight, best_e1rm = best.get(key, (0, None))
+        if e1rm is not None and (best_e1rm is None or e1rm > best_e1rm):
+            best_e1rm = round(e1rm, 1)
+        best[key] = (max(best_weight, weight), best_e1rm)
+    return best
+
+
+@transaction.atomic
+def refresh_progress(keys):
+    """
+    Recalcula las filas automáticas de AthleteProgress para las claves dadas:
+    actualiza las existentes, crea las nuevas y borra las que ya no tienen
+    ejercicios completados. Los registros manuales no se tocan.
+    """
+    keys = set(keys)
+    if not keys:
+        return 0
+    best = best_by_key(keys)
+
+    existing = defaultdict(list)
+    candidates = AthleteProgress.objects.select_for_update().filter(
+        source=AthleteProgress.Source.AUTO,
+        athlete__in={athlete for athlete, _, _ in keys},
+        exercise__in={name for _, name, _ in keys},
+        date__in={day for _, _, day in keys},
+    )
+    for progress in candidates:
+        existing[(progress.athlete_id, progress.exercise, progress.date)].append(progress)
+
+    to_create, to_update, to_delete = [], [], []
+    for key in keys:
+        rows = existing.get(key, [])
+        if key not in best:
+            to_delete.extend(p.pk for p in rows)
+            continue
+        best_weight, best_e1rm = best[key]
+        if rows:
+            progress, *duplicates = rows
+            to_delete.extend(p.pk for p in duplicates)
+            if (progress.best_weight, progress.estimated_1rm) != (best_weight, best_e1rm):
+                progress.best_weight, progress.estimated_1rm = best_weight, best_e1rm
+                progress.updated_at = timezone.now()
+                to_update.append(progress)
+        else:
+            athlete, name, day = key
+            to_create.append(AthleteProgress(
+                athlete_id=athlete, exercise=name, date=day,
+                best_weight=best_weight, estimated_1rm=best_e1rm,
+                source=AthleteProgress.Source.AUTO,
+            ))
+
+    if to_delete:
+        # Uno a uno para que quede el registro de borrado de la sincronización
+        for progress in AthleteProgress.objects.filter(pk__in=to_delete):
+            progress.delete()
+    AthleteProgress.objects.bulk_update(to_update, ["best_weight", "estimated_1rm", "updated_at"])
+    AthleteProgress.objects.bulk_create(to_create)
+    return len(to_create) + len(to_update) + len(to_delete)
+
+
+def refresh_progress_on_commit(keys):
+    # Se ejecuta al confirmar la escritura del ejercicio, fuera de su transacción
+    keys = set(keys)
+    if keys:
+        transaction.on_commit(lambda: refresh_progress(keys))
+
+
+def catch_up():
+    """
+    Pasada incremental: solo procesa atletas y días con ejercicios modificados
+    desde la última marca de agua. Devuelve el número de filas escritas.
+    """
+    now = timezone.now()
+    watermark = PipelineWatermark.objects.filter(name=WATERMARK).first()
+    exercises = Exercise.objects.all()
+    if watermark is not None:
+        exercises = exercises.filter(updated_at__gte=watermark.value - WATERMARK_OVERLAP)
+
+    written = refresh_progress(changed_keys(exercises))
+    PipelineWatermark.objects.update_or_create(name=WATERMARK, defaults={"value": now})
+    return written
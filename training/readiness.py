@@ -0,0 +1,146 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, FloatField, Sum
+from django.utils import timezone
+
+from ai.models import AthleteFeedback
+from .models import AthleteReadiness, Exercise, PipelineWatermark
+
+WATERMARK = "readiness"
+WATERMARK_OVERLAP = timedelta(minutes=1)
+# EWMA-ACWR: alfa = 2 / (N + 1) con ventanas de 7 y 28 días
+ACUTE_ALPHA = 2 / (7 + 1)
+CHRONIC_ALPHA = 2 / (28 + 1)
+# Feedback: promedio móvil de las últimas ~7 respuestas
+FEEDBACK_ALPHA = 2 / (7 + 1)
+# Historial que se recorre al recalcular; el peso de lo anterior es < 0.1%
+LOOKBACK_DAYS = 120
+BATCH_SIZE = 200
+# Campos del ejercicio que cambian la carga diaria (la sesión fija el día y el atleta)
+LOAD_FIELDS = {"completed", "sets", "reps", "weight_actual", "session"}
+
+
+def readiness_score(sleep, fatigue, stress):
+    # Escalas 1-10: más sueño suma, más fatiga y estrés restan
+    wellness = (sleep + (11 - fatigue) + (11 - stress)) / 3
+    return round((wellness - 1) / 9 * 100, 1)
+
+
+def decayed_loads(readiness, day):
+    """Cargas aguda/crónica y ACWR llevadas al día `day` sin consultar la base."""
+    days = max((day - readiness.as_of).days, 0)
+    acute = readiness.acute_load * (1 - ACUTE_ALPHA) ** days
+    chronic = readiness.chronic_load * (1 - CHRONIC_ALPHA) ** days
+    return acute, chronic, (acute / chronic if chronic else None)
+
+
+def compute_readiness(athlete_ids, today):
+    """Estado de cada atleta en dos consultas: volumen diario y feedback."""
+    start = today - timedelta(days=LOOKBACK_DAYS)
+    daily_load = defaultdict(dict)
+    rows = (
+        Exercise.objects
+        .filter(athlete__in=athlete_ids, completed=True, weight_actual__isnull=False,
+                session__date__gte=start, session__date__lte=today)
+        .values("athlete", "session__date")
+        .annotate(volume=Sum(F("sets") * F("reps") * F("weight_actual"), output_field=FloatField()))
+    )
+    for row in rows:
+        daily_load[row["athlete"]][row["session__date"]] = row["volume"]
+
+    feedback = defaultdict(list)
+    for athlete, sleep, fatigue, stress in (
+        AthleteFeedback.objects
+        .filter(athlete__in=athlete_ids, created_at__date__gte=start)
+        .order_by("created_at", "id")
+        .values_list("athlete", "sleep_quality", "fatigue", "stress")
+    ):
+        feedback[athlete].append((sleep, fatigue, stress))
+
+    states = {}
+    for athlete in athlete_ids:
+        acute = chronic = 0.0
+        loads = daily_load.get(athlete, {})
+        for offset in range(LOOKBACK_DAYS + 1):
+            load = loads.get(start + timedelta(days=offset), 0)
+            acute += ACUTE_ALPHA * (load - acute)
+            chronic += CHRONIC_ALPHA * (load - chronic)
+
+        state = {"as_of": today, "acute_load": round(acute, 1), "chronic_load": round(chronic, 1),
+                 "sleep": None, "fatigue": None, "stress": None, "score": None,
+                 "feedback_count": len(feedback.get(athlete, []))}
+        averages = None
+        for values in feedback.get(athlete, []):
+            if averages is None:
+                averages = list(values)
+            else:
+                averages = [avg + FEEDBACK_ALPHA * (value - avg) for avg, value in zip(averages, values)]
+        if averages is not None:
+            state.update(
+                sleep=round(averages[0], 2), fatigue=round(averages[1], 2), stress=round(averages[2], 2),
+                score=readiness_score(*averages),
+            )
+        states[athlete] = state
+    return states
+
+
+@transaction.atomic
+def refresh_readiness(athlete_ids, today=None):
+    athlete_ids = list(set(athlete_ids))
+    if not athlete_ids:
+        return 0
+    today = today or timezone.localdate()
+    states = compute_readiness(athlete_ids, today)
+
+    existing = {
+        r.athlete_id: r
+        for r in AthleteReadiness.objects.select_for_update().filter(athlete__in=athlete_ids)
+    }
+    to_create, to_update = [], []
+    for athlete, state in states.items():
+        if athlete in existing:
+            readiness = existing[athlete]
+            for field, value in state.items():
+                setattr(readiness, field, value)
+            readiness.updated_at = timezone.now()
+            to_update.append(readiness)
+        else:
+            to_create.append(AthleteReadiness(athlete_id=athlete, **state))
+    fields = ["as_of", "acute_load", "chronic_load", "sleep", "fatigue", "stress", "score",
+              "feedback_count", "updated_at"]
+    AthleteReadiness.objects.bulk_update(to_update, fields)
+    AthleteReadiness.objects.bulk_create(to_create)
+    return len(states)
+
+
+def refresh_readiness_on_commit(athlete_ids):
+    """Recalcula la disposición de los atletas al confirmar la transacción en curso."""
+    athlete_ids = set(athlete_ids)
+    if athlete_ids:
+        transaction.on_commit(lambda: refresh_readiness(athlete_ids))
+
+
+def catch_up():
+    """
+    Pasada incremental: recalcula solo los atletas con ejercicios modificados
+    o feedback nuevo desde la última marca de agua.
+    """
+    now = timezone.now()
+    watermark = PipelineWatermark.objects.filter(name=WATERMARK).first()
+    exercises = Exercise.objects.exclude(athlete=None)
+    feedback = AthleteFeedback.objects.all()
+    if watermark is not None:
+        since = watermark.value - WATERMARK_OVERLAP
+        exercises = exercises.filter(updated_at__gte=since)
+        feedback = feedback.filter(created_at__gte=since)
+
+    athletes = sorted(
+        set(exercises.values_list("athlete", flat=True).distinct())
+        | set(feedback.values_list("athlete", flat=True).distinct())
+    )
+    for start in range(0, len(athletes), BATCH_SIZE):
+        refresh_readiness(athletes[start:start + BATCH_SIZE])
+    PipelineWatermark.objects.update_or_create(name=WATERMARK, defaults={"value": now})
+    return len(athletes)
@@ -0,0 +1,46 @@
+# Porcentaje del 1RM según repeticiones y RPE (tabla de Tuchscherer)
+RPE_COLUMNS = (10, 9.5, 9, 8.5, 8, 7.5, 7)
+RPE_TABLE = {
+    1: (1.000, 0.978, 0.955, 0.939, 0.922, 0.907, 0.892),
+    2: (0.955, 0.939, 0.922, 0.907, 0.892, 0.878, 0.863),
+    3: (0.922, 0.907, 0.892, 0.878, 0.863, 0.850, 0.837),
+    4: (0.892, 0.878, 0.863, 0.850, 0.837, 0.824, 0.811),
+    5: (0.863, 0.850, 0.837, 0.824, 0.811, 0.799, 0.786),
+    6: (0.837, 0.824, 0.811, 0.799, 0.786, 0.774, 0.762),
+    7: (0.811, 0.799, 0.786, 0.774, 0.762, 0.751, 0.739),
+    8: (0.786, 0.774, 0.762, 0.751, 0.739, 0.723, 0.707),
+    9: (0.762, 0.751, 0.739, 0.723, 0.707, 0.694, 0.680),
+    10: (0.739, 0.723, 0.707, 0.694, 0.680, 0.667, 0.653),
+}
+
+
+def estimate_rpe(reps, intensity):
+    """RPE más cercano para `reps` repeticiones al `intensity` (fracción) del 1RM."""
+    row = RPE_TABLE[min(max(reps, 1), 10)]
+    for rpe, pct in zip(RPE_COLUMNS, row):
+        if intensity >= pct:
+            return rpe
+    return RPE_COLUMNS[-1]
+
+
+def percentage(reps, rpe):
+    """Fracción del 1RM que corresponde a `reps` repeticiones a un RPE dado."""
+    row = RPE_TABLE[min(max(reps, 1), 10)]
+    column = min(range(len(RPE_COLUMNS)), key=lambda i: abs(RPE_COLUMNS[i] - rpe))
+    return row[column]
+
+
+def estimated_1rm(weight, reps, rpe=None):
+    """
+    1RM estimado ajustado por RPE. Sin RPE (o fuera de la tabla) se usa
+    Epley sobre las repeticiones en reserva.
+    """
+    if not weight or not reps:
+        return None
+    if rpe is not None and 1 <= reps <= 10 and rpe >= RPE_COLUMNS[-1]:
+        return weight / percentage(reps, rpe)
+    reps_in_reserve = 10 - rpe if rpe is not None else 0
+    effective_reps = reps + max(reps_in_reserve, 0)
+    if effective_reps <= 1:
+        return weight
+    return weight * (1 + effective_reps / 30)
@@ -1,5 +1,15 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import TrainingBlock, TrainingSession, Exercise, AthleteProgress
+from rest_framework.permissions import SAFE_METHODS
+from authentication.models import CustomUser
+from django.utils import timezone
+from .models import (
+    TrainingBlock, TrainingSession, Exercise, AthleteProgress, BlockStats, AthleteReadiness, record_scope_exit,
+)
+from .completion import exercises_changed, sessions_changed, session_status_changed
+from .progress import PROGRESS_FIELDS, changed_keys, refresh_progress_on_commit
+from .generator import BLOQUES_MIN_WEEKS
+from .readiness import LOAD_FIELDS, decayed_loads, refresh_readiness_on_commit
 
 # Lista de ejercicios predeterminados
 EXERCISE_CHOICES = [
@@ -51,47 +61,226 @@ class ExerciseSerializer(serializers.ModelSerializer):
         # Quitar los campos que no existen en el modelo
         validated_data.pop("predefined_name", None)
         validated_data.pop("custom_name", None)
-        return super().create(validated_data)
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            exercises_changed(instance.session_id, total=1, completed=int(instance.completed))
+        return instance
 
     def update(self, instance, validated_data):
-        # Actualiza normalmente los campos del ejercicio
-        instance = super().update(instance, validated_data)
-
-        # --- Lógica automática de completado ---
-        session = instance.session
-        block = session.block
-
-        # ✅ Actualizar estado de la sesión
-        exercises = session.exercises.all()
-        session_completed = all(e.completed for e in exercises)
-        if session.completed != session_completed:
-            session.completed = session_completed
-            session.save()
-
-        # ✅ Actualizar estado del bloque
-        sessions = block.sessions.all()
-        block_completed = all(s.completed for s in sessions)
-        if block.completed != block_completed:
-            block.completed = block_completed
-            block.save()
+        with transaction.atomic():
+            # Se relee la fila bloqueada: con dos PATCH simultáneos el segundo ve
+            # el estado que dejó el primero y no vuelve a sumar el mismo cambio
+            instance = Exercise.objects.select_for_update().get(pk=instance.pk)
+            previous_session_id = instance.session_id
+            previous_completed = instance.completed
+            previous_athlete_id = instance.athlete_id
+            # Claves de antes del cambio: si el ejercicio pasa a otra sesión, la fila
+            # automática de la fecha (y el atleta) anterior también debe recalcularse
+            progress_changed = bool(PROGRESS_FIELDS & set(validated_data))
+            previous_keys = set()
+            if previous_completed and progress_changed:
+                previous_keys = changed_keys(Exercise.objects.filter(pk=instance.pk))
+
+            # Actualiza normalmente los campos del ejercicio
+            instance = super().update(instance, validated_data)
+
+            # --- Lógica automática de completado (sesión y bloque) ---
+            # Solo se ajustan los contadores, sin recorrer la sesión ni el bloque
+            if instance.session_id != previous_session_id:
+                previous_owners = (instance.athlete_id, instance.coach_id)
+                instance.set_owners()
+                instance.save(update_fields=["athlete", "coach"])
+                record_scope_exit(Exercise, [instance.pk], previous_owners, (instance.athlete_id, instance.coach_id))
+                exercises_changed(previous_session_id, total=-1, completed=-int(previous_completed))
+                exercises_changed(instance.session_id, total=1, completed=int(instance.completed))
+            elif instance.completed != previous_completed:
+                exercises_changed(instance.session_id, completed=1 if instance.completed else -1)
+
+            # El progreso del atleta se recalcula al confirmar la transacción
+            if (previous_completed or instance.completed) and progress_changed:
+                refresh_progress_on_commit(previous_keys | changed_keys(Exercise.objects.filter(pk=instance.pk)))
+            if (previous_completed or instance.completed) and LOAD_FIELDS & set(validated_data):
+                refresh_readiness_on_commit({previous_athlete_id, instance.athlete_id} - {None})
 
         return instance
 
-    
-class TrainingSessionSerializer(serializers.ModelSerializer):
+
+class ExerciseBulkItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    weight_actual = serializers.FloatField(required=False, allow_null=True)
+    rpe_actual = serializers.FloatField(required=False, allow_null=True)
+    completed = serializers.BooleanField(required=False)
+
+
+class ExerciseBulkUpdateSerializer(serializers.Serializer):
+    session = serializers.IntegerField()
+    exercises = ExerciseBulkItemSerializer(many=True, allow_empty=False)
+
+    def validate_exercises(self, value):
+        ids = [item["id"] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Hay ejercicios repetidos en la lista.")
+        return value
+
+
+class SyncOperationSerializer(serializers.Serializer):
+    op = serializers.CharField()
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+
+class SyncRequestSerializer(serializers.Serializer):
+    operations = SyncOperationSerializer(many=True, allow_empty=False)
+
+
+def _query_list(request, param):
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()}
+
+
+def requested_expansions(request, expandable):
+    """
+    Rutas anidadas (ej. "sessions", "sessions.exercises") a incluir según
+    ?expand= y ?fields=. Sin ?expand se expande todo, como antes.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return set(expandable)
+
+    expand = _query_list(request, "expand")
+    if expand is None:
+        paths = set(expandable)
+    else:
+        paths = {
+            path for path in expandable
+            if path in expand or any(e.startswith(path + ".") for e in expand)
+        }
+
+    fields = _query_list(request, "fields")
+    if fields is not None:
+        paths = {path for path in paths if path.split(".")[0] in fields}
+    return paths
+
+
+class ExpandableFieldsMixin:
+    """
+    Permite ?fields=a,b (solo en el serializer raíz) y ?expand= para elegir
+    qué relaciones anidadas se serializan en las peticiones GET.
+    """
+    expandable_fields = ()
+    nested_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        self.expand_prefix = kwargs.pop("expand_prefix", "")
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+
+        root = self.root
+        root = getattr(root, "child", root)
+        paths = requested_expansions(request, root.expandable_fields)
+        for name in self.nested_fields:
+            if self.expand_prefix + name not in paths:
+                fields.pop(name, None)
+
+        if not self.expand_prefix:
+            only = _query_list(request, "fields")
+            if only:
+                for name in list(fields):
+                    if name not in only and name not in self.nested_fields:
+                        fields.pop(name)
+        return fields
+
+
+class TrainingSessionSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     exercises = ExerciseSerializer(many=True, read_only=True)
-    
+
+    expandable_fields = ("exercises",)
+    nested_fields = ("exercises",)
+
     class Meta:
         model = TrainingSession
         fields = "__all__"
+        read_only_fields = ["exercises_total", "exercises_completed"]
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            sessions_changed(instance.block_id, total=1, completed=int(instance.status == "completed"))
+        return instance
 
-class TrainingBlockSerializer(serializers.ModelSerializer):
-    sessions = TrainingSessionSerializer(many=True, read_only=True)
+    def update(self, instance, validated_data):
+        previous_block_id = instance.block_id
+        previous_status = instance.status
+        # La fecha y el bloque (dueño) forman parte de la clave del progreso calculado
+        keys_changed = bool({"date", "block"} & set(validated_data))
+        completed = Exercise.objects.filter(session=instance, completed=True)
+
+        with transaction.atomic():
+            previous_keys = changed_keys(completed) if keys_changed else set()
+            instance = super().update(instance, validated_data)
+            if instance.block_id != previous_block_id:
+                previous_owners = (instance.athlete_id, instance.coach_id)
+                instance.set_owners()
+                instance.save(update_fields=["athlete", "coach"])
+                owners = (instance.athlete_id, instance.coach_id)
+                record_scope_exit(TrainingSession, [instance.pk], previous_owners, owners)
+                record_scope_exit(Exercise, instance.exercises.values_list("pk", flat=True), previous_owners, owners)
+                # updated_at para que la sincronización (?since=) los envíe al nuevo dueño;
+                # sessions_changed marca ambos bloques
+                instance.exercises.update(
+                    athlete_id=instance.athlete_id, coach_id=instance.coach_id, updated_at=timezone.now(),
+                )
+                sessions_changed(previous_block_id, total=-1, completed=-int(previous_status == "completed"))
+                sessions_changed(instance.block_id, total=1, completed=int(instance.status == "completed"))
+            else:
+                session_status_changed(instance, previous_status)
+            if keys_changed:
+                keys = previous_keys | changed_keys(completed)
+                refresh_progress_on_commit(keys)
+                # La carga diaria cambia de día o de atleta
+                refresh_readiness_on_commit({athlete for athlete, _, _ in keys})
+        return instance
+
+class BlockStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BlockStats
+        exclude = ["block"]
+
+
+class TrainingBlockSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    sessions = TrainingSessionSerializer(many=True, read_only=True, expand_prefix="sessions.")
     athlete_name = serializers.SerializerMethodField()
+    # Resumen precalculado; null hasta el primer cálculo de refresh_block_stats
+    stats = BlockStatsSerializer(read_only=True)
+
+    expandable_fields = ("sessions", "sessions.exercises")
+    nested_fields = ("sessions",)
 
     class Meta:
         model = TrainingBlock
         fields = "__all__"
+        read_only_fields = ["sessions_total", "sessions_completed"]
+
+    def update(self, instance, validated_data):
+        previous_owners = (instance.athlete_id, instance.coach_id)
+        completed = Exercise.objects.filter(session__block=instance, completed=True)
+        with transaction.atomic():
+            previous_keys = changed_keys(completed) if "athlete" in validated_data else set()
+            instance = super().update(instance, validated_data)
+            if (instance.athlete_id, instance.coach_id) != previous_owners:
+                instance.propagate_owners(previous_owners)
+            if instance.athlete_id != previous_owners[0]:
+                # Las filas automáticas del atleta anterior se borran y se crean las del nuevo
+                keys = previous_keys | changed_keys(completed)
+                refresh_progress_on_commit(keys)
+                refresh_readiness_on_commit({athlete for athlete, _, _ in keys})
+        return instance
 
     def get_athlete_name(self, obj):
         if obj.athlete:
@@ -101,7 +290,80 @@ class TrainingBlockSerializer(serializers.ModelSerializer):
         return ""
 
 
+class SyncTrainingSessionSerializer(TrainingSessionSerializer):
+    # En la sincronización cada modelo viaja por separado, sin anidar
+    exercises = None
+    nested_fields = ()
+
+
+class SyncTrainingBlockSerializer(TrainingBlockSerializer):
+    sessions = None
+    stats = None
+    nested_fields = ()
+
+
+class BlockGenerateSerializer(serializers.Serializer):
+    athlete = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.filter(role=CustomUser.Role.ATHLETE))
+    name = serializers.CharField(max_length=100)
+    periodization = serializers.ChoiceField(choices=TrainingBlock.Periodization.choices)
+    start_date = serializers.DateField()
+    weeks = serializers.IntegerField(min_value=1, max_value=52)
+    days_per_week = serializers.IntegerField(min_value=1, max_value=7)
+    goal_competition_date = serializers.DateField(required=False, allow_null=True)
+    # Si no se envían, se usan los 1RM del perfil del atleta
+    squat_1rm = serializers.FloatField(required=False, min_value=0)
+    bench_1rm = serializers.FloatField(required=False, min_value=0)
+    deadlift_1rm = serializers.FloatField(required=False, min_value=0)
+
+    def validate(self, data):
+        if data["periodization"] == TrainingBlock.Periodization.BLOQUES and data["weeks"] < BLOQUES_MIN_WEEKS:
+            raise serializers.ValidationError(
+                {"weeks": f"La periodización por bloques necesita al menos {BLOQUES_MIN_WEEKS} semanas."}
+            )
+        return data
+
+
+class HistoryImportRowSerializer(serializers.Serializer):
+    # Una fila = un ejercicio de una sesión pasada
+    block = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    date = serializers.DateField()
+    name = serializers.CharField(max_length=100)
+    sets = serializers.IntegerField(min_value=1, default=3)
+    reps = serializers.IntegerField(min_value=1, default=5)
+    weight = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    rpe = serializers.FloatField(min_value=1, max_value=10, required=False, allow_null=True)
+    weight_actual = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    rpe_actual = serializers.FloatField(min_value=1, max_value=10, required=False, allow_null=True)
+    # Si falta, se considera completado cuando hay peso real
+    completed = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+
 class AthleteProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = AthleteProgress
         fields = "__all__"
+
+
+class AthleteReadinessSerializer(serializers.ModelSerializer):
+    # Cargas llevadas al día de hoy: sin entrenamientos nuevos solo decaen
+    acute_load = serializers.SerializerMethodField()
+    chronic_load = serializers.SerializerMethodField()
+    acwr = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AthleteReadiness
+        fields = ["athlete", "acute_load", "chronic_load", "acwr", "sleep", "fatigue", "stress",
+                  "score", "feedback_count", "as_of", "updated_at"]
+
+    def _loads(self, obj):
+        return decayed_loads(obj, timezone.localdate())
+
+    def get_acute_load(self, obj):
+        return round(self._loads(obj)[0], 1)
+
+    def get_chronic_load(self, obj):
+        return round(self._loads(obj)[1], 1)
+
+    def get_acwr(self, obj):
+        acwr = self._loads(obj)[2]
+        return round(acwr, 2) if acwr is not None else None
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import TrainingBlock, TrainingSession, Exercise, AthleteProgress, Tombstone
+
+
+@receiver(post_delete, sender=TrainingBlock)
+@receiver(post_delete, sender=TrainingSession)
+@receiver(post_delete, sender=Exercise)
+def record_training_tombstone(sender, instance, **kwargs):
+    # También se dispara en los borrados en cascada (bloque -> sesiones -> ejercicios)
+    Tombstone.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        athlete_id=instance.athlete_id,
+        coach_id=instance.coach_id,
+    )
+
+
+@receiver(post_delete, sender=AthleteProgress)
+def record_progress_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        athlete_id=instance.athlete_id,
+    )
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import BlockStats, Exercise, TrainingBlock
+
+# No se recalcula un bloque que se modificó hace menos que esto: mientras el
+# atleta registra una sesión, sus escrituras se agrupan en un solo recálculo
+STATS_DEBOUNCE = timedelta(seconds=30)
+# Un cambio tan cercano al cálculo pudo confirmar después de leer los
+# ejercicios; esos bloques se vuelven a calcular en la siguiente pasada
+STATS_OVERLAP = timedelta(seconds=5)
+BATCH_SIZE = 500
+
+
+def stale_blocks(debounce=STATS_DEBOUNCE):
+    """
+    Bloques cuyo resumen falta o es anterior a su último cambio. Cualquier
+    escritura de ejercicios o sesiones ya actualiza block.updated_at.
+    """
+    return TrainingBlock.objects.filter(updated_at__lte=timezone.now() - debounce).filter(
+        Q(stats__isnull=True) | Q(stats__computed_at__lt=F("updated_at") + STATS_OVERLAP)
+    )
+
+
+def compute_stats(block_ids):
+    """Resumen de cada bloque en dos consultas: agregados y series top."""
+    exercises = Exercise.objects.filter(session__block__in=block_ids)
+    completed = Q(completed=True)
+    totals = (
+        exercises
+        .values("session__block")
+        .annotate(
+            planned_tonnage=Sum(F("sets") * F("reps") * F("weight"), output_field=FloatField()),
+            actual_tonnage=Sum(F("sets") * F("reps") * F("weight_actual"), output_field=FloatField(),
+                               filter=completed),
+            mean_rpe_deviation=Avg(F("rpe_actual") - F("rpe"), output_field=FloatField(), filter=completed),
+            total=Count("id"),
+            done=Count("id", filter=completed),
+        )
+    )
+    stats = {
+        row["session__block"]: {
+            "planned_tonnage": round(row["planned_tonnage"] or 0, 1),
+            "actual_tonnage": round(row["actual_tonnage"] or 0, 1),
+            "mean_rpe_deviation": (
+                round(row["mean_rpe_deviation"], 2) if row["mean_rpe_deviation"] is not None else None
+            ),
+            "exercises_total": row["total"],
+            "exercises_completed": row["done"],
+            "completion_ratio": round(row["done"] / row["total"], 3),
+            "top_sets": {},
+        }
+        for row in totals
+    }
+
+    top_sets = (
+        exercises
+        .filter(completed, weight_actual__isnull=False)
+        .annotate(row=Window(
+            RowNumber(),
+            partition_by=[F("session__block"), F("name")],
+            order_by=[F("weight_actual").desc(), F("reps").desc(), F("id").asc()],
+        ))
+        .filter(row=1)
+        .values_list("session__block", "name", "weight_actual", "reps", "rpe_actual", "session__date")
+    )
+    for block_id, name, weight, reps, rpe, day in top_sets:
+        stats[block_id]["top_sets"][name] = {"weight": weight, "reps": reps, "rpe": rpe, "date": day.isoformat()}
+    return stats
+
+
+@transaction.atomic
+def refresh_block_stats(block_ids):
+    block_ids = list(block_ids)
+    computed_at = timezone.now()
+    stats = compute_stats(block_ids)
+    empty = {"exercises_total": 0, "exercises_completed": 0, "completion_ratio": 0, "top_sets": {},
+             "planned_tonnage": 0, "actual_tonnage": 0, "mean_rpe_deviation": None}
+
+    existing = {s.block_id: s for s in BlockStats.objects.select_for_update().filter(block__in=block_ids)}
+    to_create, to_update = [], []
+    for block_id in block_ids:
+        values = {**stats.get(block_id, empty), "computed_at": computed_at}
+        if block_id in existing:
+            summary = existing[block_id]
+            for field, value in values.items():
+                setattr(summary, field, value)
+            to_update.append(summary)
+        else:
+            to_create.append(BlockStats(block_id=block_id, **values))
+
+    BlockStats.objects.bulk_update(to_update, list(empty) + ["computed_at"])
+    BlockStats.objects.bulk_create(to_create)
+    return len(block_ids)
+
+
+def refresh_stale(debounce=STATS_DEBOUNCE):
+    """Recalcula por lotes los resúmenes pendientes. Devuelve cuántos bloques procesó."""
+    ids = list(stale_blocks(debounce).values_list("id", flat=True))
+    for start in range(0, len(ids), BATCH_SIZE):
+        refresh_block_stats(ids[start:start + BATCH_SIZE])
+    return len(ids)
@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+
+from ai.models import ExerciseAdjustment
+from ai.serializer import ExerciseAdjustmentSerializer
+from .models import CoachAthlete, TrainingBlock, TrainingSession, Exercise, AthleteProgress, Tombstone
+from .serializers import (
+    SyncTrainingBlockSerializer,
+    SyncTrainingSessionSerializer,
+    TrainingSessionSerializer,
+    ExerciseSerializer,
+    AthleteProgressSerializer,
+)
+
+# Margen para no perder filas de transacciones que confirmaron después de
+# leer el cursor anterior; el cliente aplica los cambios de forma idempotente
+SYNC_OVERLAP = timedelta(seconds=5)
+MAX_OPERATIONS = 500
+
+
+def parse_cursor(value):
+    if not value:
+        return None
+    since = parse_datetime(value)
+    if since is None:
+        raise ValidationError({"since": "Cursor inválido."})
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def scoped_querysets(user):
+    """Querysets de cada modelo sincronizable visibles para el usuario."""
+    if user.role == "coach":
+        athletes = CoachAthlete.objects.filter(coach=user).values("athlete")
+        return {
+            "blocks": TrainingBlock.objects.filter(coach=user),
+            "sessions": TrainingSession.objects.filter(coach=user),
+            "exercises": Exercise.objects.filter(coach=user),
+            "progress": AthleteProgress.objects.filter(athlete__in=athletes),
+            "adjustments": ExerciseAdjustment.objects.filter(exercise__coach=user),
+            "deleted": Tombstone.objects.filter(
+                Q(coach_id=user.id) | Q(model="athleteprogress", athlete_id__in=athletes)
+            ),
+        }
+
+    if user.role == "athlete":
+        return {
+            "blocks": TrainingBlock.objects.filter(athlete=user),
+            "sessions": TrainingSession.objects.filter(athlete=user),
+            "exercises": Exercise.objects.filter(athlete=user),
+            "progress": AthleteProgress.objects.filter(athlete=user),
+            "adjustments": ExerciseAdjustment.objects.filter(exercise__athlete=user),
+            "deleted": Tombstone.objects.filter(athlete_id=user.id),
+        }
+
+    if user.role == "admin":
+        return {
+            "blocks": TrainingBlock.objects.all(),
+            "sessions": TrainingSession.objects.all(),
+            "exercises": Exercise.objects.all(),
+            "progress": AthleteProgress.objects.all(),
+            "adjustments": ExerciseAdjustment.objects.all(),
+            "deleted": Tombstone.objects.all(),
+        }
+
+    raise PermissionDenied("Rol sin acceso a la sincronización")
+
+
+def changes_since(user, since):
+    """
+    Cambios visibles para el usuario desde `since` (o todo si es None), más
+    los borrados. El nuevo cursor se toma antes de consultar.
+    """
+    cursor = timezone.now()
+    querysets = scoped_querysets(user)
+
+    if since is not None:
+        since -= SYNC_OVERLAP
+        for name in ("blocks", "sessions", "exercises", "progress"):
+            querysets[name] = querysets[name].filter(updated_at__gte=since)
+        # Los ajustes no se modifican después de creados
+        querysets["adjustments"] = querysets["adjustments"].filter(date__gte=since)
+        deleted = querysets["deleted"].filter(deleted_at__gte=since)
+    else:
+        deleted = Tombstone.objects.none()
+
+    return {
+        "cursor": cursor.isoformat(),
+        "blocks": SyncTrainingBlockSerializer(querysets["blocks"].select_related("athlete"), many=True).data,
+        "sessions": SyncTrainingSessionSerializer(querysets["sessions"], many=True).data,
+        "exercises": ExerciseSerializer(querysets["exercises"], many=True).data,
+        "progress": AthleteProgressSerializer(querysets["progress"], many=True).data,
+        "adjustments": ExerciseAdjustmentSerializer(querysets["adjustments"], many=True).data,
+        "deleted": [
+            {"model": model, "id": object_id}
+            for model, object_id in deleted.order_by("deleted_at").values_list("model", "object_id")
+        ],
+    }
+
+
+def _update(serializer_class, queryset, operation):
+    try:
+        instance = queryset.get(pk=operation.get("id"))
+    except (queryset.model.DoesNotExist, ValueError, TypeError):
+        raise NotFound()
+    serializer = serializer_class(instance, data=operation.get("data", {}), partial=True)
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+def _create_progress(user, queryset, operation):
+    data = dict(operation.get("data", {}))
+    if user.role == "athlete":
+        data["athlete"] = user.id
+    serializer = AthleteProgressSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    if user.role == "athlete":
+        return serializer.save(athlete=user)
+    if user.role == "coach":
+        return serializer.save()
+    raise PermissionDenied("Solo coaches o atletas pueden registrar progreso")
+
+
+OPERATIONS = {
+    "exercise.update": ("exercises", lambda user, qs, op: _update(ExerciseSerializer, qs, op)),
+    "session.update": ("sessions", lambda user, qs, op: _update(TrainingSessionSerializer, qs, op)),
+    "progress.create": ("progress", _create_progress),
+}
+
+
+def apply_operations(user, operations):
+    """
+    Aplica en orden y en una sola transacción las escrituras encoladas offline:
+    [{"op": "exercise.update", "id": 1, "data": {...}}, ...]. Si una falla no
+    se aplica ninguna y el error indica su posición.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError({"operations": "Se requiere una lista de operaciones."})
+    if len(operations) > MAX_OPERATIONS:
+        raise ValidationError({"operations": f"Máximo {MAX_OPERATIONS} operaciones por petición."})
+
+    querysets = scoped_querysets(user)
+    results = []
+    with transaction.atomic():
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+                raise ValidationError({"operations": {index: "Operación desconocida."}})
+            name, handler = OPERATIONS[operation["op"]]
+            try:
+                instance = handler(user, querysets[name], operation)
+            except NotFound:
+                raise ValidationError({"operations": {index: "Objeto no encontrado."}})
+            except ValidationError as e:
+                raise ValidationError({"operations": {index: e.detail}})
+            results.append({"op": operation["op"], "id": instance.pk})
+    return results
@@ -1,3 +1,1111 @@
+import json
+import math
+from datetime import date, timedelta
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ai.models import AthleteFeedback
+from authentication.models import CustomUser
+from .models import (
+    CoachAthlete, TrainingBlock, TrainingSession, Exercise, AthleteProgress, BlockStats, AthleteReadiness,
+    PipelineWatermark,
+)
+from .completion import exercises_changed, sessions_changed
+from .export import stream_csv, stream_ndjson
+from .generator import bloques_scheme
+from .serializers import ExerciseSerializer, TrainingBlockSerializer, TrainingSessionSerializer
+from .progress import catch_up, first_per_lift
+from .analytics import estimated_1rm as vector_1rm
+from .rpe import estimated_1rm
+from .stats import refresh_stale, stale_blocks
+from .readiness import ACUTE_ALPHA, CHRONIC_ALPHA, decayed_loads, readiness_score
+from .readiness import catch_up as readiness_catch_up
+
+
+def create_block_tree(coach, athlete, weeks=2, days=3, exercises=3):
+    block = TrainingBlock.objects.create(
+        athlete=athlete,
+        coach=coach,
+        name=f"Bloque {athlete.email}",
+        start_date=date(2025, 1, 6),
+        end_date=date(2025, 1, 6) + timedelta(weeks=weeks),
+    )
+    for day in range(weeks * days):
+        session = TrainingSession.objects.create(block=block, date=block.start_date + timedelta(days=day))
+        sessions_changed(block.id, total=1)
+        for i in range(exercises):
+            Exercise.objects.create(session=session, name=f"Ejercicio {i}", weight=100, rpe=8)
+        exercises_changed(session.id, total=exercises)
+    block.refresh_from_db()
+    return block
+
+
+class TrainingQueryCountTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athletes = [
+            CustomUser.objects.create_user(f"atleta{i}@plift.cl", "pass1234", role="athlete")
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_block_list_query_count_is_constant(self):
+        create_block_tree(self.coach, self.athletes[0], weeks=1)
+        # Validadores HTTP, bloques (con atleta y coach), sesiones y ejercicios
+        with self.assertNumQueries(4):
+            small = self.client.get("/blocks/")
+
+        create_block_tree(self.coach, self.athletes[1], weeks=12)
+        with self.assertNumQueries(4):
+            large = self.client.get("/blocks/")
+
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(large.status_code, 200)
+
+    def test_session_list_query_count_is_constant(self):
+        create_block_tree(self.coach, self.athletes[0], weeks=4)
+        with self.assertNumQueries(3):
+            response = self.client.get("/sessions/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_block_sessions_are_ordered_by_date(self):
+        block = create_block_tree(self.coach, self.athletes[0], weeks=1)
+        TrainingSession.objects.create(block=block, date=block.start_date - timedelta(days=1))
+        response = self.client.get("/blocks/")
+        dates = [s["date"] for s in response.json()["results"][0]["sessions"]]
+        self.assertEqual(dates, sorted(dates))
+
+
+class TrainingPaginationTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        create_block_tree(self.coach, athlete, weeks=10, days=3, exercises=4)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_sessions_are_paginated_by_cursor(self):
+        first = self.client.get("/sessions/", {"page_size": 25}).json()
+        self.assertEqual(len(first["results"]), 25)
+        self.assertIsNotNone(first["next"])
+
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(len(second["results"]), 5)
+        self.assertIsNone(second["next"])
+
+        dates = [s["date"] for s in first["results"] + second["results"]]
+        self.assertEqual(dates, sorted(dates))
+
+    def test_page_size_is_capped(self):
+        response = self.client.get("/exercises/", {"page_size": 10000}).json()
+        self.assertEqual(len(response["results"]), 100)
+        self.assertIsNotNone(response["next"])
+
+
+class TrainingExpansionTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        create_block_tree(self.coach, athlete, weeks=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_sparse_block_list_skips_nested_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/blocks/", {"fields": "id,name,start_date,end_date,completed"})
+        block = response.json()["results"][0]
+        self.assertEqual(set(block), {"id", "name", "start_date", "end_date", "completed"})
+
+    def test_expand_sessions_without_exercises(self):
+        with self.assertNumQueries(3):
+            response = self.client.get("/blocks/", {"expand": "sessions"})
+        session = response.json()["results"][0]["sessions"][0]
+        self.assertNotIn("exercises", session)
+
+    def test_expand_full_tree(self):
+        response = self.client.get("/blocks/", {"expand": "sessions.exercises"})
+        session = response.json()["results"][0]["sessions"][0]
+        self.assertEqual(len(session["exercises"]), 3)
+
+    def test_session_exercises_follow_expand_param(self):
+        response = self.client.get("/sessions/", {"expand": ""})
+        self.assertNotIn("exercises", response.json()["results"][0])
+        response = self.client.get("/sessions/")
+        self.assertIn("exercises", response.json()["results"][0])
+
+
+class ExerciseBulkUpdateTests(TestCase):
+    def setUp(self):
+        coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        self.block = create_block_tree(coach, self.athlete, weeks=1, days=1)
+        self.session = self.block.sessions.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.athlete)
+
+    def test_bulk_update_completes_session_and_block(self):
+        payload = {
+            "session": self.session.id,
+            "exercises": [
+                {"id": e.id, "weight_actual": 102.5, "rpe_actual": 8.5, "completed": True}
+                for e in self.session.exercises.all()
+            ],
+        }
+        response = self.client.patch("/exercises/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["session_status"], "completed")
+        self.assertTrue(response.json()["block_completed"])
+        self.assertFalse(self.session.exercises.exclude(weight_actual=102.5).exists())
+
+    def test_bulk_update_rejects_exercises_from_other_sessions(self):
+        other = create_block_tree(self.block.coach, self.athlete, weeks=1, days=1)
+        foreign = Exercise.objects.filter(session__block=other).first()
+        payload = {"session": self.session.id, "exercises": [{"id": foreign.id, "completed": True}]}
+        response = self.client.patch("/exercises/bulk/", payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        foreign.refresh_from_db()
+        self.assertFalse(foreign.completed)
+
+
+class CompletionCounterTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        self.block = create_block_tree(self.coach, self.athlete, weeks=1, days=2, exercises=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.athlete)
+
+    def complete(self, exercise, completed=True):
+        return self.client.patch(f"/exercises/{exercise.id}/", {"completed": completed}, format="json")
+
+    def test_completing_all_exercises_cascades_to_session_and_block(self):
+        first, second = self.block.sessions.order_by("date")
+        for exercise in first.exercises.all():
+            self.complete(exercise)
+        first.refresh_from_db()
+        self.block.refresh_from_db()
+        self.assertEqual(first.exercises_completed, 2)
+        self.assertEqual(first.status, "completed")
+        self.assertEqual(self.block.sessions_completed, 1)
+        self.assertFalse(self.block.completed)
+
+        for exercise in second.exercises.all():
+            self.complete(exercise)
+        self.block.refresh_from_db()
+        self.assertTrue(self.block.completed)
+
+        self.complete(second.exercises.first(), completed=False)
+        second.refresh_from_db()
+        self.block.refresh_from_db()
+        self.assertEqual(second.status, "in_progress")
+        self.assertEqual(self.block.sessions_completed, 1)
+        self.assertFalse(self.block.completed)
+
+    def test_adding_an_incomplete_exercise_reopens_the_session(self):
+        for exercise in Exercise.objects.filter(session__block=self.block):
+            self.complete(exercise)
+        self.block.refresh_from_db()
+        self.assertTrue(self.block.completed)
+
+        session = self.block.sessions.order_by("date").first()
+        self.client.force_authenticate(self.coach)
+        response = self.client.post(
+            "/exercises/", {"session": session.id, "predefined_name": "Sentadilla", "sets": 3, "reps": 5}, format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        session.refresh_from_db()
+        self.block.refresh_from_db()
+        self.assertEqual(session.status, "in_progress")
+        self.assertEqual(self.block.sessions_completed, 1)
+        self.assertFalse(self.block.completed)
+
+    def test_deleting_the_last_incomplete_exercise_completes_the_session(self):
+        session = self.block.sessions.order_by("date").first()
+        done, pending = session.exercises.order_by("id")
+        self.complete(done)
+        self.client.force_authenticate(self.coach)
+        self.assertEqual(self.client.delete(f"/exercises/{pending.id}/").status_code, 204)
+        session.refresh_from_db()
+        self.block.refresh_from_db()
+        self.assertEqual((session.exercises_total, session.status), (1, "completed"))
+        self.assertEqual(self.block.sessions_completed, 1)
+
+    def test_concurrent_completions_are_counted_once(self):
+        exercise = Exercise.objects.filter(session__block=self.block).first()
+        # El segundo PATCH llega con el ejercicio leído antes de que el primero confirmara
+        stale = Exercise.objects.get(pk=exercise.pk)
+        self.complete(exercise)
+        serializer = ExerciseSerializer(stale, data={"completed": True}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        exercise.session.refresh_from_db()
+        self.assertEqual(exercise.session.exercises_completed, 1)
+
+    def test_exercise_update_query_count_does_not_depend_on_block_size(self):
+        exercise = Exercise.objects.filter(session__block=self.block).first()
+        with CaptureQueriesContext(connection) as small:
+            self.complete(exercise)
+
+        large = create_block_tree(self.block.coach, self.athlete, weeks=12, days=4, exercises=6)
+        exercise = Exercise.objects.filter(session__block=large).first()
+        with CaptureQueriesContext(connection) as big:
+            self.complete(exercise)
+
+        self.assertEqual(len(small), len(big))
+
+
+class BlockGeneratorTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user(
+            "atleta@plift.cl", "pass1234", role="athlete",
+            squat_1rm=200, bench_1rm=140, deadlift_1rm=240,
+        )
+        CoachAthlete.objects.create(coach=self.coach, athlete=self.athlete)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def generate(self, **overrides):
+        payload = {
+            "athlete": self.athlete.id,
+            "name": "Preparación",
+            "periodization": "LINEAL",
+            "start_date": "2025-03-03",
+            "weeks": 12,
+            "days_per_week": 4,
+            **overrides,
+        }
+        return self.client.post("/blocks/generate/", payload, format="json")
+
+    def test_generates_full_tree_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.generate(weeks=1, days_per_week=1)
+        with CaptureQueriesContext(connection) as large:
+            response = self.generate()
+        self.assertEqual(response.status_code, 201)
+
+        # Fuera de los INSERT de ejercicios, las consultas no dependen del tamaño del bloque
+        def exercise_inserts(queries):
+            return sum(q["sql"].startswith('INSERT INTO "training_exercise"') for q in queries)
+        self.assertEqual(len(small) - exercise_inserts(small), len(large) - exercise_inserts(large))
+        # Los 144 ejercicios van en los lotes que permite el motor: uno en PostgreSQL,
+        # varios en SQLite por su límite de 999 parámetros por consulta
+        fields = [field for field in Exercise._meta.concrete_fields if not field.primary_key]
+        batch_size = connection.ops.bulk_batch_size(fields, [None] * 144)
+        self.assertEqual(exercise_inserts(large), math.ceil(144 / batch_size))
+
+        block = response.json()
+        self.assertEqual(block["end_date"], "2025-05-25")
+        self.assertEqual(block["sessions_total"], 48)
+        self.assertEqual(len(block["sessions"]), 48)
+
+        first, last = block["sessions"][0], block["sessions"][-1]
+        squat = next(e for e in first["exercises"] if e["name"] == "Sentadilla")
+        self.assertEqual(squat["weight"], 140.0)
+        self.assertEqual(squat["reps"], 8)
+        squat = next(e for e in last["exercises"] if e["name"] == "Sentadilla")
+        self.assertEqual(squat["weight"], 180.0)
+
+    def test_requires_coach_athlete_relationship(self):
+        CoachAthlete.objects.all().delete()
+        self.assertEqual(self.generate().status_code, 403)
+        self.assertFalse(TrainingBlock.objects.exists())
+
+    def test_short_bloques_blocks_keep_every_phase(self):
+        # Repeticiones por fase: acumulación 8, transmutación 5, realización 2
+        phases = {
+            weeks: [bloques_scheme(week, weeks, 0)[1] for week in range(weeks)]
+            for weeks in (3, 4, 5, 10)
+        }
+        self.assertEqual(phases[3], [8, 5, 2])
+        self.assertEqual(phases[4], [8, 5, 5, 2])
+        self.assertEqual(phases[5], [8, 8, 5, 5, 2])
+        self.assertEqual(phases[10], [8] * 4 + [5] * 4 + [2] * 2)
+
+        response = self.generate(periodization="BLOQUES", weeks=2)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("weeks", response.data)
+        self.assertEqual(self.generate(periodization="BLOQUES", weeks=3).status_code, 201)
+
+    def test_override_one_rm(self):
+        block = self.generate(periodization="DUP", weeks=2, days_per_week=3, bench_1rm=100).json()
+        bench = block["sessions"][0]["exercises"][1]
+        self.assertEqual(bench["name"], "Bench Press")
+        self.assertEqual(bench["weight"], 70.0)
+
+
+@skipUnless(connection.vendor == "postgresql", "Los planes EXPLAIN se validan sobre PostgreSQL")
+class IndexUsageTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        for _ in range(3):
+            self.block = create_block_tree(self.coach, self.athlete, weeks=4, days=4)
+        AthleteProgress.objects.bulk_create([
+            AthleteProgress(athlete=self.athlete, exercise=name, best_weight=100 + i)
+            for i in range(50)
+            for name in ("Sentadilla", "Bench Press", "Peso muerto")
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            # Con tablas pequeñas el planner prefiere seq scan; se fuerza el uso de índices
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_session_by_block_and_status(self):
+        self.assertUsesIndex(
+            TrainingSession.objects.filter(block=self.block, status="in_progress"),
+            "session_block_status_idx",
+        )
+
+    def test_sessions_of_block_by_date(self):
+        self.assertUsesIndex(
+            TrainingSession.objects.filter(block=self.block).order_by("date"),
+            "session_block_date_idx",
+        )
+
+    def test_exercise_by_session_and_name(self):
+        session = self.block.sessions.first()
+        self.assertUsesIndex(
+            Exercise.objects.filter(session=session, name="Sentadilla"),
+            "exercise_session_name_idx",
+        )
+
+    def test_latest_progress_per_lift(self):
+        self.assertUsesIndex(
+            AthleteProgress.objects.filter(athlete=self.athlete, exercise="Sentadilla").order_by("-date"),
+            "progress_athlete_ex_date_idx",
+        )
+
+    def test_best_progress_per_lift_uses_distinct_on(self):
+        self.assertUsesIndex(
+            first_per_lift(AthleteProgress.objects.filter(athlete=self.athlete), "-best_weight", "-date", "-id"),
+            "progress_athlete_ex_best_idx",
+        )
+
+    def test_blocks_by_coach_and_athlete(self):
+        self.assertUsesIndex(
+            TrainingBlock.objects.filter(coach=self.coach, athlete=self.athlete),
+            "block_coach_athlete_idx",
+        )
+
+    def test_block_pages_follow_the_cursor_ordering(self):
+        self.assertUsesIndex(
+            TrainingBlock.objects.filter(athlete=self.athlete).order_by("-start_date", "id")[:21],
+            "block_athlete_start_idx",
+        )
+        self.assertUsesIndex(
+            TrainingBlock.objects.filter(coach=self.coach).order_by("-start_date", "id")[:21],
+            "block_coach_start_idx",
+        )
+
+    def test_progress_pages_follow_the_cursor_ordering(self):
+        self.assertUsesIndex(
+            AthleteProgress.objects.filter(athlete=self.athlete).order_by("-date", "id")[:21],
+            "progress_athlete_date_idx",
+        )
+
+
+class DenormalizedOwnerTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        self.block = create_block_tree(self.coach, self.athlete, weeks=1, days=2)
+
+    def test_owners_are_copied_on_create(self):
+        self.assertFalse(TrainingSession.objects.exclude(athlete=self.athlete, coach=self.coach).exists())
+        self.assertFalse(Exercise.objects.exclude(athlete=self.athlete, coach=self.coach).exists())
+
+    def test_changing_block_athlete_propagates(self):
+        other = CustomUser.objects.create_user("otro@plift.cl", "pass1234", role="athlete")
+        client = APIClient()
+        client.force_authenticate(self.coach)
+        response = client.patch(f"/blocks/{self.block.id}/", {"athlete": other.id}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Exercise.objects.filter(athlete=other).count(), 6)
+        client.force_authenticate(self.athlete)
+        self.assertEqual(client.get("/exercises/").json()["results"], [])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        self.block = create_block_tree(coach, self.athlete, weeks=1, days=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.athlete)
+
+    def test_unchanged_block_list_returns_304_with_one_query(self):
+        etag = self.client.get("/blocks/")["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get("/blocks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_exercise_change_invalidates_block_and_session_etags(self):
+        block_etag = self.client.get(f"/blocks/{self.block.id}/")["ETag"]
+        session = self.block.sessions.first()
+        sessions_etag = self.client.get("/sessions/", {"block": self.block.id})["ETag"]
+
+        exercise = session.exercises.first()
+        self.client.patch(f"/exercises/{exercise.id}/", {"weight_actual": 105}, format="json")
+
+        response = self.client.get(f"/blocks/{self.block.id}/", HTTP_IF_NONE_MATCH=block_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/sessions/", {"block": self.block.id}, HTTP_IF_NONE_MATCH=sessions_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_malformed_ids_are_not_found(self):
+        for url in ("/blocks/abc/", "/sessions/abc/", "/exercises/abc/"):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_deleting_a_session_invalidates_block_list(self):
+        etag = self.client.get("/blocks/")["ETag"]
+        self.block.sessions.first().delete()
+        response = self.client.get("/blocks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        self.block = create_block_tree(coach, self.athlete, weeks=1, days=2)
+        other = CustomUser.objects.create_user("otro@plift.cl", "pass1234", role="athlete")
+        create_block_tree(coach, other, weeks=1, days=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.athlete)
+
+    def test_full_snapshot_then_delta(self):
+        snapshot = self.client.get("/sync/").json()
+        self.assertEqual(len(snapshot["blocks"]), 1)
+        self.assertEqual(len(snapshot["sessions"]), 2)
+        self.assertEqual(len(snapshot["exercises"]), 6)
+        self.assertNotIn("sessions", snapshot["blocks"][0])
+
+        session = self.block.sessions.order_by("date").first()
+        # Fuerza que los datos previos queden fuera de la ventana del cursor
+        TrainingBlock.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        TrainingSession.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        Exercise.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        since = (timezone.now() - timedelta(minutes=30)).isoformat()
+
+        exercise = session.exercises.first()
+        exercise.weight_actual = 110
+        exercise.save()
+        deleted_id = session.exercises.last().id
+        session.exercises.last().delete()
+
+        delta = self.client.get("/sync/", {"since": since}).json()
+        self.assertEqual([e["id"] for e in delta["exercises"]], [exercise.id])
+        self.assertEqual(len(delta["sessions"]), 1)
+        self.assertEqual(len(delta["blocks"]), 1)
+        self.assertIn({"model": "exercise", "id": deleted_id}, delta["deleted"])
+
+    def test_moved_session_reaches_the_new_owner(self):
+        other_block = TrainingBlock.objects.exclude(pk=self.block.pk).get()
+        session = self.block.sessions.order_by("date").first()
+        TrainingBlock.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        TrainingSession.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        Exercise.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        since = (timezone.now() - timedelta(minutes=30)).isoformat()
+
+        serializer = TrainingSessionSerializer(session, data={"block": other_block.id}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.client.force_authenticate(other_block.athlete)
+        delta = self.client.get("/sync/", {"since": since}).json()
+        self.assertEqual([s["id"] for s in delta["sessions"]], [session.id])
+        self.assertEqual(
+            sorted(e["id"] for e in delta["exercises"]), sorted(session.exercises.values_list("id", flat=True)),
+        )
+        self.assertEqual([b["id"] for b in delta["blocks"]], [other_block.id])
+        # El bloque de origen también cambia (contadores y updated_at)
+        self.assertGreater(TrainingBlock.objects.get(pk=self.block.pk).updated_at, timezone.now() - timedelta(minutes=1))
+
+    def test_previous_owner_is_told_the_moved_rows_left(self):
+        other_block = TrainingBlock.objects.exclude(pk=self.block.pk).get()
+        session = self.block.sessions.order_by("date").first()
+        exercise_ids = list(session.exercises.values_list("id", flat=True))
+        since = timezone.now().isoformat()
+
+        serializer = TrainingSessionSerializer(session, data={"block": other_block.id}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        deleted = self.client.get("/sync/", {"since": since}).json()["deleted"]
+        self.assertIn({"model": "trainingsession", "id": session.id}, deleted)
+        for exercise_id in exercise_ids:
+            self.assertIn({"model": "exercise", "id": exercise_id}, deleted)
+        # El coach es el mismo: para él las filas siguen en su alcance
+        self.client.force_authenticate(self.block.coach)
+        self.assertEqual(self.client.get("/sync/", {"since": since}).json()["deleted"], [])
+
+        # Cambiar el atleta del bloque también saca del alcance al bloque
+        self.client.force_authenticate(self.athlete)
+        serializer = TrainingBlockSerializer(self.block, data={"athlete": other_block.athlete_id}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        deleted = self.client.get("/sync/", {"since": since}).json()["deleted"]
+        self.assertIn({"model": "trainingblock", "id": self.block.id}, deleted)
+
+    def test_offline_operations_are_atomic(self):
+        exercise = Exercise.objects.filter(athlete=self.athlete).first()
+        foreign = Exercise.objects.exclude(athlete=self.athlete).first()
+        response = self.client.post("/sync/", {"operations": [
+            {"op": "exercise.update", "id": exercise.id, "data": {"weight_actual": 120, "completed": True}},
+            {"op": "exercise.update", "id": foreign.id, "data": {"completed": True}},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        exercise.refresh_from_db()
+        self.assertIsNone(exercise.weight_actual)
+
+        response = self.client.post("/sync/", {"operations": [
+            {"op": "exercise.update", "id": exercise.id, "data": {"weight_actual": 120, "completed": True}},
+            {"op": "progress.create", "data": {"exercise": "Sentadilla", "best_weight": 120}},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        exercise.refresh_from_db()
+        self.assertEqual(exercise.weight_actual, 120)
+        self.assertEqual(exercise.session.exercises_completed, 1)
+        self.assertTrue(AthleteProgress.objects.filter(athlete=self.athlete).exists())
+
+    def test_malformed_sync_payload_is_rejected(self):
+        exercise = Exercise.objects.filter(athlete=self.athlete).first()
+        for payload in (
+            [{"op": "exercise.update", "id": exercise.id}],
+            {"operations": [{"op": "exercise.update", "id": exercise.id, "data": ["completed"]}]},
+            {"operations": [{"op": "exercise.update", "id": "uno", "data": {"completed": True}}]},
+            {"operations": []},
+        ):
+            response = self.client.post("/sync/", payload, format="json")
+            self.assertEqual(response.status_code, 400)
+
+        exercise.refresh_from_db()
+        self.assertFalse(exercise.completed)
+
+
+class ProgressDerivationTests(TestCase):
+    def setUp(self):
+        coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        self.block = create_block_tree(coach, self.athlete, weeks=1, days=2, exercises=1)
+        Exercise.objects.update(name="Sentadilla", reps=5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.athlete)
+
+    def log(self, exercise, weight, rpe):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                f"/exercises/{exercise.id}/",
+                {"weight_actual": weight, "rpe_actual": rpe, "completed": True},
+                format="json",
+            )
+
+    def test_completing_an_exercise_upserts_progress(self):
+        exercise = Exercise.objects.order_by("session__date").first()
+        self.log(exercise, 150, 8)
+        progress = AthleteProgress.objects.get(athlete=self.athlete)
+        self.assertEqual(progress.source, "auto")
+        self.assertEqual(progress.date, exercise.session.date)
+        self.assertEqual(progress.best_weight, 150)
+        self.assertEqual(progress.estimated_1rm, 185.0)
+
+        self.log(exercise, 160, 9)
+        progress = AthleteProgress.objects.get(athlete=self.athlete)
+        self.assertEqual(progress.best_weight, 160)
+        self.assertEqual(progress.estimated_1rm, 191.2)
+
+    def test_moving_an_exercise_refreshes_the_previous_date(self):
+        first, second = self.block.sessions.order_by("date")
+        exercise = first.exercises.get()
+        self.log(exercise, 150, 8)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/exercises/{exercise.id}/", {"session": second.id}, format="json")
+        progress = AthleteProgress.objects.get(athlete=self.athlete)
+        self.assertEqual((progress.date, progress.best_weight), (second.date, 150))
+
+    def test_session_date_and_owner_changes_move_the_derived_rows(self):
+        session = self.block.sessions.order_by("date").first()
+        self.log(session.exercises.get(), 150, 8)
+        new_date = session.date + timedelta(days=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/sessions/{session.id}/", {"date": new_date.isoformat()}, format="json")
+        self.assertEqual(AthleteProgress.objects.get(athlete=self.athlete).date, new_date)
+
+        other = CustomUser.objects.create_user("otro@plift.cl", "pass1234", role="athlete")
+        serializer = TrainingBlockSerializer(self.block, data={"athlete": other.id}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+        self.assertFalse(AthleteProgress.objects.filter(athlete=self.athlete).exists())
+        self.assertEqual(AthleteProgress.objects.get(athlete=other).date, new_date)
+
+    def test_catch_up_only_processes_new_data(self):
+        Exercise.objects.update(weight_actual=140, rpe_actual=8, completed=True)
+        self.assertEqual(catch_up(), 2)
+        self.assertEqual(AthleteProgress.objects.filter(source="auto").count(), 2)
+        self.assertEqual(catch_up(), 0)
+
+
+class AthleteLoadAnalyticsTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user(
+            "atleta@plift.cl", "pass1234", role="athlete", squat_1rm=200,
+        )
+        CoachAthlete.objects.create(coach=self.coach, athlete=self.athlete)
+        create_block_tree(self.coach, self.athlete, weeks=2, days=1, exercises=1)
+        Exercise.objects.update(name="Sentadilla", sets=5, reps=5, weight_actual=150, completed=True)
+        # Una sesión por semana
+        TrainingSession.objects.filter(date=date(2025, 1, 7)).update(date=date(2025, 1, 13))
+        self.client = APIClient()
+
+    def test_vectorized_1rm_matches_scalar(self):
+        import numpy as np
+        cases = [(150, 5, 8), (100, 1, 10), (100, 12, 8), (100, 3, None), (100, 5, 6)]
+        weights, reps, rpes = zip(*cases)
+        result = vector_1rm(
+            np.array(weights, dtype=float), np.array(reps, dtype=float),
+            np.array([np.nan if r is None else r for r in rpes]),
+        )
+        for value, case in zip(result, cases):
+            self.assertAlmostEqual(value, estimated_1rm(*case))
+
+    def test_vectorized_1rm_matches_scalar_on_rpe_grid(self):
+        import numpy as np
+        # Incluye RPE a cuartos (empate entre dos columnas de la tabla)
+        cases = [(100, reps, rpe) for reps in range(1, 13) for rpe in [None, *np.arange(6, 10.25, 0.25)]]
+        weights, reps, rpes = zip(*cases)
+        result = vector_1rm(
+            np.array(weights, dtype=float), np.array(reps, dtype=float),
+            np.array([np.nan if r is None else r for r in rpes]),
+        )
+        for value, case in zip(result, cases):
+            self.assertAlmostEqual(value, estimated_1rm(*case), msg=case)
+
+    def test_coach_gets_weekly_load(self):
+        self.client.force_authenticate(self.coach)
+        response = self.client.get(f"/analytics/athletes/{self.athlete.id}/load/")
+        self.assertEqual(response.status_code, 200)
+        squat = response.data["lifts"]["Sentadilla"]
+        self.assertEqual(squat["reference_1rm"], 200)
+        self.assertEqual(squat["tonnage"], 2 * 5 * 5 * 150)
+        self.assertEqual(squat["relative_intensity"], 0.75)
+        self.assertEqual(len(squat["weekly"]), 2)
+
+        response = self.client.get(f"/analytics/athletes/{self.athlete.id}/load/?end=2025-01-06")
+        self.assertEqual(len(response.data["lifts"]["Sentadilla"]["weekly"]), 1)
+
+    def test_unloaded_lifts_have_no_intensity(self):
+        # Dominadas con peso corporal (0 kg) y sin 1RM en el perfil
+        Exercise.objects.update(name="Dominadas", weight_actual=0)
+        self.client.force_authenticate(self.coach)
+        response = self.client.get(f"/analytics/athletes/{self.athlete.id}/load/")
+        self.assertEqual(response.status_code, 200)
+        pullups = response.json()["lifts"]["Dominadas"]
+        self.assertEqual((pullups["reference_1rm"], pullups["relative_intensity"], pullups["inol"]), (None, None, None))
+        self.assertEqual(pullups["reps"], 2 * 5 * 5)
+        self.assertEqual({(w["relative_intensity"], w["inol"]) for w in pullups["weekly"]}, {(None, None)})
+
+    def test_other_coach_is_forbidden(self):
+        other = CustomUser.objects.create_user("otro@plift.cl", "pass1234", role="coach")
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/analytics/athletes/{self.athlete.id}/load/")
+        self.assertEqual(response.status_code, 403)
+
+
+class WeeklyVolumeTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athletes = [
+            CustomUser.objects.create_user(f"atleta{i}@plift.cl", "pass1234", role="athlete")
+            for i in range(2)
+        ]
+        for athlete in self.athletes:
+            create_block_tree(self.coach, athlete, weeks=2, days=7, exercises=2)
+        Exercise.objects.update(sets=3, reps=5, weight_actual=100, completed=True)
+        self.client = APIClient()
+
+    def test_volume_is_grouped_by_lift_and_week(self):
+        self.client.force_authenticate(self.coach)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/exercises/weekly-volume/?athlete={self.athletes[0].id}")
+        self.assertEqual(response.status_code, 200)
+        rows = response.data["results"]
+        # 2 ejercicios x 2 semanas (el bloque empieza un lunes)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["name"], "Ejercicio 0")
+        self.assertEqual(rows[0]["volume"], 7 * 3 * 5 * 100)
+        self.assertEqual(rows[0]["total_sets"], 21)
+        self.assertEqual(rows[0]["total_reps"], 105)
+
+    def test_athlete_only_sees_own_volume(self):
+        self.client.force_authenticate(self.athletes[1])
+        response = self.client.get("/exercises/weekly-volume/?name=Ejercicio 1&end=2025-01-12")
+        self.assertEqual(response.data["results"][0]["volume"], 7 * 3 * 5 * 100)
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+class CoachDashboardTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def add_athlete(self, i):
+        athlete = CustomUser.objects.create_user(f"atleta{i}@plift.cl", "pass1234", role="athlete")
+        CoachAthlete.objects.create(coach=self.coach, athlete=athlete)
+        block = create_block_tree(self.coach, athlete, weeks=1, days=4, exercises=1)
+        TrainingBlock.objects.filter(pk=block.pk).update(
+            start_date=timezone.localdate() - timedelta(days=3),
+            end_date=timezone.localdate() + timedelta(days=3),
+        )
+        sessions = list(block.sessions.order_by("date"))
+        for offset, session in zip((-3, -2, -1, 1), sessions):
+            session.date = timezone.localdate() + timedelta(days=offset)
+        sessions[0].status = "completed"
+        sessions[1].status = "in_progress"
+        TrainingSession.objects.bulk_update(sessions, ["date", "status"])
+        AthleteFeedback.objects.create(athlete=athlete, sleep_quality=5, fatigue=5, stress=5)
+        AthleteFeedback.objects.create(athlete=athlete, sleep_quality=8, fatigue=3, stress=2)
+        AthleteProgress.objects.create(athlete=athlete, exercise="Sentadilla", best_weight=140)
+        return athlete
+
+    def test_dashboard_query_count_is_constant(self):
+        self.add_athlete(0)
+        with self.assertNumQueries(6):
+            small = self.client.get("/coach/dashboard/")
+        for i in range(1, 4):
+            self.add_athlete(i)
+        with self.assertNumQueries(6):
+            large = self.client.get("/coach/dashboard/")
+        self.assertEqual(len(small.data["athletes"]), 1)
+        self.assertEqual(len(large.data["athletes"]), 4)
+
+        summary = large.data["athletes"][0]
+        self.assertIsNotNone(summary["current_block"])
+        self.assertIsNotNone(summary["in_progress_session"])
+        self.assertEqual(summary["last_feedback"]["sleep_quality"], 8)
+        self.assertEqual(summary["latest_progress"]["Sentadilla"]["best_weight"], 140)
+        # 1 de 3 sesiones vencidas finalizada
+        self.assertEqual(summary["adherence"], 33.3)
+
+    def test_athletes_cannot_use_dashboard(self):
+        athlete = self.add_athlete(0)
+        self.client.force_authenticate(athlete)
+        self.assertEqual(self.client.get("/coach/dashboard/").status_code, 403)
+
+
+class LatestProgressTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        CoachAthlete.objects.create(coach=self.coach, athlete=self.athlete)
+        today = timezone.localdate()
+        for days_ago, weight in ((30, 150), (20, 170), (10, 160)):
+            progress = AthleteProgress.objects.create(athlete=self.athlete, exercise="Sentadilla", best_weight=weight)
+            AthleteProgress.objects.filter(pk=progress.pk).update(date=today - timedelta(days=days_ago))
+        AthleteProgress.objects.create(athlete=self.athlete, exercise="Bench Press", best_weight=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_latest_and_best_per_lift(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/progress/latest/")
+        self.assertEqual(response.status_code, 200)
+        rows = {row["exercise"]: row for row in response.data["results"]}
+        self.assertEqual(set(rows), {"Sentadilla", "Bench Press"})
+        self.assertEqual(rows["Sentadilla"]["latest"]["best_weight"], 160)
+        self.assertEqual(rows["Sentadilla"]["best"]["best_weight"], 170)
+        self.assertEqual(rows["Bench Press"]["latest"], rows["Bench Press"]["best"])
+
+    def test_coach_scope_does_not_duplicate_rows(self):
+        other = CustomUser.objects.create_user("otro@plift.cl", "pass1234", role="coach")
+        CoachAthlete.objects.create(coach=other, athlete=self.athlete)
+        response = self.client.get("/progress/?page_size=100")
+        self.assertEqual(len(response.data["results"]), 4)
+        self.client.force_authenticate(other)
+        response = self.client.get("/progress/latest/?exercise=Sentadilla")
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+class HistoryExportTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        CoachAthlete.objects.create(coach=self.coach, athlete=self.athlete)
+        create_block_tree(self.coach, self.athlete, weeks=1, days=2, exercises=2)
+        AthleteFeedback.objects.create(athlete=self.athlete, sleep_quality=7, fatigue=4, stress=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_ndjson_export_streams_every_record(self):
+        response = self.client.get(f"/export/athletes/{self.athlete.id}/history/?output=ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(
+            [row["type"] for row in rows],
+            ["block"] + ["session"] * 2 + ["exercise"] * 4 + ["feedback"],
+        )
+        self.assertEqual(rows[-1]["sleep_quality"], 7)
+
+    def test_csv_export_has_header_and_one_line_per_record(self):
+        response = self.client.get(f"/export/athletes/{self.athlete.id}/history/")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith("type,id,name,"))
+        self.assertEqual(len(lines), 1 + 8)
+
+    def test_csv_header_is_sent_before_any_row(self):
+        response = self.client.get(f"/export/athletes/{self.athlete.id}/history/")
+        first = next(iter(response.streaming_content)).decode()
+        self.assertTrue(first.startswith("type,id,name,"))
+        self.assertEqual(len(first.splitlines()), 1)
+
+    async def test_asgi_export_uses_an_async_iterator(self):
+        for stream in (stream_csv, stream_ndjson):
+            chunks = [chunk async for chunk in stream(self.athlete, asynchronous=True)]
+            expected = await sync_to_async(lambda: list(stream(self.athlete)))()
+            self.assertEqual(chunks, expected)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(f"/export/athletes/{self.athlete.id}/history/?output=xml")
+        self.assertEqual(response.status_code, 400)
+
+
+class HistoryImportTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        CoachAthlete.objects.create(coach=self.coach, athlete=self.athlete)
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+        self.url = f"/import/athletes/{self.athlete.id}/history/"
+
+    def test_csv_import_builds_blocks_sessions_and_counters(self):
+        content = (
+            "block,date,name,sets,reps,weight_actual,rpe_actual\n"
+            "2023,2023-01-02,Sentadilla,5,5,140,8\n"
+            "2023,2023-01-02,Bench Press,5,5,90,\n"
+            "2023,2023-01-04,Peso muerto,3,3,,\n"
+            ",2024-03-01,Sentadilla,3,1,170,9.5\n"
+        )
+        upload = SimpleUploadedFile("historial.csv", content.encode(), content_type="text/csv")
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data, {"blocks": 2, "sessions": 3, "exercises": 4})
+
+        block = TrainingBlock.objects.get(name="2023")
+        self.assertEqual((block.start_date, block.end_date), (date(2023, 1, 2), date(2023, 1, 4)))
+        self.assertEqual((block.sessions_total, block.sessions_completed, block.completed), (2, 1, False))
+        session = block.sessions.get(date=date(2023, 1, 2))
+        self.assertEqual((session.status, session.exercises_completed), ("completed", 2))
+        self.assertEqual(Exercise.objects.filter(athlete=self.athlete, coach=self.coach).count(), 4)
+        self.assertTrue(TrainingBlock.objects.get(name="Historial importado").completed)
+
+    def test_invalid_rows_are_reported_and_nothing_is_written(self):
+        rows = [
+            {"date": "2023-01-02", "name": "Sentadilla", "weight_actual": 100},
+            {"date": "no-es-fecha", "name": "Sentadilla"},
+            {"date": "2023-01-03", "name": "Sentadilla", "rpe_actual": 14},
+        ]
+        response = self.client.post(self.url, {"rows": rows}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error_count"], 2)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2, 3])
+        self.assertFalse(TrainingBlock.objects.exists())
+
+    def test_non_utf8_csv_is_rejected(self):
+        content = "date,name,weight_actual\n2023-01-02,Press militar añadido,60\n".encode("latin-1")
+        upload = SimpleUploadedFile("historial.csv", content, content_type="text/csv")
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("UTF-8", str(response.data["file"]))
+        self.assertFalse(TrainingBlock.objects.exists())
+
+    def test_coach_without_link_cannot_import(self):
+        other = CustomUser.objects.create_user("otro@plift.cl", "pass1234", role="coach")
+        self.client.force_authenticate(other)
+        response = self.client.post(self.url, {"rows": []}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class BlockStatsTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        self.block = create_block_tree(self.coach, self.athlete, weeks=1, days=2, exercises=2)
+        # 4 ejercicios de 3x5 planificados a 100kg @8; se completan 2
+        done = list(Exercise.objects.order_by("id")[:2])
+        done[0].weight_actual, done[0].rpe_actual = 110, 9
+        done[1].weight_actual, done[1].rpe_actual = 100, 7
+        for exercise in done:
+            exercise.completed = True
+        Exercise.objects.bulk_update(done, ["weight_actual", "rpe_actual", "completed"])
+        self.client = APIClient()
+        self.client.force_authenticate(self.coach)
+
+    def test_stats_are_computed_for_stale_blocks(self):
+        self.assertEqual(list(stale_blocks(timedelta(0))), [self.block])
+        self.assertEqual(refresh_stale(timedelta(0)), 1)
+
+        stats = BlockStats.objects.get(block=self.block)
+        self.assertEqual(stats.planned_tonnage, 4 * 15 * 100)
+        self.assertEqual(stats.actual_tonnage, 15 * 110 + 15 * 100)
+        self.assertEqual(stats.mean_rpe_deviation, 0)
+        self.assertEqual(stats.completion_ratio, 0.5)
+        self.assertEqual(stats.top_sets["Ejercicio 0"]["weight"], 110)
+        self.assertEqual(stats.top_sets["Ejercicio 1"]["weight"], 100)
+
+        # Calculado después del último cambio, el bloque queda al día
+        TrainingBlock.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertFalse(stale_blocks(timedelta(0)).exists())
+        exercise = Exercise.objects.first()
+        exercise.weight_actual = 120
+        exercise.save()
+        self.assertTrue(stale_blocks(timedelta(0)).exists())
+        # El debounce deja fuera los bloques que se están editando
+        self.assertFalse(stale_blocks().exists())
+
+    def test_stats_are_served_with_the_block(self):
+        response = self.client.get("/blocks/")
+        self.assertIsNone(response.data["results"][0]["stats"])
+        etag = response["ETag"]
+
+        refresh_stale(timedelta(0))
+        with self.assertNumQueries(4):
+            response = self.client.get("/blocks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["stats"]["completion_ratio"], 0.5)
+
+
+class ProgressSeriesTests(TestCase):
+    def setUp(self):
+        self.athlete = CustomUser.objects.create_user("atleta@plift.cl", "pass1234", role="athlete")
+        start = date(2023, 1, 2)
+        AthleteProgress.objects.bulk_create([
+            AthleteProgress(
+                athlete=self.athlete, exercise="Sentadilla", date=start + timedelta(days=day),
+                best_weight=100 + day % 30, estimated_1rm=250 if day == 200 else 120 + day % 30,
+            )
+            for day in range(364)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.athlete)
+
+    def test_daily_series_is_downsampled_keeping_peaks(self):
+        response = self.client.get("/progress/series/?max_points=40")
+        self.assertEqual(response.status_code, 200)
+        series = response.data["series"][0]
+        self.assertEqual(series["total_points"], 364)
+        self.assertEqual(len(series["points"]), 40)
+        dates = [point["date"] for point in series["points"]]
+        self.assertEqual((dates[0], dates[-1]), (date(2023, 1, 2), date(2023, 12, 31)))
+        self.assertIn(250, [point["estimated_1rm"] for point in series["points"]])
+
+    def test_series_is_bucketed_in_the_database(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/progress/series/?resolution=month&exercise=Sentadilla")
+        points = response.data["series"][0]["points"]
+        self.assertEqual(len(points), 12)
+        self.assertEqual(points[6]["date"], date(2023, 7, 1))
+        self.assertEqual(points[6]["estimated_1rm"], 250)
+        self.assertEqual(points[0]["best_weight"], 129)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get("/progress/series/?resolution=year").status_code, 400)
+        self.assertEqual(self.client.get("/progress/series/?max_points=2").status_code, 400)
+
+
+class ReadinessTests(TestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user("coach@plift.cl", "pass1234", role="coach")
+        self.athletes = [
+            CustomUser.objects.create_user(f"atleta{i}@plift.cl", "pass1234", role="athlete")
+            for i in range(2)
+        ]
+        for athlete in self.athletes:
+            CoachAthlete.objects.create(coach=self.coach, athlete=athlete)
+            block = create_block_tree(self.coach, athlete, weeks=1, days=1, exercises=1)
+            block.sessions.update(date=timezone.localdate())
+        Exercise.objects.update(sets=5, reps=5, weight_actual=100, completed=True)
+        AthleteFeedback.objects.create(athlete=self.athletes[0], sleep_quality=10, fatigue=1, stress=1)
+        AthleteFeedback.objects.create(athlete=self.athletes[0], sleep_quality=2, fatigue=9, stress=9)
+        self.client = APIClient()
+
+    def test_loads_and_feedback_averages(self):
+        self.assertEqual(readiness_catch_up(), 2)
+        readiness = AthleteReadiness.objects.get(athlete=self.athletes[0])
+        self.assertEqual(readiness.acute_load, round(2500 * ACUTE_ALPHA, 1))
+        self.assertEqual(readiness.chronic_load, round(2500 * CHRONIC_ALPHA, 1))
+        self.assertEqual(readiness.sleep, 8)
+        self.assertEqual(readiness.score, readiness_score(8, 3, 3))
+        self.assertEqual(readiness.feedback_count, 2)
+
+        acute, chronic, acwr = decayed_loads(readiness, readiness.as_of + timedelta(days=7))
+        self.assertLess(acute, readiness.acute_load)
+        self.assertAlmostEqual(acwr, acute / chronic)
+
+    def test_catch_up_only_recomputes_changed_athletes(self):
+        readiness_catch_up()
+        self.assertEqual(readiness_catch_up(), 2)  # dentro del margen de la marca de agua
+        PipelineWatermark.objects.filter(name="readiness").update(value=timezone.now() + timedelta(minutes=5))
+        AthleteFeedback.objects.create(athlete=self.athletes[1], sleep_quality=7, fatigue=3, stress=3)
+        AthleteFeedback.objects.filter(athlete=self.athletes[1]).update(created_at=timezone.now() + timedelta(minutes=10))
+        self.assertEqual(readiness_catch_up(), 1)
+
+    def test_completing_an_exercise_refreshes_readiness(self):
+        athlete = self.athletes[1]
+        exercise = Exercise.objects.get(athlete=athlete)
+        Exercise.objects.filter(pk=exercise.pk).update(completed=False, weight_actual=None)
+        self.client.force_authenticate(athlete)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/exercises/{exercise.id}/", {"weight_actual": 120, "completed": True}, format="json")
+        readiness = AthleteReadiness.objects.get(athlete=athlete)
+        self.assertEqual(readiness.acute_load, round(5 * 5 * 120 * ACUTE_ALPHA, 1))
+        self.assertFalse(AthleteReadiness.objects.filter(athlete=self.athletes[0]).exists())
+
+    def test_session_date_and_block_owner_changes_refresh_readiness(self):
+        first, second = self.athletes
+        session = TrainingSession.objects.get(athlete=second)
+        self.client.force_authenticate(self.coach)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/sessions/{session.id}/", {"date": yesterday.isoformat()}, format="json")
+        readiness = AthleteReadiness.objects.get(athlete=second)
+        self.assertEqual(readiness.acute_load, round(2500 * ACUTE_ALPHA * (1 - ACUTE_ALPHA), 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/blocks/{session.block_id}/", {"athlete": first.id}, format="json")
+        self.assertEqual(AthleteReadiness.objects.get(athlete=second).acute_load, 0)
+        self.assertGreater(AthleteReadiness.objects.get(athlete=first).acute_load, round(2500 * ACUTE_ALPHA, 1))
+
+    def test_coach_reads_all_athletes_in_one_call(self):
+        readiness_catch_up()
+        self.client.force_authenticate(self.coach)
+        response = self.client.get("/readiness/")
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(f"/readiness/{self.athletes[0].id}/")
+        self.assertEqual(response.data["feedback_count"], 2)
+        self.assertAlmostEqual(response.data["acwr"], ACUTE_ALPHA / CHRONIC_ALPHA, places=1)
 
-# Create your tests here.
+        self.client.force_authenticate(self.athletes[1])
+        self.assertEqual(self.client.get(f"/readiness/{self.athletes[0].id}/").status_code, 404)
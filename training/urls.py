@@ -1,10 +1,22 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import TrainingBlockViewSet, TrainingSessionViewSet, ExerciseViewSet, AthleteProgressViewSet
+from .views import (
+    TrainingBlockViewSet, TrainingSessionViewSet, ExerciseViewSet, AthleteProgressViewSet,
+    AthleteReadinessViewSet, SyncView, AthleteLoadView, CoachDashboardView,
+    AthleteHistoryExportView, AthleteHistoryImportView,
+)
 
 router = DefaultRouter()
 router.register(r'blocks', TrainingBlockViewSet)
 router.register(r'sessions', TrainingSessionViewSet)
 router.register(r'exercises', ExerciseViewSet)
 router.register(r'progress', AthleteProgressViewSet)
+router.register(r'readiness', AthleteReadinessViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("analytics/athletes/<int:athlete_id>/load/", AthleteLoadView.as_view(), name="athlete-load"),
+    path("coach/dashboard/", CoachDashboardView.as_view(), name="coach-dashboard"),
+    path("export/athletes/<int:athlete_id>/history/", AthleteHistoryExportView.as_view(), name="athlete-history-export"),
+    path("import/athletes/<int:athlete_id>/history/", AthleteHistoryImportView.as_view(), name="athlete-history-import"),
+]
@@ -1,18 +1,124 @@
+import hashlib
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
-from .models import TrainingBlock, TrainingSession, Exercise, AthleteProgress
-from .serializers import TrainingBlockSerializer, TrainingSessionSerializer, ExerciseSerializer, AthleteProgressSerializer
+from rest_framework.views import APIView
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Max, Prefetch, Sum
+from django.db.models.functions import Coalesce, Greatest, TruncDay, TruncMonth, TruncWeek
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from authentication.models import CustomUser
+from .models import (
+    CoachAthlete, TrainingBlock, TrainingSession, Exercise, AthleteProgress, AthleteReadiness, touch_tree,
+)
+from .serializers import (
+    TrainingBlockSerializer,
+    TrainingSessionSerializer,
+    ExerciseSerializer,
+    ExerciseBulkUpdateSerializer,
+    SyncRequestSerializer,
+    BlockGenerateSerializer,
+    AthleteProgressSerializer,
+    AthleteReadinessSerializer,
+    requested_expansions,
+)
+from .completion import exercises_changed, sessions_changed, session_status_changed
+from .generator import MAIN_LIFTS, generate_block
+from .sync import apply_operations, changes_since, parse_cursor
+from .progress import PROGRESS_FIELDS, changed_keys, first_per_lift, refresh_progress_on_commit
+from .readiness import LOAD_FIELDS, refresh_readiness_on_commit
+from .analytics import athlete_load, lttb
+from .dashboard import coach_dashboard
+from .export import FORMATS as EXPORT_FORMATS
+from .importer import import_history, read_rows, rows_from_payload
 from django_filters.rest_framework import DjangoFilterBackend
-
-
-class TrainingBlockViewSet(viewsets.ModelViewSet):
+from back_plift.pagination import (
+    BlockCursorPagination,
+    SessionCursorPagination,
+    ExerciseCursorPagination,
+    ProgressCursorPagination,
+)
+
+
+# Agrupación de AthleteProgress.series
+SERIES_RESOLUTIONS = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+SERIES_DEFAULT_POINTS = 500
+SERIES_MAX_POINTS = 2000
+
+
+def exercises_prefetch():
+    # Ejercicios de cada sesión en orden estable
+    return Prefetch("exercises", queryset=Exercise.objects.order_by("id"))
+
+
+def sessions_prefetch(with_exercises=True):
+    # Sesiones del bloque ordenadas por fecha, opcionalmente con sus ejercicios
+    sessions = TrainingSession.objects.order_by("date", "id")
+    if with_exercises:
+        sessions = sessions.prefetch_related(exercises_prefetch())
+    return Prefetch("sessions", queryset=sessions)
+
+
+class ConditionalGetMixin:
+    """
+    Soporta If-None-Match / If-Modified-Since en list y retrieve. El ETag se
+    calcula con una única consulta agregada (Max(updated_at) + Count) sobre el
+    queryset filtrado; si no hubo cambios se responde 304 sin serializar nada.
+    """
+
+    last_modified_field = "updated_at"
+
+    def conditional_response(self, request, queryset):
+        state = queryset.order_by().aggregate(last_modified=Max(self.last_modified_field), count=Count("pk"))
+        last_modified = state["last_modified"]
+        key = f"{request.user.pk}:{request.get_full_path()}:{state['count']}:{last_modified and last_modified.isoformat()}"
+        etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def with_validators(self, response, etag, timestamp):
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag, timestamp, not_modified = self.conditional_response(request, self.filter_queryset(self.get_queryset()))
+        if not_modified is not None:
+            return not_modified
+        return self.with_validators(super().list(request, *args, **kwargs), etag, timestamp)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(**lookup)
+        except (TypeError, ValueError, DjangoValidationError):
+            # Igual que get_object_or_404 de DRF: un id mal formado es un 404
+            raise Http404
+        etag, timestamp, not_modified = self.conditional_response(request, queryset)
+        if not_modified is not None:
+            return not_modified
+        return self.with_validators(super().retrieve(request, *args, **kwargs), etag, timestamp)
+
+
+class TrainingBlockViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TrainingBlock.objects.all()
     serializer_class = TrainingBlockSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = BlockCursorPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["athlete", "coach"]  # ahora permite ?athlete=<id> o ?coach=<id>
+    # El resumen precalculado cambia sin tocar updated_at del bloque
+    last_modified_field = Greatest("updated_at", Coalesce("stats__computed_at", "updated_at"))
 
     def perform_create(self, serializer):
         if self.request.user.role != "coach":
@@ -23,21 +129,60 @@ class TrainingBlockViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if user.role == "coach":
-            return TrainingBlock.objects.filter(coach=user)
+            queryset = TrainingBlock.objects.filter(coach=user)
+        elif user.role == "athlete":
+            queryset = TrainingBlock.objects.filter(athlete=user)
+        elif user.role == "admin":
+            queryset = TrainingBlock.objects.all()
+        else:
+            return TrainingBlock.objects.none()
+
+        # Bloque -> sesiones -> ejercicios en un número fijo de consultas,
+        # cargando solo las relaciones pedidas con ?fields= / ?expand=
+        queryset = queryset.select_related("athlete", "coach", "stats")
+        expand = requested_expansions(self.request, TrainingBlockSerializer.expandable_fields)
+        if "sessions" in expand:
+            queryset = queryset.prefetch_related(sessions_prefetch("sessions.exercises" in expand))
+        return queryset
+
+    @action(detail=False, methods=["post"])
+    def generate(self, request):
+        """
+        Genera un bloque completo (sesiones y ejercicios) a partir de una
+        periodización, semanas, días por semana y los 1RM del atleta.
+        """
+        if request.user.role != "coach":
+            raise PermissionDenied("Solo los coaches pueden crear bloques")
 
-        if user.role == "athlete":
-            return TrainingBlock.objects.filter(athlete=user)
+        serializer = BlockGenerateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
-        if user.role == "admin":
-            return TrainingBlock.objects.all()
+        athlete = data["athlete"]
+        if not CoachAthlete.objects.filter(coach=request.user, athlete=athlete).exists():
+            raise PermissionDenied("El atleta no pertenece a este coach")
+
+        block = generate_block(
+            coach=request.user,
+            athlete=athlete,
+            name=data["name"],
+            periodization=data["periodization"],
+            start_date=data["start_date"],
+            weeks=data["weeks"],
+            days_per_week=data["days_per_week"],
+            goal_competition_date=data.get("goal_competition_date"),
+            one_rms={lift: data.get(field) for lift, field in MAIN_LIFTS.items()},
+        )
 
-        return TrainingBlock.objects.none()
+        block = TrainingBlock.objects.select_related("athlete", "coach").prefetch_related(sessions_prefetch()).get(pk=block.pk)
+        return Response(TrainingBlockSerializer(block).data, status=status.HTTP_201_CREATED)
 
 
-class TrainingSessionViewSet(viewsets.ModelViewSet):
+class TrainingSessionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TrainingSession.objects.all()
     serializer_class = TrainingSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SessionCursorPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["block"]  # ahora permite ?block=<id>
 
@@ -46,27 +191,37 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Solo los coaches pueden crear sesiones")
         serializer.save()
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        sessions_changed(instance.block_id, total=-1, completed=-int(instance.status == "completed"))
+        instance.delete()
+
     def get_queryset(self):
         user = self.request.user
 
         if user.role == "coach":
-            return TrainingSession.objects.filter(block__coach=user)
-
-        if user.role == "athlete":
-            return TrainingSession.objects.filter(block__athlete=user)
-
-        if user.role == "admin":
-            return TrainingSession.objects.all()
+            queryset = TrainingSession.objects.filter(coach=user)
+        elif user.role == "athlete":
+            queryset = TrainingSession.objects.filter(athlete=user)
+        elif user.role == "admin":
+            queryset = TrainingSession.objects.all()
+        else:
+            return TrainingSession.objects.none()
 
-        return TrainingSession.objects.none()
+        if "exercises" in requested_expansions(self.request, TrainingSessionSerializer.expandable_fields):
+            queryset = queryset.prefetch_related(exercises_prefetch())
+        return queryset
     
     @action(detail=True, methods=["post"])
     def start(self, request, pk=None):
         session = self.get_object()
         if session.status == "in_progress":
             return Response({"detail": "La sesión ya está iniciada."}, status=status.HTTP_400_BAD_REQUEST)
-        session.status = "in_progress"
-        session.save()
+        previous_status = session.status
+        with transaction.atomic():
+            session.status = "in_progress"
+            session.save(update_fields=["status"])
+            session_status_changed(session, previous_status)
         return Response({"detail": f"Sesión {session.id} iniciada."}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
@@ -74,15 +229,18 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
         session = self.get_object()
         if session.status != "in_progress":
             return Response({"detail": "Solo puedes finalizar una sesión en progreso."}, status=status.HTTP_400_BAD_REQUEST)
-        session.status = "completed"
-        session.save()
+        with transaction.atomic():
+            session.status = "completed"
+            session.save(update_fields=["status"])
+            session_status_changed(session, "in_progress")
         return Response({"detail": f"Sesión {session.id} finalizada."}, status=status.HTTP_200_OK)
 
 
-class ExerciseViewSet(viewsets.ModelViewSet):
+class ExerciseViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Exercise.objects.all()
     serializer_class = ExerciseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ExerciseCursorPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["session"]  # ahora permite ?session=<id>
 
@@ -91,25 +249,122 @@ class ExerciseViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Solo los coaches pueden crear ejercicios")
         serializer.save()
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        exercises_changed(instance.session_id, total=-1, completed=-int(instance.completed))
+        if instance.completed:
+            refresh_progress_on_commit(changed_keys(Exercise.objects.filter(pk=instance.pk)))
+            refresh_readiness_on_commit([instance.athlete_id])
+        instance.delete()
+
     def get_queryset(self):
         user = self.request.user
 
         if user.role == "coach":
-            return Exercise.objects.filter(session__block__coach=user)
-
-        if user.role == "athlete":
-            return Exercise.objects.filter(session__block__athlete=user)
-
-        if user.role == "admin":
-            return Exercise.objects.all()
-
-        return Exercise.objects.none()
+            queryset = Exercise.objects.filter(coach=user)
+        elif user.role == "athlete":
+            queryset = Exercise.objects.filter(athlete=user)
+        elif user.role == "admin":
+            queryset = Exercise.objects.all()
+        else:
+            return Exercise.objects.none()
+
+        return queryset
+
+    @action(detail=False, methods=["patch"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Registra varias series de una misma sesión en una sola petición:
+        {"session": id, "exercises": [{"id", "weight_actual", "rpe_actual", "completed"}, ...]}
+        """
+        serializer = ExerciseBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = {item.pop("id"): item for item in serializer.validated_data["exercises"]}
+
+        with transaction.atomic():
+            exercises = list(
+                self.get_queryset()
+                .select_for_update()
+                .filter(session_id=serializer.validated_data["session"], id__in=items)
+            )
+            missing = set(items) - {e.id for e in exercises}
+            if missing:
+                return Response(
+                    {"exercises": f"Ejercicios no encontrados en la sesión: {sorted(missing)}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            fields = {"updated_at"}
+            now = timezone.now()
+            completed_delta = 0
+            for exercise in exercises:
+                changes = items[exercise.id]
+                if "completed" in changes and changes["completed"] != exercise.completed:
+                    completed_delta += 1 if changes["completed"] else -1
+                for field, value in changes.items():
+                    setattr(exercise, field, value)
+                    fields.add(field)
+                exercise.updated_at = now
+            Exercise.objects.bulk_update(exercises, sorted(fields))
+
+            # Contadores y updated_at de sesión y bloque se ajustan una vez por petición
+            session_id = serializer.validated_data["session"]
+            touch_tree(session_id)
+            exercises_changed(session_id, completed=completed_delta)
+            if PROGRESS_FIELDS & fields:
+                refresh_progress_on_commit(changed_keys(Exercise.objects.filter(pk__in=items)))
+            if LOAD_FIELDS & fields:
+                refresh_readiness_on_commit(exercise.athlete_id for exercise in exercises)
+            session = TrainingSession.objects.select_related("block").get(pk=session_id)
+
+        exercises.sort(key=lambda e: e.id)
+        return Response({
+            "session": session.id,
+            "session_status": session.status,
+            "block_completed": session.block.completed,
+            "exercises": ExerciseSerializer(exercises, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="weekly-volume")
+    def weekly_volume(self, request):
+        """
+        Volumen semanal (series x reps x peso real) por ejercicio, agregado en
+        la base de datos. Filtros: ?athlete=<id>, ?name=, ?start= y ?end=.
+        """
+        queryset = self.get_queryset().filter(completed=True, weight_actual__isnull=False)
+        athlete = request.query_params.get("athlete")
+        if athlete:
+            if not athlete.isdigit():
+                raise ValidationError({"athlete": "Debe ser un id numérico."})
+            queryset = queryset.filter(athlete_id=athlete)
+        name = request.query_params.get("name")
+        if name:
+            queryset = queryset.filter(name=name)
+        start, end = query_date(request, "start"), query_date(request, "end")
+        if start:
+            queryset = queryset.filter(session__date__gte=start)
+        if end:
+            queryset = queryset.filter(session__date__lte=end)
+
+        rows = (
+            queryset
+            .annotate(week=TruncWeek("session__date"))
+            .values("name", "week")
+            .annotate(
+                volume=Sum(F("sets") * F("reps") * F("weight_actual"), output_field=FloatField()),
+                total_sets=Sum("sets"),
+                total_reps=Sum(F("sets") * F("reps")),
+            )
+            .order_by("name", "week")
+        )
+        return Response({"results": list(rows)})
 
 
 class AthleteProgressViewSet(viewsets.ModelViewSet):
     queryset = AthleteProgress.objects.all()
     serializer_class = AthleteProgressSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProgressCursorPagination
 
     def perform_create(self, serializer):
         # ✅ Tanto atleta como coach pueden registrar progreso
@@ -125,9 +380,10 @@ class AthleteProgressViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if user.role == "coach":
-            # Un coach debería ver solo progreso de sus atletas (opcional)
+            # Un coach debería ver solo progreso de sus atletas; semi-join
+            # (IN subconsulta) para no duplicar filas como el join a coaches
             return AthleteProgress.objects.filter(
-                athlete__coaches__coach=user
+                athlete__in=CoachAthlete.objects.filter(coach=user).values("athlete")
             )
 
         if user.role == "athlete":
@@ -137,3 +393,228 @@ class AthleteProgressViewSet(viewsets.ModelViewSet):
             return AthleteProgress.objects.all()
 
         return AthleteProgress.objects.none()
+
+    def filter_lift(self, queryset):
+        # ?athlete=<id> y ?exercise=<nombre>
+        athlete = self.request.query_params.get("athlete")
+        if athlete:
+            if not athlete.isdigit():
+                raise ValidationError({"athlete": "Debe ser un id numérico."})
+            queryset = queryset.filter(athlete_id=athlete)
+        exercise = self.request.query_params.get("exercise")
+        if exercise:
+            queryset = queryset.filter(exercise=exercise)
+        return queryset
+
+    @action(detail=False, methods=["get"])
+    def latest(self, request):
+        """
+        Registro más reciente y mejor marca histórica por (atleta, ejercicio).
+        Filtros: ?athlete=<id> y ?exercise=<nombre>.
+        """
+        queryset = self.filter_lift(self.get_queryset())
+        best = {
+            (p.athlete_id, p.exercise): p
+            for p in first_per_lift(queryset, "-best_weight", "-date", "-id")
+        }
+        results = [
+            {
+                "athlete": p.athlete_id,
+                "exercise": p.exercise,
+                "latest": AthleteProgressSerializer(p).data,
+                "best": AthleteProgressSerializer(best[(p.athlete_id, p.exercise)]).data,
+            }
+            for p in first_per_lift(queryset, "-date", "-id")
+        ]
+        results.sort(key=lambda row: (row["athlete"], row["exercise"]))
+        return Response({"results": results})
+
+    @action(detail=False, methods=["get"])
+    def series(self, request):
+        """
+        Serie para gráficos por (atleta, ejercicio): agrupada en la base de
+        datos por ?resolution=day|week|month (mejor marca de cada período) y
+        reducida con LTTB a ?max_points (500 por defecto).
+        """
+        resolution = request.query_params.get("resolution", "day")
+        if resolution not in SERIES_RESOLUTIONS:
+            raise ValidationError({"resolution": f"Use una de: {', '.join(SERIES_RESOLUTIONS)}."})
+        try:
+            max_points = int(request.query_params.get("max_points", SERIES_DEFAULT_POINTS))
+        except ValueError:
+            raise ValidationError({"max_points": "Debe ser un número entero."})
+        if not 3 <= max_points <= SERIES_MAX_POINTS:
+            raise ValidationError({"max_points": f"Debe estar entre 3 y {SERIES_MAX_POINTS}."})
+
+        rows = (
+            self.filter_lift(self.get_queryset())
+            .annotate(bucket=SERIES_RESOLUTIONS[resolution]("date"))
+            .values("athlete", "exercise", "bucket")
+            .annotate(best_weight=Max("best_weight"), estimated_1rm=Max("estimated_1rm"))
+            .order_by("athlete", "exercise", "bucket")
+        )
+        grouped = {}
+        for row in rows:
+            grouped.setdefault((row["athlete"], row["exercise"]), []).append(row)
+
+        series = []
+        for (athlete, exercise), points in grouped.items():
+            days = [point["bucket"].toordinal() for point in points]
+            values = [point["estimated_1rm"] or point["best_weight"] for point in points]
+            series.append({
+                "athlete": athlete,
+                "exercise": exercise,
+                "total_points": len(points),
+                "points": [
+                    {
+                        "date": points[i]["bucket"],
+                        "best_weight": points[i]["best_weight"],
+                        "estimated_1rm": points[i]["estimated_1rm"],
+                    }
+                    for i in lttb(days, values, max_points)
+                ],
+            })
+        return Response({"resolution": resolution, "max_points": max_points, "series": series})
+
+
+class AthleteReadinessViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Disposición precalculada: /readiness/ lista la de todos los atletas del
+    coach (o la propia) y /readiness/<athlete_id>/ la de un atleta.
+    """
+    queryset = AthleteReadiness.objects.all()
+    serializer_class = AthleteReadinessSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = "athlete"
+
+    def get_queryset(self):
+        user = self.request.user
+
+        if user.role == "coach":
+            return AthleteReadiness.objects.filter(
+                athlete__in=CoachAthlete.objects.filter(coach=user).values("athlete")
+            )
+
+        if user.role == "athlete":
+            return AthleteReadiness.objects.filter(athlete=user)
+
+        if user.role == "admin":
+            return AthleteReadiness.objects.all()
+
+        return AthleteReadiness.objects.none()
+
+
+class SyncView(APIView):
+    """
+    Sincronización incremental para el cliente offline.
+    GET ?since=<cursor>: cambios y borrados desde el cursor (sin cursor, todo).
+    POST {"operations": [...]}: escrituras encoladas offline, en una transacción.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        since = parse_cursor(request.query_params.get("since"))
+        return Response(changes_since(request.user, since))
+
+    def post(self, request):
+        serializer = SyncRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_operations(request.user, serializer.validated_data["operations"])
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+def get_visible_athlete(user, athlete_id):
+    # El atleta mismo, sus coaches y los admin pueden ver sus datos
+    try:
+        athlete = CustomUser.objects.get(pk=athlete_id, role=CustomUser.Role.ATHLETE)
+    except CustomUser.DoesNotExist:
+        raise NotFound("Atleta no encontrado")
+    if user.role == "admin" or user.pk == athlete.pk:
+        return athlete
+    if user.role == "coach" and CoachAthlete.objects.filter(coach=user, athlete=athlete).exists():
+        return athlete
+    raise PermissionDenied("No tienes acceso a este atleta")
+
+
+def query_date(request, param):
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValidationError({param: "Fecha inválida, use AAAA-MM-DD."})
+    return parsed
+
+
+class AthleteLoadView(APIView):
+    """
+    Tonelaje, intensidad relativa, INOL y tendencia de e1RM por ejercicio
+    para un atleta (?start=AAAA-MM-DD&end=AAAA-MM-DD).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, athlete_id):
+        athlete = get_visible_athlete(request.user, athlete_id)
+        start, end = query_date(request, "start"), query_date(request, "end")
+        return Response({
+            "athlete": athlete.id,
+            "start": start,
+            "end": end,
+            "lifts": athlete_load(athlete, start, end),
+        })
+
+
+class CoachDashboardView(APIView):
+    """Resumen de todos los atletas del coach en una sola llamada."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != "coach":
+            raise PermissionDenied("Solo los coaches tienen dashboard")
+        return Response({"athletes": coach_dashboard(request.user)})
+
+
+class AthleteHistoryExportView(APIView):
+    """
+    Historial completo del atleta (bloques, sesiones, ejercicios, ajustes y
+    feedback) como descarga en streaming: ?output=csv (por defecto) o ndjson.
+    Con ASGI el contenido se genera con un iterador async (ver back_plift/asgi.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, athlete_id):
+        athlete = get_visible_athlete(request.user, athlete_id)
+        output = request.query_params.get("output", "csv")
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({"output": f"Formato no soportado, use: {', '.join(EXPORT_FORMATS)}."})
+        stream, content_type = EXPORT_FORMATS[output]
+        asynchronous = isinstance(request._request, ASGIRequest)
+        response = StreamingHttpResponse(stream(athlete, asynchronous), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="historial_{athlete.id}.{output}"'
+        return response
+
+
+class AthleteHistoryImportView(APIView):
+    """
+    Importa el historial de un atleta: archivo CSV/JSON en el campo `file`
+    (formato por ?input= o por la extensión) o un JSON {"rows": [...]}.
+    Si alguna fila es inválida no se importa nada y se informan los errores.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, athlete_id):
+        athlete = get_visible_athlete(request.user, athlete_id)
+        if request.user.role not in ("coach", "athlete"):
+            raise PermissionDenied("Solo coaches o atletas pueden importar historial")
+        coach = request.user if request.user.role == "coach" else None
+
+        upload = request.FILES.get("file")
+        if upload is not None:
+            input_format = request.query_params.get("input") or upload.name.rsplit(".", 1)[-1].lower()
+            rows = read_rows(upload, input_format)
+        else:
+            rows = rows_from_payload(request.data)
+        created, errors = import_history(athlete, coach, rows)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(created, status=status.HTTP_201_CREATED)